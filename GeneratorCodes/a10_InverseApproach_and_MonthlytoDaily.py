@@ -1,16 +1,53 @@
 # a10_InverseApproach_and_MonthlytoDaily.py
 
 import os
+import time
 import numpy as np
+from collections import namedtuple
 import pandas as pd
 import h5py
 from tqdm import tqdm
 from joblib import Parallel, delayed
 
 from a2_MatrixYear import matrix_year
-from a11_Optimization import optimize_forcing_scenario
-from a15_SyntheticMonthlytoDailyNonLocals import synthetic_monthly_to_daily_nonlocals
-from a16_SyntheticMonthlytoDailyLocals import synthetic_monthly_to_daily_locals
+from a11_Optimization import optimize_forcing_scenario, summarize_solver_log, SOLVER_NAMES
+from a15_SyntheticMonthlytoDailyNonLocals import select_knn_years
+from a16_SyntheticMonthlytoDailyLocals import local_proportions
+from a18_ResponseLookupTable import build_response_lookup, location_lookup
+from a19_RunManifest import scenario_is_complete, mark_scenario_complete, atomic_output
+from a20_WorkQueue import publish_tasks, start_local_workers, wait_for_queue, merge_shards
+from a21_RandomStreams import spawn_stream
+from a22_OutputEncoding import create_encoded_dataset, column_chunks
+from a23_RecordedData import as_recorded_data
+from a24_RunSummary import scenario_summary, prepare_run_summary, append_scenario_summary
+from a29_HorizonChunks import DailyBlocks, write_daily_dataset, write_daily_csv
+from a30_StageCache import optimization_cell_key
+from a32_OptimizationBudget import RunBudget, summarize_budget
+from a34_DailyLineage import DAILY_STORAGES, DeferredDaily, save_daily_lineage, write_scenario_lineage, write_scenario_deferred
+
+# Result of one scenario, as returned by generate_scenario() (flows: daily m3/s, monthly million m3 per month)
+ScenarioResult = namedtuple('ScenarioResult', [
+    'number',             # file number of the scenario (Scenario{number}.h5)
+    'target_deviation',   # [2] target mean / SD deviation (%)
+    'forcing',            # [Location x 24] optimized forcing (12 mean + 12 SD change, %)
+    'distance',           # [Location] total distance from the target
+    'mean_change',        # [Location x Month] achieved mean deviation (%)
+    'sd_change',          # [Location x Month] achieved SD deviation (%)
+    'monthly_synthetic',  # [Year x Month x Location] synthetic monthly flow
+    'monthly_recorded',   # [Year x Month x Location] recorded monthly flow
+    'daily',              # [Day x (2 + Location)] synthetic year, month and daily flow of each location
+                          # (horizon_chunk_years > 0 or daily_storage = 'lineage': DailyBlocks (a29_) yielding it
+                          # in blocks of synthetic years; daily_storage = 'deferred': DeferredDaily (a34_), the inputs
+                          # of its KNN year matching)
+    'solver_log',         # [Location x Month x Solver x 2] evaluations and best distance of each solver stage
+    'budget_limited',     # [Location x Month] month problems stopped by the optimization budget (a32_)
+])
+
+# Scenario-invariant inputs of the local stations, computed once per run (prepare_local_stations())
+LocalStations = namedtuple('LocalStations', [
+    'results',            # {k: LocationResult (a11_)} of each local location (resampled, no forcing)
+    'proportions',        # daily-to-monthly proportions of the local stations (a16_), or None
+])
 
 def perform_inverse_optimization_and_disaggregation(
     Data: np.ndarray,
@@ -35,7 +72,28 @@ def perform_inverse_optimization_and_disaggregation(
     resultfolder: str,
     daily: int,
     monthly: int,
-    h5: int
+    h5: int,
+    lookup_table: int = 0,
+    lookup_refinement: int = 1,
+    response_table: tuple = None,
+    solver_mode: str = 'global',
+    scenario_numbers: list = None,
+    manifest: dict = None,
+    execution_mode: str = 'local',
+    queue_folder: str = None,
+    queue_workers: int = 0,
+    randomyear_ensemble: np.ndarray = None,
+    random_seed: int = None,
+    output_precision: str = 'float64',
+    location_chunk_size: int = 0,
+    horizon_chunk_years: int = 0,
+    stage_cache=None,
+    forcing_cache=None,
+    scenario_time_budget: float = 0,
+    run_time_budget: float = 0,
+    scenario_evaluation_budget: int = 0,
+    run_evaluation_budget: int = 0,
+    daily_storage: str = 'full'
 ):
     """
     Performs inverse optimization and monthly-to-daily disaggregation for synthetic scenarios.
@@ -52,7 +110,7 @@ def perform_inverse_optimization_and_disaggregation(
     SDseasonality_change : monthly sd target seasonality
     range_lb : Lower bounds for optimization, for forcing mean and sd change in a4_
     range_ub : Upper bounds for optimization 
-    range_flag : If 0, regenerate `randomyear`; otherwise use existing.
+    range_flag : If 0, each scenario uses its own random year matrix (from `randomyear_ensemble` or newly drawn); otherwise use `randomyear`.
     scenariofolderpass : Output folder path
     numberofyears_syntheticdata : Number of synthetic years
     numberofyears_recorded : Number of historical years in `Data`
@@ -64,180 +122,688 @@ def perform_inverse_optimization_and_disaggregation(
     daily : Save daily inflow time series CSV (1 = yes, 0 = no)
     monthly : Save monthly inflow time series CSV (1 = yes, 0 = no)
     h5 : Save HDF5 output files (1 = yes, 0 = no)
+    lookup_table : Invert targets from the forcing-response lookup table (1 = yes, 0 = differential evolution)
+    lookup_refinement : Locally refine each lookup result until distance_threshold is met (1 = yes, 0 = no)
+    response_table : Lookup table of the run (a18_); rebuilt for each scenario if `randomyear` is regenerated
+    solver_mode : 'global' = differential evolution only; 'local' = local search first, differential evolution only if distance_threshold is missed
+    scenario_numbers : File number of each scenario (Scenario{number}.h5); defaults to 1..n_scenarios
+    manifest : Run manifest (a19_); scenarios it marks complete (with valid outputs) are skipped, finished ones are recorded
+    execution_mode : 'local' = run scenarios in this process; 'queue' = publish them to the file-based work queue (a20_)
+    queue_folder : Work queue folder (on a filesystem shared by all worker nodes)
+    queue_workers : Number of worker processes started on this machine in 'queue' mode (0 = only external workers)
+    randomyear_ensemble : (range_flag = 0) [Scenario x Year x Month] random year matrices drawn up front (a2_);
+                          row number - 1 is used for scenario `number`, and the realizations are optimized in batches.
+                          If None, a new matrix is drawn for each scenario.
+    random_seed : Root seed of the run (a21_); each scenario and location draws from its own stream, so results
+                  do not depend on the execution order. None = global numpy random state (not reproducible)
+    output_precision : Storage of the flow datasets in the .h5 files: 'float64', 'float32' or 'scaled' (a22_)
+    location_chunk_size : Stations per chunk in the daily disaggregation (a15_, a16_); > 0 also makes the KNN
+                          year matching use the monthly flows summed per chunk of non-local stations. 0 = all together
+    horizon_chunk_years : Synthetic years per block of the daily disaggregation and of the daily outputs, which are
+                          appended block by block (a29_); 0 = the whole daily series at once
+    stage_cache : StageCache (a30_) of the run folder; (scenario, location) optimizations with unchanged inputs
+                  are reused from it and new ones are added. None = optimize every location
+    forcing_cache : ForcingCache (a31_) shared across runs; solved (location, month) problems are reused from it
+                    and new ones are added. None = solve every month
+    scenario_time_budget, run_time_budget : Wall-clock seconds for the optimization of each scenario / of the whole
+                                            Step 5 (a32_); 0 = unlimited
+    scenario_evaluation_budget, run_evaluation_budget : Objective evaluations of each scenario / of the whole run,
+                                                        shared equally by its locations / scenarios; 0 = unlimited
+    daily_storage : Daily series in the .h5 files: 'full' = DailyTimeSeries_Synthetic; 'lineage' = only the monthly
+                    flows and selected years of each scenario, with the proportions once per run (a34_);
+                    'deferred' = monthly outputs only, with the inputs of the KNN year matching (daily series
+                    produced later by a37_)
     """
+    if daily_storage not in DAILY_STORAGES:
+        raise ValueError(f"❌ Unknown daily_storage '{daily_storage}'. Use one of {DAILY_STORAGES}.")
+    if daily_storage == 'deferred' and (h5 == 0 or daily == 1):
+        raise ValueError("❌ daily_storage = 'deferred' Needs h5 = 1 and daily = 0 (Daily CSV Files Are Written by a37_).")
     isLocal = isLocal.flatten()
-    local_indices = np.where(isLocal == 1)[0].tolist()
+    n_scenarios = desired_scenarios1.shape[0]
+    if scenario_numbers is None:
+        scenario_numbers = list(range(1, n_scenarios + 1))
+
+    run_solver_log = np.full((n_scenarios, numberoflocations, 12, len(SOLVER_NAMES), 2), np.nan)
+    run_budget_limited = np.zeros((n_scenarios, numberoflocations, 12), dtype=bool)
+
+    # === Inputs of a single scenario (shared with queue workers) ===
+    context = dict(
+        Data=Data, randomyear=randomyear, desired_scenarios_monthly=desired_scenarios_monthly,
+        adjusted_scenarios=adjusted_scenarios, desired_scenarios1=desired_scenarios1, isLocal=isLocal,
+        meanseasonality_change=meanseasonality_change, SDseasonality_change=SDseasonality_change,
+        range_lb=range_lb, range_ub=range_ub, range_flag=range_flag,
+        numberofyears_syntheticdata=numberofyears_syntheticdata, numberofyears_recorded=numberofyears_recorded,
+        numberoflocations=numberoflocations, firstyear=firstyear, startyear_synthetic=startyear_synthetic,
+        distance_threshold=distance_threshold, enable_parallel=enable_parallel,
+        daily=daily, monthly=monthly, h5=h5,
+        lookup_table=lookup_table, lookup_refinement=lookup_refinement, response_table=response_table,
+        solver_mode=solver_mode, randomyear_ensemble=randomyear_ensemble, random_seed=random_seed,
+        output_precision=output_precision, location_chunk_size=location_chunk_size,
+        horizon_chunk_years=horizon_chunk_years, stage_cache=stage_cache, forcing_cache=forcing_cache,
+        daily_storage=daily_storage
+    )
+
+    # === Skip scenarios already completed in this run folder ===
+    pending = [sce for sce in range(n_scenarios)
+               if manifest is None or not scenario_is_complete(manifest, scenariofolderpass, scenario_numbers[sce], daily, monthly, h5)]
+
+    # === Solver logs of the skipped scenarios, so that Solver_Summary.h5 keeps covering the whole run ===
+    for sce in set(range(n_scenarios)) - set(pending):
+        saved = load_solver_log(scenariofolderpass, scenario_numbers[sce])
+        if saved is not None:
+            run_solver_log[sce], run_budget_limited[sce] = saved
+
+    # === Local stations: resampled once for every scenario ===
+    context['local_stations'] = prepare_local_stations(Data, isLocal, numberofyears_syntheticdata, numberofyears_recorded,
+                                                       location_chunk_size)
+
+    # === Daily lineage storage (a34_): disaggregation proportions saved once for every scenario ===
+    if h5 == 1 and daily_storage in ('lineage', 'deferred'):
+        save_daily_lineage(os.path.join(scenariofolderpass, 'OutputData'), Data, startyear_synthetic)
+
+    # === Optimization budgets (a32_); the run clock starts here ===
+    context['budget'] = RunBudget(scenario_time_budget, run_time_budget,
+                                  scenario_evaluation_budget, run_evaluation_budget, len(pending))
+
+    # === Plotting summary store, updated as each scenario finishes (a24_) ===
+    summary_file = prepare_run_summary(
+        scenariofolderpass, as_recorded_data(Data).monthly_totals * 0.0864,  # Convert cms.day to MCM
+        [scenario_numbers[sce] for sce in range(n_scenarios) if sce not in pending]
+    )
+
+    if execution_mode == 'queue':
+        # === Publish to the work queue, let workers (here and on other nodes) run them, then merge shards ===
+        publish_tasks(queue_folder, context, [(sce, scenario_numbers[sce]) for sce in pending])
+        workers = start_local_workers(queue_folder, queue_workers)
+        failed = wait_for_queue(queue_folder)
+        for worker in workers:
+            worker.wait()
+        # Done tasks are merged and marked complete first, so that a rerun only repeats the failed ones
+        for sce, (solver_log, summary, budget_limited) in merge_shards(queue_folder, scenariofolderpass, manifest, daily, monthly, h5).items():
+            run_solver_log[sce] = solver_log
+            run_budget_limited[sce] = budget_limited
+            append_scenario_summary(summary_file, scenario_numbers[sce], desired_scenarios1[sce, :], summary)
+        if failed:
+            raise RuntimeError(f"❌ Queue Tasks Failed for Scenarios {failed}. See {os.path.join(queue_folder, 'failed')}. "
+                               f"The other scenarios are merged; resume the run (resume = 1) to repeat the failed ones.")
+    else:
+        progress_bar = tqdm(total=n_scenarios, position=0)
+        progress_bar.update(n_scenarios - len(pending))
+
+        if range_flag == 0 and randomyear_ensemble is not None and enable_parallel:
+            # Realizations are independent: optimize the locations of several scenarios in one parallel batch
+            batch_size = max(1, -(-2 * (os.cpu_count() or 1) // numberoflocations))
+        else:
+            batch_size = 1
+
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            batch_results = {}
+            if batch_size > 1:
+                progress_bar.set_description(f"🚀 Parallel Optimization: Scenarios {scenario_numbers[batch[0]]}-{scenario_numbers[batch[-1]]}/{n_scenarios}")
+                batch_results = optimize_scenario_batch(batch, [scenario_numbers[sce] for sce in batch], **context)
+
+            for sce in batch:
+                number = scenario_numbers[sce]
+                run_solver_log[sce], summary, run_budget_limited[sce] = process_scenario(
+                    sce, number, scenariofolderpass, progress_bar=progress_bar,
+                    location_results=batch_results.get(sce), **context
+                )
+                if manifest is not None:
+                    mark_scenario_complete(manifest, scenariofolderpass, number, daily, monthly, h5)
+                append_scenario_summary(summary_file, number, desired_scenarios1[sce, :], summary)
+
+        progress_bar.close()
+
+    save_solver_summary(scenariofolderpass, run_solver_log, distance_threshold, solver_mode, run_budget_limited)
+
+    print("✅ All Scenarios Are Generated.")
+    if daily == 1: print(rf"📁 Synthetic Daily (m3/s) Timeseries Csv Files Are Saved on {resultfolder} \DailyTimeseriesCSVFiles Folder.")
+    if monthly == 1: print(rf"📁 Synthetic Monthly (million m3/month) Timeseries Csv Files Are Saved on {resultfolder} \MonthlyTimeseriesCSVFiles Folder.")
+    if h5 == 1:print(rf"📁 Detailed .h5 Data Files Are Saved on {resultfolder} \OutputData Folder.")
+
+
+def prepare_local_stations(Data, isLocal, numberofyears_syntheticdata, numberofyears_recorded, location_chunk_size=0):
+    """
+    Results and disaggregation proportions of the local stations. Locals are resampled from the recorded
+    data without forcing (a14_), so they are the same in every scenario and are computed once per run;
+    only their daily disaggregation with the KNN-selected years of each scenario runs per scenario.
+
+    The proportions are kept only with location_chunk_size = 0 (chunked runs build them per chunk, to bound memory).
+
+    Returns:
+        LocalStations record
+    """
+    local_indices = np.where(np.asarray(isLocal).flatten() == 1)[0].tolist()
+    results = {
+        k: optimize_forcing_scenario(  # The optimization inputs are not used for local stations
+            Data, k, 1, numberofyears_syntheticdata, None, numberofyears_recorded,
+            None, None, None, None, None, None
+        )
+        for k in local_indices
+    }
+    proportions = local_proportions(Data, local_indices) if location_chunk_size <= 0 else None
+    return LocalStations(results=results, proportions=proportions)
+
+
+def scenario_random_years(number, Data, randomyear, randomyear_ensemble, isLocal, range_flag,
+                          numberofyears_syntheticdata, numberoflocations, range_lb, range_ub,
+                          lookup_table, response_table, random_seed=None):
+    """
+    Random year matrix (and lookup table) of scenario `number`.
+
+    With range_flag = 0 every scenario has its own matrix: row number - 1 of `randomyear_ensemble`,
+    or a newly drawn matrix if there is no ensemble. The lookup table is rebuilt for that matrix.
+
+    Returns:
+        randomyear : [Year x Month] random year matrix
+        response_table : lookup table (a18_) for `randomyear`, or None
+    """
+    if range_flag == 0:
+        if randomyear_ensemble is not None:
+            randomyear = randomyear_ensemble[number - 1]
+        else:
+            randomyear = matrix_year(Data, numberofyears_syntheticdata, rng=spawn_stream(random_seed, 'randomyear', number))
+        if lookup_table == 1:
+            response_table = build_response_lookup(
+                Data, isLocal, numberofyears_syntheticdata, numberoflocations,
+                randomyear, range_lb, range_ub, show_progress=False
+            )
+    return randomyear, (response_table if lookup_table == 1 else None)
+
+
+def location_target(sce, k, isLocal, desired_scenarios_monthly, adjusted_scenarios):
+    """
+    Monthly target of location k in scenario row `sce`: the adjusted target of a non-local location,
+    the desired target of a local one.
+    """
+    return adjusted_scenarios[sce, :, k] if isLocal[k] == 0 else desired_scenarios_monthly[sce, :]
+
+
+def location_cell_keys(
+    sce, number, randomyear, Data, isLocal, desired_scenarios_monthly, adjusted_scenarios,
+    meanseasonality_change, SDseasonality_change, range_lb, range_ub,
+    numberofyears_syntheticdata, numberoflocations, distance_threshold,
+    lookup_table, lookup_refinement, solver_mode, random_seed
+):
+    """
+    Stage cache keys (a30_) of the location optimizations of scenario row `sce` (file number `number`).
+    """
+    return [
+        optimization_cell_key(
+            Data, k, isLocal[k], randomyear,
+            location_target(sce, k, isLocal, desired_scenarios_monthly, adjusted_scenarios),
+            meanseasonality_change[k, :], SDseasonality_change[k, :], range_lb, range_ub,
+            numberofyears_syntheticdata, distance_threshold,
+            lookup_table, lookup_refinement, solver_mode, random_seed, number
+        )
+        for k in range(numberoflocations)
+    ]
+
+
+def optimize_location(
+    sce, number, k, randomyear, response_table,
+    Data, isLocal, desired_scenarios_monthly, adjusted_scenarios,
+    meanseasonality_change, SDseasonality_change, range_lb, range_ub,
+    numberofyears_syntheticdata, numberofyears_recorded, numberoflocations,
+    distance_threshold, lookup_refinement, solver_mode, random_seed=None, forcing_cache=None, budget=None
+):
+    """
+    Optimizes the forcing scenario of location k for scenario row `sce` (file number `number`, see a11_),
+    within the LocationBudget `budget` (a32_) if given.
+
+    Returns:
+        LocationResult record of location k (a11_)
+    """
+    monthly_scenario = location_target(sce, k, isLocal, desired_scenarios_monthly, adjusted_scenarios)
+    location_table = location_lookup(response_table, k) if response_table is not None and isLocal[k] == 0 else None
+    return optimize_forcing_scenario(
+        Data, k, isLocal[k],
+        numberofyears_syntheticdata, randomyear,
+        numberofyears_recorded, monthly_scenario,
+        meanseasonality_change[k, :], SDseasonality_change[k, :],
+        range_lb, range_ub, distance_threshold,
+        location_table, lookup_refinement, solver_mode,
+        spawn_stream(random_seed, 'optimizer', number, k), forcing_cache, budget
+    )
+
+
+def optimize_scenario_batch(
+    batch, numbers,
+    Data, randomyear, desired_scenarios_monthly, adjusted_scenarios, desired_scenarios1,
+    isLocal, meanseasonality_change, SDseasonality_change,
+    range_lb, range_ub, range_flag,
+    numberofyears_syntheticdata, numberofyears_recorded, numberoflocations,
+    firstyear, startyear_synthetic, distance_threshold, enable_parallel,
+    daily, monthly, h5,
+    lookup_table, lookup_refinement, response_table, solver_mode,
+    randomyear_ensemble=None, random_seed=None, output_precision='float64', location_chunk_size=0,
+    horizon_chunk_years=0, stage_cache=None, forcing_cache=None, budget=None, local_stations=None,
+    daily_storage='full'
+):
+    """
+    Optimizes all locations of several scenarios in one parallel batch (no barrier between scenarios).
+
+    Parameters are those of process_scenario, with lists of scenario rows (`batch`) and file numbers (`numbers`).
+
+    Returns:
+        batch_results : {sce: list of per-location LocationResult records (a11_)}
+    """
+    jobs = []
+    batch_results = {sce: [None] * numberoflocations for sce in batch}
+    for sce in batch:
+        for k, result in (local_stations.results.items() if local_stations is not None else ()):
+            batch_results[sce][k] = result
+    location_budget = None if budget is None else budget.location_budget(time.time(), int(np.sum(isLocal == 0)))
+    cell_keys = {}
+    for sce, number in zip(batch, numbers):
+        randomyear_s, response_table_s = scenario_random_years(
+            number, Data, randomyear, randomyear_ensemble, isLocal, range_flag,
+            numberofyears_syntheticdata, numberoflocations, range_lb, range_ub,
+            lookup_table, response_table, random_seed
+        )
+        if stage_cache is not None:
+            keys = location_cell_keys(
+                sce, number, randomyear_s, Data, isLocal, desired_scenarios_monthly, adjusted_scenarios,
+                meanseasonality_change, SDseasonality_change, range_lb, range_ub,
+                numberofyears_syntheticdata, numberoflocations, distance_threshold,
+                lookup_table, lookup_refinement, solver_mode, random_seed
+            )
+            for k, key in enumerate(keys):
+                cell_keys[(sce, k)] = key
+                if batch_results[sce][k] is None:
+                    batch_results[sce][k] = stage_cache.get_cell(key)
+        jobs += [(sce, number, k, randomyear_s, response_table_s) for k in range(numberoflocations)
+                 if batch_results[sce][k] is None]
+
+    results = Parallel(n_jobs=-1)(
+        delayed(optimize_location)(
+            sce, number, k, randomyear_s, response_table_s,
+            Data, isLocal, desired_scenarios_monthly, adjusted_scenarios,
+            meanseasonality_change, SDseasonality_change, range_lb, range_ub,
+            numberofyears_syntheticdata, numberofyears_recorded, numberoflocations,
+            distance_threshold, lookup_refinement, solver_mode, random_seed, forcing_cache, location_budget
+        )
+        for sce, number, k, randomyear_s, response_table_s in jobs
+    )
+
+    for (sce, _, k, _, _), result in zip(jobs, results):
+        batch_results[sce][k] = result
+        if stage_cache is not None and not result.budget_limited.any():
+            stage_cache.put_cell(cell_keys[(sce, k)], result)
+    return batch_results
+
+
+def generate_scenario(
+    sce, number,
+    Data, randomyear, desired_scenarios_monthly, adjusted_scenarios, desired_scenarios1,
+    isLocal, meanseasonality_change, SDseasonality_change,
+    range_lb, range_ub, range_flag,
+    numberofyears_syntheticdata, numberofyears_recorded, numberoflocations,
+    firstyear, startyear_synthetic, distance_threshold, enable_parallel,
+    daily, monthly, h5,
+    lookup_table, lookup_refinement, response_table, solver_mode,
+    randomyear_ensemble=None, random_seed=None, output_precision='float64', location_chunk_size=0,
+    horizon_chunk_years=0, stage_cache=None, forcing_cache=None, budget=None, local_stations=None,
+    daily_storage='full', progress_bar=None, location_results=None
+):
+    """
+    Optimizes and disaggregates one scenario in memory (nothing is written; see save_scenario).
+
+    Parameters are those of perform_inverse_optimization_and_disaggregation (for a single scenario), plus:
+        sce : Row of the scenario in desired_scenarios1 / adjusted_scenarios
+        number : File number of the scenario (Scenario{number}.h5)
+        budget : (Optional) RunBudget (a32_) of the run; perform_inverse_optimization_and_disaggregation sets it
+        local_stations : (Optional) LocalStations record of the run (prepare_local_stations()); None = resample the
+                         local stations for this scenario
+        daily_storage : (Optional) 'lineage' = the daily series is returned as DailyBlocks and only disaggregated
+                        if it is iterated (e.g. for the daily CSV file); 'deferred' = no KNN year matching, the daily
+                        series is returned as DeferredDaily (a34_)
+        progress_bar : (Optional) tqdm progress bar to update
+        location_results : (Optional) per-location optimization results already computed (optimize_scenario_batch)
+
+    Returns:
+        ScenarioResult record of the scenario
+    """
     nonlocal_indices = np.where(isLocal == 0)[0].tolist()
-    numlocals = len(local_indices)
     numnonlocals = len(nonlocal_indices)
     n_scenarios = desired_scenarios1.shape[0]
 
-    progress_bar = tqdm(total=n_scenarios, position=0)
-
-    for sce in range(n_scenarios):
-        # === Initialize output containers ===
-        scenario = np.zeros((numberoflocations, 24))
-        dist = np.zeros(numberoflocations)
-        mean_change_syn = np.zeros((numberoflocations, 12))
-        SD_change_syn = np.zeros((numberoflocations, 12))
-        Monthly_Synthetic = np.zeros((numberofyears_syntheticdata - 1, 12, numberoflocations))
-        Monthly_Recorded = np.zeros((numberofyears_recorded, 12, numberoflocations))
-
-        # === Generate new random year matrix if required ===
-        if range_flag == 0:
-            randomyear = matrix_year(Data, numberofyears_syntheticdata)
-
-        # === Optimize each location's forcing scenario ===
-        def optimize_one(k):
-            monthly_scenario = (
-                adjusted_scenarios[sce, :, k] if isLocal[k] == 0
-                else desired_scenarios_monthly[sce, :]
-            )
-            return optimize_forcing_scenario(
-                Data, k, isLocal[k],
-                numberofyears_syntheticdata, randomyear,
-                numberofyears_recorded, monthly_scenario,
-                meanseasonality_change[k, :], SDseasonality_change[k, :],
-                range_lb, range_ub,
-                np.zeros_like(Monthly_Synthetic),
-                np.zeros_like(Monthly_Recorded),
-                np.zeros_like(scenario),
-                np.zeros_like(dist),
-                np.zeros_like(mean_change_syn),
-                np.zeros_like(SD_change_syn),
-                distance_threshold
+    # === Initialize output containers ===
+    scenario = np.zeros((numberoflocations, 24))
+    dist = np.zeros(numberoflocations)
+    mean_change_syn = np.zeros((numberoflocations, 12))
+    SD_change_syn = np.zeros((numberoflocations, 12))
+    Monthly_Synthetic = np.zeros((numberofyears_syntheticdata - 1, 12, numberoflocations))
+    Monthly_Recorded = np.zeros((numberofyears_recorded, 12, numberoflocations))
+    solver_log = np.full((numberoflocations, 12, len(SOLVER_NAMES), 2), np.nan)
+    budget_limited = np.zeros((numberoflocations, 12), dtype=bool)
+
+    # === Optimize each location's forcing scenario ===
+    if location_results is None:
+        randomyear, response_table = scenario_random_years(
+            number, Data, randomyear, randomyear_ensemble, isLocal, range_flag,
+            numberofyears_syntheticdata, numberoflocations, range_lb, range_ub,
+            lookup_table, response_table, random_seed
+        )
+        location_args = (
+            Data, isLocal, desired_scenarios_monthly, adjusted_scenarios,
+            meanseasonality_change, SDseasonality_change, range_lb, range_ub,
+            numberofyears_syntheticdata, numberofyears_recorded, numberoflocations,
+            distance_threshold, lookup_refinement, solver_mode, random_seed, forcing_cache,
+            None if budget is None else budget.location_budget(time.time(), numnonlocals)
+        )
+
+        # === Reuse the locations whose optimization inputs are unchanged (a30_) ===
+        location_results = [None] * numberoflocations
+        for k, result in (local_stations.results.items() if local_stations is not None else ()):
+            location_results[k] = result
+        if stage_cache is not None:
+            cell_keys = location_cell_keys(
+                sce, number, randomyear, Data, isLocal, desired_scenarios_monthly, adjusted_scenarios,
+                meanseasonality_change, SDseasonality_change, range_lb, range_ub,
+                numberofyears_syntheticdata, numberoflocations, distance_threshold,
+                lookup_table, lookup_refinement, solver_mode, random_seed
             )
+            location_results = [stage_cache.get_cell(key) if location_results[k] is None else location_results[k]
+                                for k, key in enumerate(cell_keys)]
+        pending_locations = [k for k in range(numberoflocations) if location_results[k] is None]
 
         if enable_parallel:
-            progress_bar.set_description(f"🚀 Parallel Optimization: Scenario {sce+1}/{n_scenarios}")
-            results = Parallel(n_jobs=-1)(delayed(optimize_one)(k) for k in range(numberoflocations))
-            for k, (scen_k, dist_k, mean_k, sd_k, synth_k, rec_k) in enumerate(results):
-                scenario[k, :] = scen_k[k, :]
-                dist[k] = dist_k[k]
-                mean_change_syn[k, :] = mean_k[k, :]
-                SD_change_syn[k, :] = sd_k[k, :]
-                Monthly_Synthetic[:, :, k] = synth_k[:, :, k]
-                Monthly_Recorded[:, :, k] = rec_k[:, :, k]
+            if progress_bar is not None:
+                progress_bar.set_description(f"🚀 Parallel Optimization: Scenario {number}/{n_scenarios}")
+            computed = Parallel(n_jobs=-1)(
+                delayed(optimize_location)(sce, number, k, randomyear, response_table, *location_args)
+                for k in pending_locations
+            )
         else:
-            for k in range(numberoflocations):
-                progress_bar.set_description(f"🚀 Optimizing Scenario {sce+1} Loc {k+1}/{numberoflocations}")
-                monthly_scenario = (
-                    adjusted_scenarios[sce, :, k] if isLocal[k] == 0
-                    else desired_scenarios_monthly[sce, :]
-                )
-                scenario, dist, mean_change_syn, SD_change_syn, Monthly_Synthetic, Monthly_Recorded = optimize_forcing_scenario(
-                    Data, k, isLocal[k],
-                    numberofyears_syntheticdata, randomyear,
-                    numberofyears_recorded, monthly_scenario,
-                    meanseasonality_change[k, :], SDseasonality_change[k, :],
-                    range_lb, range_ub,
-                    Monthly_Synthetic, Monthly_Recorded,
-                    scenario, dist, mean_change_syn, SD_change_syn,
-                    distance_threshold
-                )
+            computed = []
+            for k in pending_locations:
+                if progress_bar is not None:
+                    progress_bar.set_description(f"🚀 Optimizing Scenario {number} Loc {k+1}/{numberoflocations}")
+                computed.append(optimize_location(sce, number, k, randomyear, response_table, *location_args))
+
+        for k, result in zip(pending_locations, computed):
+            location_results[k] = result
+            if stage_cache is not None and not result.budget_limited.any():  # Budget-limited results are not reused
+                stage_cache.put_cell(cell_keys[k], result)
 
+    # === Assemble the per-location records into the scenario arrays ===
+    for k, result in enumerate(location_results):
+        scenario[k, :] = result.forcing
+        dist[k] = result.distance
+        mean_change_syn[k, :] = result.mean_change
+        SD_change_syn[k, :] = result.sd_change
+        Monthly_Synthetic[:, :, k] = result.monthly_synthetic
+        Monthly_Recorded[:, :, k] = result.monthly_recorded
+        solver_log[k] = result.solver_log
+        budget_limited[k] = result.budget_limited
+
+    if progress_bar is not None:
         progress_bar.update(1)
 
-        # === Monthly to Daily disaggregation ===
-        if numnonlocals > 0:
-            section_nonlocal, selected_years = synthetic_monthly_to_daily_nonlocals(
-                Data, Monthly_Synthetic[:, :, nonlocal_indices], Monthly_Recorded[:, :, nonlocal_indices],
-                firstyear, startyear_synthetic, numberofyears_recorded,
-                nonlocal_indices
-            )
-        else:
-            section_nonlocal = np.empty((0, 0))
-            selected_years = np.empty((numberofyears_syntheticdata - 1,), dtype=int)
-
-        if numlocals > 0:
-            section_local = synthetic_monthly_to_daily_locals(
-                Data, Monthly_Synthetic[:, :, local_indices], Monthly_Recorded[:, :, local_indices],
-                selected_years.reshape(-1, 1), firstyear, startyear_synthetic,
-                local_indices
-            )
-        else:
-            section_local = np.empty((0, 0))
-
-        if section_nonlocal.shape[0] == 0 and section_local.shape[0] == 0:
-            raise ValueError("❌ No output generated: both local and non-local sections are empty.")
-
-        base = section_nonlocal if section_nonlocal.shape[0] > 0 else section_local
-        year_month = base[:, :2]
-        station_cols = [None] * numberoflocations
-
-        if section_nonlocal.shape[1] > 2:
-            for idx, k in enumerate(nonlocal_indices):
-                station_cols[k] = section_nonlocal[:, 2 + idx].reshape(-1, 1)
-        if section_local.shape[1] > 2:
-            for idx, k in enumerate(local_indices):
-                station_cols[k] = section_local[:, 2 + idx].reshape(-1, 1)
-
-        DailyTimeSeries_Synthetic = np.hstack([year_month] + [station_cols[i] for i in range(numberoflocations)])
-
-        # === Save Outputs ===
-        csv_dir = os.path.join(scenariofolderpass, 'DailyTimeseriesCSVFiles')
-        monthly_dir = os.path.join(scenariofolderpass, 'MonthlyTimeseriesCSVFiles')
-        h5_dir = os.path.join(scenariofolderpass, 'OutputData')
-        os.makedirs(csv_dir, exist_ok=True)
-        os.makedirs(monthly_dir, exist_ok=True)
-        os.makedirs(h5_dir, exist_ok=True)
-
-        if daily == 1:
-            inflow = DailyTimeSeries_Synthetic.copy()
-            inflow[:, 2:] = (inflow[:, 2:])
-            pd.DataFrame(inflow).to_csv(os.path.join(csv_dir, f'SynDailyInflow_Scenario_{sce+1}.csv'), index=False, header=False)
-        
-        Monthly_Synthetic = Monthly_Synthetic * 0.0864 # Convert cms.day to MCM
-        Monthly_Recorded = Monthly_Recorded * 0.0864
-
-        if monthly == 1:
-            years = np.arange(1, numberofyears_syntheticdata)
-            ym_grid = np.array([[y, m] for y in years for m in range(1, 13)])
-            monthly_flat = Monthly_Synthetic.reshape(-1, numberoflocations)
-            monthly_csv = np.hstack([ym_grid, monthly_flat])
-            pd.DataFrame(monthly_csv).to_csv(os.path.join(monthly_dir, f'SynMonthlyInflow_Scenario_{sce+1}.csv'), index=False, header=False)
-
-        if h5 == 1:
-            with h5py.File(os.path.join(h5_dir, f'Scenario{sce+1}.h5'), 'w') as h5f:
-                ds1 = h5f.create_dataset('Opt_Forcing_Scenario[Location x 24]', data=scenario)
-                ds1.attrs['dimension'] = 'Location x 24 (12 mean + 12 SD)'
-                ds1.attrs['description'] = 'Optimized forcing scenarios (mean and SD) for each location'
-
-                ds2 = h5f.create_dataset('Sum_Distance_FromTarget[Location x 1]', data=dist)
-                ds2.attrs['dimension'] = 'Location'
-                ds2.attrs['description'] = 'Total Euclidean distance from target per location'
-
-                ds3 = h5f.create_dataset('Monthly_Synthetic(million m3 per month)[Year x Month x Location]', data=Monthly_Synthetic)
-                ds3.attrs['dimension'] = 'Year x Month x Location'
-                ds3.attrs['description'] = 'Synthetic monthly streamflow for each location and year'
-
-                ds4 = h5f.create_dataset('Monthly_Recorded(million m3 per month)[Year x Month x Location]', data=Monthly_Recorded)
-                ds4.attrs['dimension'] = 'Year x Month x Location'
-                ds4.attrs['description'] = 'Recorded (historical) monthly streamflow data'
-
-                ds5 = h5f.create_dataset('DailyTimeSeries_Synthetic(m3 per s)[Day x Location]', data=DailyTimeSeries_Synthetic)
+    # === Deferred daily series: the KNN year matching and disaggregation are left to a37_ ===
+    if daily_storage == 'deferred':
+        DailyTimeSeries_Synthetic = DeferredDaily(Monthly_Synthetic, Monthly_Recorded, nonlocal_indices, firstyear,
+                                                  random_seed, number, location_chunk_size)
+        return ScenarioResult(
+            number=number, target_deviation=desired_scenarios1[sce, :].copy(),
+            forcing=scenario, distance=dist, mean_change=mean_change_syn, sd_change=SD_change_syn,
+            monthly_synthetic=Monthly_Synthetic * 0.0864, monthly_recorded=Monthly_Recorded * 0.0864,  # Convert cms.day to MCM
+            daily=DailyTimeSeries_Synthetic, solver_log=solver_log, budget_limited=budget_limited
+        )
+
+    # === Monthly to Daily disaggregation (KNN year matching on the non-local stations) ===
+    if numnonlocals > 0:
+        selected_years = select_knn_years(
+            Monthly_Synthetic[:, :, nonlocal_indices], Monthly_Recorded[:, :, nonlocal_indices],
+            firstyear, numberofyears_recorded,
+            spawn_stream(random_seed, 'knn', number), location_chunk_size, horizon_chunk_years
+        )
+    else:
+        selected_years = np.empty((numberofyears_syntheticdata - 1,), dtype=int)
+
+    daily_blocks = DailyBlocks(
+        as_recorded_data(Data), Monthly_Synthetic, Monthly_Recorded, selected_years, isLocal,
+        firstyear, startyear_synthetic, horizon_chunk_years, location_chunk_size,
+        local_stations.proportions if local_stations is not None else None
+    )
+    if horizon_chunk_years > 0 or daily_storage == 'lineage':
+        DailyTimeSeries_Synthetic = daily_blocks  # Disaggregated block by block when it is saved or iterated
+    else:
+        DailyTimeSeries_Synthetic = daily_blocks.block(0, daily_blocks.n_years)
+
+    return ScenarioResult(
+        number=number, target_deviation=desired_scenarios1[sce, :].copy(),
+        forcing=scenario, distance=dist, mean_change=mean_change_syn, sd_change=SD_change_syn,
+        monthly_synthetic=Monthly_Synthetic * 0.0864, monthly_recorded=Monthly_Recorded * 0.0864,  # Convert cms.day to MCM
+        daily=DailyTimeSeries_Synthetic, solver_log=solver_log, budget_limited=budget_limited
+    )
+
+
+def save_scenario(result, outputfolder, daily, monthly, h5, output_precision,
+                  meanseasonality_change, SDseasonality_change, daily_storage='full'):
+    """
+    Writes the outputs of one scenario (CSV time series and Scenario{number}.h5, as selected by the flags).
+
+    Parameters:
+        result : ScenarioResult record (generate_scenario); a DailyBlocks daily series is written block by block
+        outputfolder : Folder where the output subfolders (OutputData, ...) are written
+        daily, monthly, h5 : Output flags (1 = save, 0 = do not save)
+        output_precision : Storage of the flow datasets in the .h5 file (a22_)
+        meanseasonality_change, SDseasonality_change : Target seasonality patterns (saved in the .h5 file)
+        daily_storage : 'full' = DailyTimeSeries_Synthetic in the .h5 file; 'lineage' = its lineage (a34_);
+                        'deferred' = the inputs of its lineage (a34_)
+    """
+    number = result.number
+    scenario, dist = result.forcing, result.distance
+    mean_change_syn, SD_change_syn = result.mean_change, result.sd_change
+    Monthly_Synthetic, Monthly_Recorded = result.monthly_synthetic, result.monthly_recorded
+    DailyTimeSeries_Synthetic, solver_log = result.daily, result.solver_log
+    numberoflocations = scenario.shape[0]
+
+    # === Save Outputs ===
+    csv_dir = os.path.join(outputfolder, 'DailyTimeseriesCSVFiles')
+    monthly_dir = os.path.join(outputfolder, 'MonthlyTimeseriesCSVFiles')
+    h5_dir = os.path.join(outputfolder, 'OutputData')
+    os.makedirs(csv_dir, exist_ok=True)
+    os.makedirs(monthly_dir, exist_ok=True)
+    os.makedirs(h5_dir, exist_ok=True)
+
+    if daily == 1 and isinstance(DailyTimeSeries_Synthetic, DailyBlocks):
+        with atomic_output(os.path.join(csv_dir, f'SynDailyInflow_Scenario_{number}.csv')) as part_path:
+            write_daily_csv(part_path, DailyTimeSeries_Synthetic)
+    elif daily == 1:
+        inflow = DailyTimeSeries_Synthetic.copy()
+        inflow[:, 2:] = (inflow[:, 2:])
+        with atomic_output(os.path.join(csv_dir, f'SynDailyInflow_Scenario_{number}.csv')) as part_path:
+            pd.DataFrame(inflow).to_csv(part_path, index=False, header=False)
+
+    if monthly == 1:
+        years = np.arange(1, Monthly_Synthetic.shape[0] + 1)
+        ym_grid = np.array([[y, m] for y in years for m in range(1, 13)])
+        monthly_flat = Monthly_Synthetic.reshape(-1, numberoflocations)
+        monthly_csv = np.hstack([ym_grid, monthly_flat])
+        with atomic_output(os.path.join(monthly_dir, f'SynMonthlyInflow_Scenario_{number}.csv')) as part_path:
+            pd.DataFrame(monthly_csv).to_csv(part_path, index=False, header=False)
+
+    if h5 == 1:
+        with atomic_output(os.path.join(h5_dir, f'Scenario{number}.h5')) as part_path, h5py.File(part_path, 'w') as h5f:
+            ds1 = h5f.create_dataset('Opt_Forcing_Scenario[Location x 24]', data=scenario)
+            ds1.attrs['dimension'] = 'Location x 24 (12 mean + 12 SD)'
+            ds1.attrs['description'] = 'Optimized forcing scenarios (mean and SD) for each location'
+
+            ds2 = h5f.create_dataset('Sum_Distance_FromTarget[Location x 1]', data=dist)
+            ds2.attrs['dimension'] = 'Location'
+            ds2.attrs['description'] = 'Total Euclidean distance from target per location'
+
+            ds3 = create_encoded_dataset(h5f, 'Monthly_Synthetic(million m3 per month)[Year x Month x Location]', Monthly_Synthetic, output_precision,
+                                         chunks=column_chunks(Monthly_Synthetic.shape))
+            ds3.attrs['dimension'] = 'Year x Month x Location'
+            ds3.attrs['description'] = 'Synthetic monthly streamflow for each location and year'
+
+            ds4 = create_encoded_dataset(h5f, 'Monthly_Recorded(million m3 per month)[Year x Month x Location]', Monthly_Recorded, output_precision)
+            ds4.attrs['dimension'] = 'Year x Month x Location'
+            ds4.attrs['description'] = 'Recorded (historical) monthly streamflow data'
+
+            if daily_storage == 'lineage':
+                write_scenario_lineage(h5f, DailyTimeSeries_Synthetic.Monthly_Synthetic,
+                                       DailyTimeSeries_Synthetic.selected_years)
+            elif daily_storage == 'deferred':
+                write_scenario_deferred(h5f, DailyTimeSeries_Synthetic)
+            elif isinstance(DailyTimeSeries_Synthetic, DailyBlocks):
+                ds5 = write_daily_dataset(h5f, 'DailyTimeSeries_Synthetic(m3 per s)[Day x Location]', DailyTimeSeries_Synthetic,
+                                          output_precision)
+            else:
+                ds5 = create_encoded_dataset(h5f, 'DailyTimeSeries_Synthetic(m3 per s)[Day x Location]', DailyTimeSeries_Synthetic,
+                                             output_precision, calendar_columns=2, chunks=column_chunks(DailyTimeSeries_Synthetic.shape))
+            if daily_storage == 'full':
                 ds5.attrs['dimension'] = 'Day x Location'
                 ds5.attrs['description'] = 'Final synthetic daily streamflow per location'
 
-                ds6 = h5f.create_dataset('Opt_Mean_Deviation[Location x Month]', data=mean_change_syn)
-                ds6.attrs['dimension'] = 'Location x Month'
-                ds6.attrs['description'] = 'Actual mean deviation achieved by optimization for each location/month'
+            ds6 = h5f.create_dataset('Opt_Mean_Deviation[Location x Month]', data=mean_change_syn)
+            ds6.attrs['dimension'] = 'Location x Month'
+            ds6.attrs['description'] = 'Actual mean deviation achieved by optimization for each location/month'
 
-                ds7 = h5f.create_dataset('Opt_SD_Deviation[Location x Month]', data=SD_change_syn)
-                ds7.attrs['dimension'] = 'Location x Month'
-                ds7.attrs['description'] = 'Actual standard deviation deviation achieved by optimization for each location/month'
+            ds7 = h5f.create_dataset('Opt_SD_Deviation[Location x Month]', data=SD_change_syn)
+            ds7.attrs['dimension'] = 'Location x Month'
+            ds7.attrs['description'] = 'Actual standard deviation deviation achieved by optimization for each location/month'
 
-                ds8 = h5f.create_dataset('Opt_Sesonality_Mean[Location x Month]', data=meanseasonality_change.astype(np.float64))
-                ds8.attrs['dimension'] = 'Location x Month'
-                ds8.attrs['description'] = 'Target mean seasonality pattern used in optimization'
+            ds8 = h5f.create_dataset('Opt_Sesonality_Mean[Location x Month]', data=meanseasonality_change.astype(np.float64))
+            ds8.attrs['dimension'] = 'Location x Month'
+            ds8.attrs['description'] = 'Target mean seasonality pattern used in optimization'
 
-                ds9 = h5f.create_dataset('Opt_Sesonality_SD[Location x Month]', data=SDseasonality_change.astype(np.float64))
-                ds9.attrs['dimension'] = 'Location x Month'
-                ds9.attrs['description'] = 'Target standard deviation seasonality pattern used in optimization'
+            ds9 = h5f.create_dataset('Opt_Sesonality_SD[Location x Month]', data=SDseasonality_change.astype(np.float64))
+            ds9.attrs['dimension'] = 'Location x Month'
+            ds9.attrs['description'] = 'Target standard deviation seasonality pattern used in optimization'
 
-    progress_bar.close()
+            ds10 = h5f.create_dataset('Solver_Evaluations[Location x Month x Solver]', data=solver_log[:, :, :, 0])
+            ds10.attrs['dimension'] = 'Location x Month x Solver'
+            ds10.attrs['description'] = 'Objective evaluations of each solver stage (NaN = solver not used)'
+            ds10.attrs['solvers'] = np.array(SOLVER_NAMES, dtype='S')
 
-    print("✅ All Scenarios Are Generated.")
-    if daily == 1: print(rf"📁 Synthetic Daily (m3/s) Timeseries Csv Files Are Saved on {resultfolder} \DailyTimeseriesCSVFiles Folder.")
-    if monthly == 1: print(rf"📁 Synthetic Monthly (million m3/month) Timeseries Csv Files Are Saved on {resultfolder} \MonthlyTimeseriesCSVFiles Folder.")
-    if h5 == 1:print(rf"📁 Detailed .h5 Data Files Are Saved on {resultfolder} \OutputData Folder.")
+            ds11 = h5f.create_dataset('Solver_Distance[Location x Month x Solver]', data=solver_log[:, :, :, 1])
+            ds11.attrs['dimension'] = 'Location x Month x Solver'
+            ds11.attrs['description'] = 'Best monthly distance from target after each solver stage (NaN = solver not used)'
+            ds11.attrs['solvers'] = np.array(SOLVER_NAMES, dtype='S')
+
+            if result.budget_limited.any():
+                ds12 = h5f.create_dataset('Budget_Limited[Location x Month]', data=result.budget_limited.astype(np.uint8))
+                ds12.attrs['dimension'] = 'Location x Month'
+                ds12.attrs['description'] = 'Month problems stopped by the optimization budget (1 = best forcing found within the budget)'
+
+            h5f.attrs['target_deviation'] = result.target_deviation
+            h5f.attrs['output_precision'] = output_precision
+            h5f.attrs['complete'] = 1
+
+
+
+def process_scenario(
+    sce, number, outputfolder,
+    Data, randomyear, desired_scenarios_monthly, adjusted_scenarios, desired_scenarios1,
+    isLocal, meanseasonality_change, SDseasonality_change,
+    range_lb, range_ub, range_flag,
+    numberofyears_syntheticdata, numberofyears_recorded, numberoflocations,
+    firstyear, startyear_synthetic, distance_threshold, enable_parallel,
+    daily, monthly, h5,
+    lookup_table, lookup_refinement, response_table, solver_mode,
+    randomyear_ensemble=None, random_seed=None, output_precision='float64', location_chunk_size=0,
+    horizon_chunk_years=0, stage_cache=None, forcing_cache=None, budget=None, local_stations=None,
+    daily_storage='full', progress_bar=None, location_results=None
+):
+    """
+    Optimizes, disaggregates and saves one scenario.
+
+    Parameters are those of generate_scenario, plus:
+        outputfolder : Folder where the output subfolders (OutputData, ...) are written
+
+    Returns:
+        solver_log : [Location x Month x Solver x 2] solver evaluations and distances (see a11_)
+        summary : plotting summary of the scenario (a24_)
+        budget_limited : [Location x Month] month problems stopped by the optimization budget (a32_)
+    """
+    result = generate_scenario(
+        sce, number,
+        Data, randomyear, desired_scenarios_monthly, adjusted_scenarios, desired_scenarios1,
+        isLocal, meanseasonality_change, SDseasonality_change,
+        range_lb, range_ub, range_flag,
+        numberofyears_syntheticdata, numberofyears_recorded, numberoflocations,
+        firstyear, startyear_synthetic, distance_threshold, enable_parallel,
+        daily, monthly, h5,
+        lookup_table, lookup_refinement, response_table, solver_mode,
+        randomyear_ensemble, random_seed, output_precision, location_chunk_size,
+        horizon_chunk_years, stage_cache, forcing_cache, budget, local_stations, daily_storage,
+        progress_bar, location_results
+    )
+    save_scenario(result, outputfolder, daily, monthly, h5, output_precision,
+                  meanseasonality_change, SDseasonality_change, daily_storage)
+    return (result.solver_log, scenario_summary(result.monthly_synthetic, result.mean_change, result.sd_change, result.distance),
+            result.budget_limited)
+
+
+
+
+def load_solver_log(scenariofolderpass, number):
+    """
+    Solver log and budget-limited month problems saved in Scenario{number}.h5 (h5 = 1).
+
+    Returns:
+        (solver_log [Location x Month x Solver x 2], budget_limited [Location x Month]), or None if not saved
+    """
+    path = os.path.join(scenariofolderpass, 'OutputData', f'Scenario{number}.h5')
+    if not os.path.exists(path):
+        return None
+    with h5py.File(path, 'r') as h5f:
+        if 'Solver_Evaluations[Location x Month x Solver]' not in h5f:
+            return None
+        solver_log = np.stack([h5f['Solver_Evaluations[Location x Month x Solver]'][()],
+                               h5f['Solver_Distance[Location x Month x Solver]'][()]], axis=-1)
+        budget_limited = (h5f['Budget_Limited[Location x Month]'][()].astype(bool)
+                          if 'Budget_Limited[Location x Month]' in h5f else np.zeros(solver_log.shape[:2], dtype=bool))
+    return solver_log, budget_limited
+
+
+def save_solver_summary(scenariofolderpass, run_solver_log, distance_threshold, solver_mode, run_budget_limited=None):
+    """
+    Prints and saves (OutputData/Solver_Summary.h5) the success rate and evaluation count of each solver,
+    and the month problems stopped by the optimization budget (a32_) with the distance they ended at.
+    A saved summary is kept when the log holds no solver run (e.g. a resumed run without .h5 outputs
+    whose scenarios were all complete).
+    """
+    summary_path = os.path.join(scenariofolderpass, 'OutputData', 'Solver_Summary.h5')
+    if np.isnan(run_solver_log).all() and os.path.exists(summary_path):
+        return
+    attempts, successes, evaluations = summarize_solver_log(run_solver_log, distance_threshold)
+    for i, solver in enumerate(SOLVER_NAMES):
+        if attempts[i] > 0:
+            print(f"🧮 Solver '{solver}': {attempts[i]} Month Problems, {100 * successes[i] / attempts[i]:.1f}% Within Threshold, "
+                  f"{evaluations[i] / attempts[i]:.0f} Evaluations per Problem.")
+
+    h5_dir = os.path.join(scenariofolderpass, 'OutputData')
+    os.makedirs(h5_dir, exist_ok=True)
+    with h5py.File(summary_path, 'w') as h5f:
+        ds1 = h5f.create_dataset('Attempts[Solver]', data=attempts)
+        ds1.attrs['dimension'] = 'Solver'
+        ds1.attrs['description'] = 'Number of (scenario, location, month) problems each solver ran on'
+        ds1.attrs['solvers'] = np.array(SOLVER_NAMES, dtype='S')
+        ds2 = h5f.create_dataset('Successes[Solver]', data=successes)
+        ds2.attrs['dimension'] = 'Solver'
+        ds2.attrs['description'] = 'Number of problems ending below distance_threshold after each solver'
+        ds2.attrs['solvers'] = np.array(SOLVER_NAMES, dtype='S')
+        ds3 = h5f.create_dataset('Evaluations[Solver]', data=evaluations)
+        ds3.attrs['dimension'] = 'Solver'
+        ds3.attrs['description'] = 'Total objective evaluations of each solver'
+        ds3.attrs['solvers'] = np.array(SOLVER_NAMES, dtype='S')
+        h5f.attrs['solver_mode'] = solver_mode
+        h5f.attrs['distance_threshold'] = distance_threshold
+
+        if run_budget_limited is not None and run_budget_limited.any():
+            n_limited, limited_distance, distance_lost = summarize_budget(run_budget_limited, run_solver_log, distance_threshold)
+            print(f"⏱️ Budget: {n_limited} Month Problems Stopped Early, "
+                  f"{np.sum(limited_distance < distance_threshold)} of Them Within Threshold; "
+                  f"Mean Distance Lost Above Threshold {distance_lost:.4f} %.")
+            ds4 = h5f.create_dataset('Budget_Limited_Distance[Problem]', data=limited_distance)
+            ds4.attrs['dimension'] = 'Problem'
+            ds4.attrs['description'] = 'Best distance of each budget-limited (scenario, location, month) problem (NaN = not evaluated)'
+            h5f.attrs['budget_limited_problems'] = n_limited
+            h5f.attrs['budget_distance_lost'] = distance_lost
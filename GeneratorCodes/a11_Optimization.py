@@ -1,25 +1,83 @@
 # a11_OptimizeForcingScenario.py
 
+import time
 import numpy as np
 import warnings
-from scipy.optimize import differential_evolution
+from collections import namedtuple
+from scipy.optimize import differential_evolution, minimize
 
 from a12_Distance1 import a12_Distance1
 from a13_Distance2 import a13_Distance2
 from a14_ResampleLocals import resample_locals
+from a18_ResponseLookupTable import invert_response_lookup, refinement_simplex
+from a19_RunManifest import content_hash
+from a31_ForcingCache import forcing_problem_key
+
+SOLVER_NAMES = ('lookup', 'local', 'de')
+
+# Result of one location: only this location's slices, assembled into the scenario arrays by a10_
+LocationResult = namedtuple('LocationResult', [
+    'forcing',            # [24] optimized forcing (12 mean + 12 SD change, %)
+    'distance',           # total distance from the target
+    'mean_change',        # [12] achieved monthly mean deviation (%)
+    'sd_change',          # [12] achieved monthly SD deviation (%)
+    'monthly_synthetic',  # [Year x Month] synthetic monthly flow
+    'monthly_recorded',   # [Year x Month] recorded monthly flow
+    'solver_log',         # [Month x Solver x 2] evaluations and best distance of each solver stage
+    'budget_limited',     # [12] months stopped by the optimization budget (a32_)
+])
 
 class EarlyStop(Exception):
     pass
 
+class BudgetExhausted(EarlyStop):
+    pass
+
+def local_simplex(x0, bounds, step=5.0):
+    """
+    Initial Nelder-Mead simplex around x0 with edges of `step` % forcing change (kept inside bounds).
+    """
+    simplex = np.tile(np.asarray(x0, dtype=np.float64), (3, 1))
+    for d in range(2):
+        simplex[d + 1, d] = x0[d] + step if x0[d] + step <= bounds[d][1] else x0[d] - step
+    return simplex
+
+def local_search(objective, x0, bounds, initial_simplex, maxfev):
+    """
+    Short bounded Nelder-Mead search (the objective is a sum of absolute differences, so derivative-free).
+    """
+    return minimize(
+        objective,
+        x0,
+        method='Nelder-Mead',
+        bounds=bounds,
+        options={'initial_simplex': initial_simplex, 'maxfev': maxfev, 'xatol': 1e-4, 'fatol': 1e-6},
+    )
+
+def summarize_solver_log(solver_log, distance_threshold):
+    """
+    Per-solver totals over a solver log of any leading shape [... x Solver x 2].
+
+    Returns:
+        attempts : number of month problems each solver ran on
+        successes : number of those that ended below distance_threshold
+        evaluations : total objective evaluations of each solver
+    """
+    log = solver_log.reshape(-1, len(SOLVER_NAMES), 2)
+    used = ~np.isnan(log[:, :, 0])
+    attempts = used.sum(axis=0)
+    successes = (used & (np.nan_to_num(log[:, :, 1], nan=np.inf) < distance_threshold)).sum(axis=0)
+    evaluations = np.nansum(log[:, :, 0], axis=0).astype(np.int64)
+    return attempts, successes, evaluations
+
 def optimize_forcing_scenario(
     Data, k, isLocal_1,
     numberofyears_syntheticdata, randomyear,
     numberofyears_recorded,
     desired_scenario_monthly,
     meanseasonality_change1, SDseasonality_change1,
-    range_lb, range_ub,
-    Monthly_Synthetic, Monthly_Recorded,
-    scenario, dist, mean_change_syn, SD_change_syn, distance_threshold
+    range_lb, range_ub, distance_threshold,
+    location_table=None, lookup_refinement=1, solver_mode='global', rng=None, forcing_cache=None, budget=None
 ):
     """
     Optimization of Forcing Scenario for Non-Local Stations
@@ -41,24 +99,56 @@ def optimize_forcing_scenario(
         SDseasonality_change1: target SD seasonality
         range_lb: Lower bounds for optimization
         range_ub: Upper bounds for optimization
-        Monthly_Synthetic: 3D array to store synthetic monthly flow
-        Monthly_Recorded: 3D array to store recorded monthly flow
+        distance_threshold: Early-stop threshold for the monthly distance
+        location_table: (Optional) forcing-response lookup table of this location (a18_); if given,
+                        targets are inverted from the table instead of running differential evolution
+        lookup_refinement: 1 = short Nelder-Mead refinement of the lookup result until distance_threshold is met
+        solver_mode: 'global' = differential evolution only; 'local' = bounded Nelder-Mead from the
+                     seasonality-adjusted guess (or the lookup result), escalating to differential
+                     evolution only if the month misses distance_threshold
+        rng: (Optional) numpy Generator seeding differential evolution (a21_ stream of this scenario and location)
+        forcing_cache: (Optional) ForcingCache (a31_); months whose problem was already solved reuse the cached
+                       forcing pair (their solver_log stays NaN), and newly solved months are added to it
+        budget: (Optional) LocationBudget (a32_); each month gets a fair share of what is left of it, and a month
+                whose share runs out keeps the best forcing found so far and is flagged in budget_limited
 
     Returns:
-        scenario, dist, mean_change_syn, SD_change_syn, Monthly_Synthetic, Monthly_Recorded
+        LocationResult record of location k; its solver_log is [Month x Solver x 2] objective evaluations
+        and best distance after each solver stage (NaN where a solver was not used; see SOLVER_NAMES)
     """
 
     warnings.filterwarnings("ignore", message="delta_grad == 0.0.*")
     x_opt = np.zeros(24)  # Optimized scenario values [12 mean, 12 SD]
+    solver_log = np.full((12, len(SOLVER_NAMES), 2), np.nan)  # [Month x Solver x (evaluations, distance)]
+    budget_limited = np.zeros(12, dtype=bool)
+    location_evaluations = [0]
 
     # --- Non-Local Station Optimization ---
     if isLocal_1 == 0:
+        if forcing_cache is not None:
+            problem_key = forcing_problem_key(
+                Data, k, randomyear, numberofyears_syntheticdata, range_lb, range_ub,
+                distance_threshold, solver_mode, location_table is not None, lookup_refinement
+            )
+
         for mon in range(12):
             best_distance = [np.inf]
             best_x = [0.0, 0.0]
+            n_evaluations = [0]
+            month_start = location_evaluations[0]
+            month_deadline, month_evaluations = None, None
 
             # === Define objective function for the optimizer ===
             def objective(x):
+                # Stop at the end of the month's budget share (its first evaluation is always made)
+                month_used = location_evaluations[0] - month_start
+                if month_used > 0 and (
+                        (month_evaluations is not None and month_used >= month_evaluations)
+                        or (month_deadline is not None and time.time() >= month_deadline)):
+                    budget_limited[mon] = True
+                    raise BudgetExhausted
+                location_evaluations[0] += 1
+                n_evaluations[0] += 1
                 distance = a12_Distance1(
                     x[0], x[1], mon, Data, k,
                     numberofyears_syntheticdata, randomyear,
@@ -82,12 +172,70 @@ def optimize_forcing_scenario(
                 desired_scenario_monthly[mon + 12] + SDseasonality_change1[mon] + 0.01 * desired_scenario_monthly[mon + 12] * SDseasonality_change1[mon]
             ]
 
+            # === Reuse the forcing pair of an already solved month problem (the starting guess is the adjusted target) ===
+            if forcing_cache is not None:
+                month_key = content_hash(problem_key, mon, initial_guess)
+                cached = forcing_cache.get(month_key)
+                if cached is not None:
+                    x_opt[mon], x_opt[mon + 12] = cached
+                    continue
+
             # === Define bounds for each variable (mean and SD) ===
             bounds = [
                 (range_lb[0, mon], range_ub[0, mon]),
                 (range_lb[0, mon + 12], range_ub[0, mon + 12])
             ]
-            # === Run optimizer ===
+
+            # === Budget share of this month (a32_); without any left, keep the starting guess ===
+            if budget is not None:
+                month_deadline, month_evaluations = budget.month_share(location_evaluations[0], 12 - mon)
+                if month_evaluations == 0 or (month_deadline is not None and time.time() >= month_deadline):
+                    x_opt[mon], x_opt[mon + 12] = np.clip(initial_guess, [b[0] for b in bounds], [b[1] for b in bounds])
+                    budget_limited[mon] = True
+                    continue
+
+            # === Record evaluations and best distance so far of each solver stage ===
+            def log_stage(solver):
+                solver_log[mon, SOLVER_NAMES.index(solver), 0] = n_evaluations[0]
+                solver_log[mon, SOLVER_NAMES.index(solver), 1] = best_distance[0]
+                n_evaluations[0] = 0
+                return best_distance[0]
+
+            # === Stage 1 (optional): lookup table, or local search from the starting guess ===
+            prior_distance = np.inf
+            if location_table is not None:
+                x_lookup = invert_response_lookup(location_table, mon, initial_guess[0], initial_guess[1])
+                try:
+                    if lookup_refinement == 1:
+                        local_search(objective, x_lookup, bounds,
+                                     refinement_simplex(location_table, x_lookup, bounds), maxfev=100)
+                    else:
+                        objective(x_lookup)
+                except EarlyStop:
+                    pass
+                x_opt[mon] = best_x[0]
+                x_opt[mon + 12] = best_x[1]
+                prior_distance = log_stage('lookup')
+
+            elif solver_mode == 'local':
+                x_start = np.clip(initial_guess, [b[0] for b in bounds], [b[1] for b in bounds])
+                try:
+                    local_search(objective, x_start, bounds, local_simplex(x_start, bounds), maxfev=200)
+                except EarlyStop:
+                    pass
+                x_opt[mon] = best_x[0]
+                x_opt[mon + 12] = best_x[1]
+                prior_distance = log_stage('local')
+
+            # Keep the stage 1 result if it meets the threshold (with a lookup table, only 'local' mode escalates)
+            if budget_limited[mon]:
+                continue
+            if prior_distance < distance_threshold or (location_table is not None and solver_mode != 'local'):
+                if forcing_cache is not None:
+                    forcing_cache.put(month_key, x_opt[mon], x_opt[mon + 12], prior_distance)
+                continue
+
+            # === Stage 2: Run global optimizer ===
             try:
                 result = differential_evolution(
                     objective,
@@ -99,13 +247,21 @@ def optimize_forcing_scenario(
                     mutation=(0.5, 1),
                     recombination=0.7,
                     polish=True,
+                    seed=rng,
                 )
-                # Store result from optimizer
-                x_opt[mon] = result.x[0]
-                x_opt[mon + 12] = result.x[1]
+                # Store result from optimizer (unless stage 1 already found a better one)
+                if result.fun <= prior_distance:
+                    x_opt[mon] = result.x[0]
+                    x_opt[mon + 12] = result.x[1]
+                else:
+                    x_opt[mon] = best_x[0]
+                    x_opt[mon + 12] = best_x[1]
             except EarlyStop:
                    x_opt[mon] = best_x[0] 
                    x_opt[mon + 12] = best_x[1]
+            final_distance = log_stage('de')
+            if forcing_cache is not None and not budget_limited[mon]:
+                forcing_cache.put(month_key, x_opt[mon], x_opt[mon + 12], final_distance)
 
         # === Evaluate final 24-element scenario ===
         dist1, x3, x4, mean_change_syn1, SD_change_syn1 = a13_Distance2(
@@ -120,24 +276,14 @@ def optimize_forcing_scenario(
             Data, k, numberofyears_syntheticdata
         )
 
-    # --- Save Optimized or Resampled Results ---
-
-    # Store optimized forcing vector (12 mean + 12 SD)
-    scenario[k, :] = x_opt
-
-    # Store distance from desired, and percent changes in mean/SD
-    dist[k] = dist1
-    mean_change_syn[k, :] = mean_change_syn1
-    SD_change_syn[k, :] = SD_change_syn1
-
-    # Save synthetic monthly flow [years × 12] for this location
-    for i in range(numberofyears_syntheticdata - 1):
-        for j in range(12):
-            Monthly_Synthetic[i, j, k] = x3[i, j]
-
-    # Save recorded monthly flow [years × 12] for this location
-    for i in range(numberofyears_recorded):
-        for j in range(12):
-            Monthly_Recorded[i, j, k] = x4[i, j]
-
-    return scenario, dist, mean_change_syn, SD_change_syn, Monthly_Synthetic, Monthly_Recorded
\ No newline at end of file
+    # --- Return Optimized or Resampled Results of this location ---
+    return LocationResult(
+        forcing=x_opt,
+        distance=float(dist1),
+        mean_change=np.broadcast_to(np.asarray(mean_change_syn1, dtype=np.float64), 12).copy(),  # Locals return 0
+        sd_change=np.broadcast_to(np.asarray(SD_change_syn1, dtype=np.float64), 12).copy(),
+        monthly_synthetic=np.asarray(x3[:numberofyears_syntheticdata - 1, :12], dtype=np.float64),
+        monthly_recorded=np.asarray(x4[:numberofyears_recorded, :12], dtype=np.float64),
+        solver_log=solver_log,
+        budget_limited=budget_limited,
+    )
\ No newline at end of file
@@ -2,7 +2,7 @@
 
 import numpy as np
 from numba import njit
-from a4_Function_Synthetic_Flow_Generator_Monthly import synthetic_flow_generator_monthly
+from a23_RecordedData import as_recorded_data
 
 @njit
 def build_year_sequence(firstyear, lastyear, numberofyears_syntheticdata):
@@ -67,24 +67,17 @@ def resample_locals(data, k, numberofyears_syntheticdata):
         mean_change_syn1 : placeholder, always 0
         SD_change_syn1 : placeholder, always 0
     """
-    # Step 1: Set zero mean/SD change (no forcing for locals)
-    meanchange_L = np.zeros(12)
-    SDchange_L = np.zeros(12)
+    # Step 1: Extract year range from the input data
+    data = as_recorded_data(data)
+    firstyear, lastyear = data.firstyear, data.lastyear
 
-    # Step 2: Extract year range from the input data
-    firstyear = int(data[0, 1])
-    lastyear = int(data[-1, 1])
-
-    # Step 3: Build cyclic year assignment matrix
+    # Step 2: Build cyclic year assignment matrix
     randomyear_L = build_year_sequence(firstyear, lastyear, numberofyears_syntheticdata)
 
-    # Step 4: Generate recorded and synthetic flow matrix (no change applied)
-    _, x4 = synthetic_flow_generator_monthly(
-        data, k, numberofyears_syntheticdata, randomyear_L,
-        meanchange_L, SDchange_L
-    )
+    # Step 3: Recorded monthly flow matrix (no forcing for locals, so the a4_ generator is not needed)
+    x4 = np.ascontiguousarray(data.monthly_totals[:, :, k])
 
-    # Step 5: Resample using wrapped years (exclude last synthetic year)
+    # Step 4: Resample using wrapped years (exclude last synthetic year)
     x3_resampled = resample_monthly_flows(x4, randomyear_L, firstyear)
 
     # Placeholders for compatibility with optimization outputs
@@ -1,13 +1,12 @@
 # a15_SyntheticMonthlytoDailynonLocals.py
 
 import numpy as np
-from a17_Disaggregation import (
-    build_proportion_matrix, disaggregate_monthly_flows, adjust_february
-)
+from a17_Disaggregation import disaggregate_stations, chunk_features
+from a23_RecordedData import as_recorded_data
 
 def synthetic_monthly_to_daily_nonlocals(Data, Monthly_Synthetic, Monthly_Recorded,
                                firstyear, startyear_synthetic, numberofyears_recorded,
-                               nonlocal_indices):
+                               nonlocal_indices, rng=None, location_chunk_size=0, selected_years=None):
     """
     Converts synthetic monthly flows for non-local stations into synthetic daily flows
     using K-nearest neighbor (KNN) matching and proportional disaggregation.
@@ -24,6 +23,11 @@ def synthetic_monthly_to_daily_nonlocals(Data, Monthly_Synthetic, Monthly_Record
         startyear_synthetic : start year label for synthetic series
         numberofyears_recorded : number of historical years
         nonlocal_indices : list of indices for non-local stations
+        rng : (Optional) numpy Generator for the KNN sampling (a21_ stream); default is the global numpy random state
+        location_chunk_size : (Optional) stations per chunk; > 0 = KNN on the monthly flows summed per chunk of
+                              stations, and disaggregation chunk by chunk. Default 0 = all stations together
+        selected_years : (Optional) selected historical years already drawn (select_knn_years), e.g. for a block
+                         of synthetic years; the KNN matching is then skipped
 
     Returns:
         synthetic_daily : synthetic daily streamflow
@@ -33,39 +37,67 @@ def synthetic_monthly_to_daily_nonlocals(Data, Monthly_Synthetic, Monthly_Record
     if len(nonlocal_indices) == 0:
         return np.empty((0, 0)), np.empty((0,), dtype=int)
 
-    # === Step 1: Build proportion matrix (daily/monthly ratios) ===
-    Data_1 = np.asarray(Data[:, 1:], dtype=np.float64)
-    proportions, years, months = build_proportion_matrix(
-        Data_1, Monthly_Recorded, firstyear, nonlocal_indices
+    # === Step 1: Select historical years using KNN based on Euclidean distance ===
+    if selected_years is None:
+        selected_years = select_knn_years(
+            Monthly_Synthetic, Monthly_Recorded, firstyear, numberofyears_recorded, rng, location_chunk_size
+        )
+
+    # === Step 2: Disaggregate monthly flows to daily using proportions (daily/monthly ratios) ===
+    # === and correct February for leap years                                               ===
+    Data_1 = as_recorded_data(Data).calendar_flows
+    synthetic_daily = disaggregate_stations(
+        Data_1, Monthly_Synthetic, Monthly_Recorded, firstyear, nonlocal_indices,
+        selected_years, startyear_synthetic, location_chunk_size
     )
 
-    # === Step 2: Select historical years using KNN based on Euclidean distance ===
-    n_synth = Monthly_Synthetic.shape[0]          
-    n_rec = Monthly_Recorded.shape[0]            
+    return synthetic_daily, selected_years
+
 
-    distances = np.zeros((n_rec, n_synth))        # similarity matrix [recorded x synthetic]
+def select_knn_years(Monthly_Synthetic, Monthly_Recorded, firstyear, numberofyears_recorded,
+                     rng=None, location_chunk_size=0, horizon_chunk_years=0):
+    """
+    Matches each synthetic year to a recorded year: one of the K = floor(sqrt(recorded years)) nearest
+    recorded years (Euclidean distance of the monthly flows), drawn with inverse-rank weights.
+
+    Parameters:
+        Monthly_Synthetic : synthetic monthly data of the non-local stations [Year x Month x Station]
+        Monthly_Recorded : recorded monthly data of the non-local stations [Year x Month x Station]
+        firstyear : first year in the recorded dataset
+        numberofyears_recorded : number of historical years
+        rng : (Optional) numpy Generator for the sampling (a21_ stream); default is the global numpy random state
+        location_chunk_size : (Optional) > 0 = distances of the monthly flows summed per chunk of stations
+        horizon_chunk_years : (Optional) > 0 = distances computed for blocks of this many synthetic years, so the
+                              distance matrix is [Recorded x Block] instead of [Recorded x Synthetic]
+                              (the draws and selected years are the same)
 
-    for i in range(n_rec):
-        for j in range(n_synth):
-            diff = Monthly_Recorded[i, :, :] - Monthly_Synthetic[j, :, :]
-            distances[i, j] = np.sqrt(np.sum(diff ** 2))  # Euclidean distance
+    Returns:
+        selected_years : array of selected historical years [Year]
+    """
+    n_synth = Monthly_Synthetic.shape[0]          
+    n_rec = Monthly_Recorded.shape[0]            
+    features_synthetic = chunk_features(Monthly_Synthetic, location_chunk_size)  # [Year x Month x Chunk] for chunks
+    features_recorded = chunk_features(Monthly_Recorded, location_chunk_size)
 
     K = int(np.floor(np.sqrt(numberofyears_recorded)))  # number of neighbors
     selected_years = np.zeros(n_synth, dtype=int)       # selected year for each synthetic year
+    block = n_synth if horizon_chunk_years <= 0 else horizon_chunk_years
 
-    for j in range(n_synth):
-        idx_sorted = np.argsort(distances[:, j])                 # nearest neighbors (by similarity)
-        weights = 1.0 / (np.arange(1, K + 1))                    # inverse-rank weights
-        probs = weights / np.sum(weights)                        # normalize to probability distribution
-        i = np.searchsorted(np.cumsum(probs), np.random.rand())  # stochastic sampling
-        selected_years[j] = idx_sorted[i] + firstyear            # convert index to actual year
+    for start in range(0, n_synth, block):
+        stop = min(start + block, n_synth)
+        distances = np.zeros((n_rec, stop - start))     # similarity matrix [recorded x synthetic]
 
-    # === Step 3: Disaggregate monthly flows to daily using proportions ===
-    synthetic_daily = disaggregate_monthly_flows(
-        Monthly_Synthetic, years, months, proportions, selected_years
-    )
+        for i in range(n_rec):
+            for j in range(start, stop):
+                diff = features_recorded[i, :, :] - features_synthetic[j, :, :]
+                distances[i, j - start] = np.sqrt(np.sum(diff ** 2))  # Euclidean distance
 
-    # === Step 4: Correct February for leap years ===
-    synthetic_daily = adjust_february(synthetic_daily, startyear_synthetic)
+        for j in range(start, stop):
+            idx_sorted = np.argsort(distances[:, j - start])         # nearest neighbors (by similarity)
+            weights = 1.0 / (np.arange(1, K + 1))                    # inverse-rank weights
+            probs = weights / np.sum(weights)                        # normalize to probability distribution
+            u = rng.random() if rng is not None else np.random.rand()
+            i = np.searchsorted(np.cumsum(probs), u)                 # stochastic sampling
+            selected_years[j] = idx_sorted[i] + firstyear            # convert index to actual year
 
-    return synthetic_daily, selected_years
\ No newline at end of file
+    return selected_years
\ No newline at end of file
@@ -1,13 +1,12 @@
 # a16_SyntheticMonthlytoDailyLocals.py
 
 import numpy as np
-from a17_Disaggregation import (
-    build_proportion_matrix, disaggregate_monthly_flows, adjust_february
-)
+from a17_Disaggregation import disaggregate_stations, station_proportions
+from a23_RecordedData import as_recorded_data
 
 def synthetic_monthly_to_daily_locals(Data, Monthly_Synthetic, Monthly_Recorded,
                                       selected_years, firstyear, startyear_synthetic,
-                                      local_indices):
+                                      local_indices, location_chunk_size=0, chunk_proportions=None):
     """
     Converts synthetic monthly streamflows for local stations into daily flows
     using historical daily-to-monthly proportions (resampled from recorded data).
@@ -24,6 +23,8 @@ def synthetic_monthly_to_daily_locals(Data, Monthly_Synthetic, Monthly_Recorded,
         startyear_synthetic : first calendar year for synthetic time series
         numberofyears_syntheticdata : number of synthetic years (includes one extra)
         local_indices : list of indices for local stations
+        location_chunk_size : (Optional) stations per disaggregation chunk (0 = all stations together)
+        chunk_proportions : (Optional) proportions of the local stations built once per run (local_proportions)
 
     Returns:
         synthetic_daily : synthetic daily streamflow matrix
@@ -32,19 +33,24 @@ def synthetic_monthly_to_daily_locals(Data, Monthly_Synthetic, Monthly_Recorded,
     if len(local_indices) == 0:
         return np.empty((0, 0))
 
-    # === Step 1: Extract proportions for local station indices ===
-    Data_1 = np.asarray(Data[:, 1:], dtype=np.float64)  # Remove day-of-year column
-    proportions, years, months = build_proportion_matrix(
-        Data_1, Monthly_Recorded, firstyear, local_indices
+    # === Extract proportions for local station indices, disaggregate monthly to daily ===
+    # === using matched years and adjust February for leap years                       ===
+    Data_1 = as_recorded_data(Data).calendar_flows  # Year, month and flows (no day-of-year column)
+    synthetic_daily = disaggregate_stations(
+        Data_1, Monthly_Synthetic, Monthly_Recorded, firstyear, local_indices,
+        selected_years.flatten(), startyear_synthetic, location_chunk_size, chunk_proportions
     )
 
-    # === Step 2: Disaggregate monthly to daily using matched years ===
-    synthetic_daily = disaggregate_monthly_flows(
-        Monthly_Synthetic, years, months, proportions,
-        selected_years.flatten()
-    )
+    return synthetic_daily
 
-    # === Step 3: Adjust February for leap years ===
-    synthetic_daily = adjust_february(synthetic_daily, startyear_synthetic)
 
-    return synthetic_daily
\ No newline at end of file
+def local_proportions(Data, local_indices, location_chunk_size=0):
+    """
+    Daily-to-monthly proportions of the local stations (a17_ station_proportions). They do not depend on
+    the scenario, so they are built once per run and passed to synthetic_monthly_to_daily_locals.
+    """
+    if len(local_indices) == 0:
+        return None
+    data = as_recorded_data(Data)
+    return station_proportions(data.calendar_flows, data.monthly_totals[:, :, local_indices], data.firstyear,
+                               local_indices, location_chunk_size)
@@ -138,3 +138,87 @@ def disaggregate_monthly_flows(Monthly_Synthetic, years, months, proportions, se
                     row += 1
 
     return output
+
+
+def station_proportions(Data, Monthly_Recorded, firstyear, station_indices, location_chunk_size=0):
+    """
+    Daily-to-monthly proportions of a group of stations, per chunk of stations as in disaggregate_stations.
+    They depend only on the recorded data, so they can be built once and reused for every scenario.
+
+    Returns:
+        chunk_proportions : list of (proportions, years, months) of each chunk (build_proportion_matrix)
+    """
+    n_stations = len(station_indices)
+    chunk = n_stations if location_chunk_size <= 0 else location_chunk_size
+    return [
+        build_proportion_matrix(Data, Monthly_Recorded[:, :, start:min(start + chunk, n_stations)], firstyear,
+                                station_indices[start:min(start + chunk, n_stations)])
+        for start in range(0, n_stations, chunk)
+    ]
+
+
+def disaggregate_stations(Data, Monthly_Synthetic, Monthly_Recorded, firstyear, station_indices,
+                          selected_years, startyear_synthetic, location_chunk_size=0, chunk_proportions=None):
+    """
+    Builds the proportions, disaggregates and adjusts February for a group of stations,
+    optionally in chunks of stations so the proportion matrix and the leap-year adjustment
+    only hold `location_chunk_size` stations at a time.
+
+    Every chunk uses the same selected years, so the daily rows of all chunks are aligned
+    and are written side by side into one preallocated output.
+
+    Parameters:
+        Data : historical daily data (year, month and flow columns)
+        Monthly_Synthetic : synthetic monthly flows [Year x Month x Station]
+        Monthly_Recorded : recorded monthly flows [Year x Month x Station]
+        firstyear : first year in the dataset
+        station_indices : list of column indices corresponding to the stations
+        selected_years : selected historical year for each synthetic year
+        startyear_synthetic : base calendar year for synthetic data
+        location_chunk_size : stations per chunk (0 = all stations together)
+        chunk_proportions : (Optional) proportions of each chunk built beforehand (station_proportions)
+
+    Returns:
+        synthetic_daily : synthetic daily data [Day x (2 + Station)]
+    """
+    n_stations = len(station_indices)
+    chunk = n_stations if location_chunk_size <= 0 else location_chunk_size
+    synthetic_daily = None
+
+    for c, start in enumerate(range(0, n_stations, chunk)):
+        stop = min(start + chunk, n_stations)
+        if chunk_proportions is not None:
+            proportions, years, months = chunk_proportions[c]
+        else:
+            proportions, years, months = build_proportion_matrix(
+                Data, Monthly_Recorded[:, :, start:stop], firstyear, station_indices[start:stop]
+            )
+        section = disaggregate_monthly_flows(
+            Monthly_Synthetic[:, :, start:stop], years, months, proportions, selected_years
+        )
+        section = adjust_february(section, startyear_synthetic)
+        if start == 0 and stop == n_stations:
+            return section
+        if synthetic_daily is None:
+            synthetic_daily = np.empty((section.shape[0], 2 + n_stations))
+            synthetic_daily[:, :2] = section[:, :2]
+        synthetic_daily[:, 2 + start:2 + stop] = section[:, 2:]
+
+    return synthetic_daily
+
+
+def chunk_features(Monthly_Flows, location_chunk_size):
+    """
+    Reduced KNN features: monthly flows summed over each chunk of stations.
+
+    Parameters:
+        Monthly_Flows : monthly flows [Year x Month x Station]
+        location_chunk_size : stations per chunk (0 = no reduction)
+
+    Returns:
+        features : [Year x Month x Chunk] (Monthly_Flows itself for location_chunk_size = 0)
+    """
+    if location_chunk_size <= 0:
+        return Monthly_Flows
+    starts = np.arange(0, Monthly_Flows.shape[2], location_chunk_size)
+    return np.add.reduceat(Monthly_Flows, starts, axis=2)
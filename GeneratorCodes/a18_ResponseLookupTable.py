@@ -0,0 +1,285 @@
+# a18_ResponseLookupTable.py
+
+import os
+import numpy as np
+import h5py
+from numba import njit
+from tqdm import tqdm
+from scipy.interpolate import RegularGridInterpolator
+from scipy.optimize import minimize
+
+from a4_Function_Synthetic_Flow_Generator_Monthly import synthetic_flow_generator_standardized, compute_ln_params
+from a5_RecordedMeanSD import recorded_mean_sd
+from a19_RunManifest import content_hash
+from a23_RecordedData import as_recorded_data
+
+"""
+Module: Forcing-Response Lookup Tables
+
+For a fixed location and random year matrix, the map from forcing (M, S) to the achieved
+(mean%, SD%) change is a deterministic, smooth 2-D surface for every month. Each month of the
+generator only depends on its own forcing pair, so one back-transform with the same (M, S) in all
+12 months gives the response of all 12 months at once.
+
+This module tabulates that surface on a forcing grid once per run, saves it next to the boundary
+data (<boundary folder>/Response_Lookup.h5, with a fingerprint of its inputs), and inverts targets by
+interpolation.
+
+Key Functions:
+    - build_forcing_grid(): Dense linear grid near zero change, geometric spacing towards the upper bound
+    - forcing_grids(): Mean and SD forcing grids of the optimization bounds
+    - lookup_fingerprint(): Content hash of the inputs of a lookup table
+    - build_response_lookup(): Tabulates the response surfaces for all non-local locations
+    - response_lookup_table(): Generates and saves, or loads, the lookup table for a run
+    - location_lookup(): Extracts the table of one location (as passed to a11_)
+    - invert_response_lookup(): Forcing (M, S) whose interpolated response is closest to a target
+    - refinement_simplex(): Initial Nelder-Mead simplex sized to the local grid spacing
+"""
+
+
+def build_forcing_grid(lower, upper, dense_limit=300.0, dense_points=100, tail_points=30):
+    """
+    Builds a 1-D forcing grid (%): linear from lower to dense_limit, then geometric in (1 + change/100).
+
+    Parameters:
+        lower, upper : forcing bounds (%)
+        dense_limit : upper end of the linearly spaced part (%)
+        dense_points : number of linearly spaced points
+        tail_points : number of geometrically spaced points above dense_limit
+
+    Returns:
+        grid : increasing 1-D array of forcing values (%)
+    """
+    dense_end = min(upper, dense_limit)
+    grid = np.linspace(lower, dense_end, dense_points)
+    if upper > dense_end:
+        tail = np.geomspace(1 + dense_end / 100, 1 + upper / 100, tail_points + 1)[1:]
+        grid = np.concatenate([grid, (tail - 1) * 100])
+    return grid
+
+
+def forcing_grids(range_lb, range_ub):
+    """
+    Mean and SD forcing grids (%) of the optimization bounds [1 x 24].
+    """
+    # SD forcing enters the generator squared through (1 + S/100), so S below -100 mirrors S above -100
+    return build_forcing_grid(range_lb[0, 0], range_ub[0, 0]), build_forcing_grid(max(range_lb[0, 12], -100), range_ub[0, 12])
+
+
+def lookup_fingerprint(Data, isLocal, numberofyears_syntheticdata, randomyear, range_lb, range_ub):
+    """
+    Content hash of everything a lookup table depends on (recorded data, local flags, bounds, synthetic
+    years, random year matrix and forcing grids), saved with the table.
+    """
+    mean_grid, sd_grid = forcing_grids(range_lb, range_ub)
+    return content_hash(
+        'response_lookup', as_recorded_data(Data).calendar_flows, np.asarray(isLocal, dtype=np.float64).flatten(),
+        range_lb, range_ub, numberofyears_syntheticdata, randomyear, mean_grid, sd_grid
+    )
+
+
+@njit
+def tabulate_response(combined, mean_monthly, SD_monthly, mean_monthly_recorded, SD_monthly_recorded,
+                      mean_grid, sd_grid):
+    """
+    Evaluates the resultant monthly mean and SD changes (%) for every forcing pair of the grid.
+
+    Parameters:
+        combined : standardized correlated synthetic matrix of one location (from a4_)
+        mean_monthly, SD_monthly : recorded mean and sd in log-space
+        mean_monthly_recorded, SD_monthly_recorded : recorded monthly mean and sd in real space
+        mean_grid, sd_grid : forcing grids (%)
+
+    Returns:
+        response_mean, response_sd : [len(mean_grid) x len(sd_grid) x 12] resultant changes (%)
+    """
+    n_m = mean_grid.shape[0]
+    n_s = sd_grid.shape[0]
+    n_years = combined.shape[0]
+    response_mean = np.zeros((n_m, n_s, 12))
+    response_sd = np.zeros((n_m, n_s, 12))
+    meanchange = np.zeros(12)
+    SDchange = np.zeros(12)
+    column = np.zeros(n_years)
+
+    for a in range(n_m):
+        for b in range(n_s):
+            meanchange[:] = mean_grid[a]
+            SDchange[:] = sd_grid[b]
+            mean_ln, sd_ln = compute_ln_params(meanchange, SDchange, mean_monthly, SD_monthly)
+            for j in range(12):
+                total = 0.0
+                for i in range(n_years):
+                    column[i] = np.exp(combined[i, j] * SD_monthly[j] * sd_ln[j] + mean_monthly[j] * mean_ln[j])
+                    total += column[i]
+                mean_syn = total / n_years
+                squares = 0.0
+                for i in range(n_years):
+                    squares += (column[i] - mean_syn) ** 2
+                sd_syn = np.sqrt(squares / (n_years - 1))
+                response_mean[a, b, j] = (mean_syn - mean_monthly_recorded[j]) / mean_monthly_recorded[j] * 100
+                response_sd[a, b, j] = (sd_syn - SD_monthly_recorded[j]) / SD_monthly_recorded[j] * 100
+    return response_mean, response_sd
+
+
+def build_response_lookup(Data, isLocal, numberofyears_syntheticdata, numberoflocations, randomyear,
+                          range_lb, range_ub, show_progress=True):
+    """
+    Tabulates the forcing-response surfaces of all non-local locations (local locations are left as 0).
+
+    Parameters:
+        Data : full daily recorded dataset
+        isLocal : array marking local (=1) vs non-local (=0) stations
+        numberofyears_syntheticdata : number of synthetic years (including extra year)
+        numberoflocations : number of stations
+        randomyear : random year matrix
+        range_lb, range_ub : optimization bounds [1 x 24] (12 mean + 12 SD)
+        show_progress : show a progress bar
+
+    Returns:
+        response_table : (mean_grid, sd_grid, response_mean, response_sd), responses [Mean grid x SD grid x Month x Location]
+    """
+    isLocal = np.asarray(isLocal).flatten()
+
+    mean_grid, sd_grid = forcing_grids(range_lb, range_ub)
+
+    response_mean = np.zeros((len(mean_grid), len(sd_grid), 12, numberoflocations))
+    response_sd = np.zeros((len(mean_grid), len(sd_grid), 12, numberoflocations))
+    randomyear = np.asarray(randomyear).astype(np.int64)
+
+    nonlocal_indices = np.where(isLocal == 0)[0]
+    for k in tqdm(nonlocal_indices, desc="📊 Tabulating Forcing-Response Surfaces", disable=not show_progress):
+        combined, mean_monthly, SD_monthly, x4 = synthetic_flow_generator_standardized(
+            Data, k, numberofyears_syntheticdata, randomyear)
+        m_mr, sd_mr = recorded_mean_sd(x4)
+        response_mean[:, :, :, k], response_sd[:, :, :, k] = tabulate_response(
+            combined, mean_monthly, SD_monthly, m_mr, sd_mr, mean_grid, sd_grid)
+
+    return mean_grid, sd_grid, response_mean, response_sd
+
+
+def response_lookup_table(Data, isLocal, numberofyears_syntheticdata, numberoflocations, randomyear,
+                          range_lb, range_ub, boundaryfolderpass, LookupTable_AlreadyGenerated):
+    """
+    Generates and saves, or loads, the forcing-response lookup table of a run.
+
+    A saved table is only reused if it was built from the same inputs (lookup_fingerprint()); otherwise it is
+    regenerated.
+
+    Parameters:
+        Data, isLocal, numberofyears_syntheticdata, numberoflocations, randomyear, range_lb, range_ub : see build_response_lookup()
+        boundaryfolderpass : directory path where the table is saved (the boundary folder of the run)
+        LookupTable_AlreadyGenerated : If 1, load saved .h5 table data (when valid); if 0, regenerate.
+
+    Returns:
+        response_table : (mean_grid, sd_grid, response_mean, response_sd)
+    """
+    os.makedirs(boundaryfolderpass, exist_ok=True)
+    table_path = os.path.join(boundaryfolderpass, 'Response_Lookup.h5')
+    fingerprint = lookup_fingerprint(Data, isLocal, numberofyears_syntheticdata, randomyear, range_lb, range_ub)
+
+    if LookupTable_AlreadyGenerated == 1 and os.path.exists(table_path):
+        with h5py.File(table_path, 'r') as h5f:
+            if h5f.attrs.get('fingerprint') == fingerprint:
+                print(f"🔄 Loading Previously Generated Lookup Table from {table_path}.")
+                return (h5f['Forcing_Mean_Grid[Grid]'][:], h5f['Forcing_SD_Grid[Grid]'][:],
+                        h5f['Response_Mean[Mean Grid x SD Grid x Month x Location]'][:],
+                        h5f['Response_SD[Mean Grid x SD Grid x Month x Location]'][:])
+        print("⚠️ Saved Lookup Table Was Built From Other Inputs. Regenerating.")
+
+    mean_grid, sd_grid, response_mean, response_sd = build_response_lookup(
+        Data, isLocal, numberofyears_syntheticdata, numberoflocations, randomyear, range_lb, range_ub)
+
+    with h5py.File(table_path, 'w') as h5f:
+        ds1 = h5f.create_dataset('Forcing_Mean_Grid[Grid]', data=mean_grid)
+        ds1.attrs['dimension'] = 'Grid'
+        ds1.attrs['description'] = 'Forcing mean change (%) grid'
+        ds2 = h5f.create_dataset('Forcing_SD_Grid[Grid]', data=sd_grid)
+        ds2.attrs['dimension'] = 'Grid'
+        ds2.attrs['description'] = 'Forcing SD change (%) grid'
+        ds3 = h5f.create_dataset('Response_Mean[Mean Grid x SD Grid x Month x Location]', data=response_mean)
+        ds3.attrs['dimension'] = 'Mean Grid x SD Grid x Month x Location'
+        ds3.attrs['description'] = 'Resultant monthly mean change (%) for each forcing pair (0 for local locations)'
+        ds4 = h5f.create_dataset('Response_SD[Mean Grid x SD Grid x Month x Location]', data=response_sd)
+        ds4.attrs['dimension'] = 'Mean Grid x SD Grid x Month x Location'
+        ds4.attrs['description'] = 'Resultant monthly SD change (%) for each forcing pair (0 for local locations)'
+        ds5 = h5f.create_dataset('RandomYearMatrix[Year x Month]', data=np.asarray(randomyear).astype(np.float64))
+        ds5.attrs['dimension'] = 'Year x Month'
+        ds5.attrs['description'] = 'Random year matrix the table was built with'
+        h5f.attrs['fingerprint'] = fingerprint  # lookup_fingerprint() of the inputs
+
+    print(f"📁 Lookup Table Is Saved on {table_path}.")
+
+    return mean_grid, sd_grid, response_mean, response_sd
+
+
+def location_lookup(response_table, k):
+    """
+    Extracts the lookup table of location k: (mean_grid, sd_grid, response_mean [.. x Month], response_sd [.. x Month]).
+    """
+    mean_grid, sd_grid, response_mean, response_sd = response_table
+    return mean_grid, sd_grid, response_mean[:, :, :, k], response_sd[:, :, :, k]
+
+
+def invert_response_lookup(location_table, mon, target_mean, target_sd):
+    """
+    Finds the forcing (M, S) whose tabulated response is closest to the target, for one month.
+
+    The nearest grid node (sum of absolute differences, as in a12_) is refined inside its neighbouring
+    cells on a bilinear interpolation of the response surface.
+
+    Parameters:
+        location_table : lookup table of one location (from location_lookup)
+        mon : month index (0 = Jan, 11 = Dec)
+        target_mean, target_sd : seasonality-adjusted target changes (%)
+
+    Returns:
+        x : [M, S] forcing changes (%)
+    """
+    mean_grid, sd_grid, response_mean, response_sd = location_table
+    rm = response_mean[:, :, mon]
+    rs = response_sd[:, :, mon]
+
+    gap = np.abs(rm - target_mean) + np.abs(rs - target_sd)
+    gap[~np.isfinite(gap)] = np.inf
+    a, b = np.unravel_index(np.argmin(gap), gap.shape)
+    x_node = np.array([mean_grid[a], sd_grid[b]])
+
+    a0, a1 = max(a - 1, 0), min(a + 1, len(mean_grid) - 1)
+    b0, b1 = max(b - 1, 0), min(b + 1, len(sd_grid) - 1)
+    if not (np.all(np.isfinite(rm[a0:a1 + 1, b0:b1 + 1])) and np.all(np.isfinite(rs[a0:a1 + 1, b0:b1 + 1]))):
+        return x_node
+
+    cell = (mean_grid[a0:a1 + 1], sd_grid[b0:b1 + 1])
+    interp_mean = RegularGridInterpolator(cell, rm[a0:a1 + 1, b0:b1 + 1])
+    interp_sd = RegularGridInterpolator(cell, rs[a0:a1 + 1, b0:b1 + 1])
+
+    def interpolated_gap(x):
+        return abs(interp_mean(x)[0] - target_mean) + abs(interp_sd(x)[0] - target_sd)
+
+    result = minimize(interpolated_gap, x_node, method='Nelder-Mead',
+                      bounds=[(mean_grid[a0], mean_grid[a1]), (sd_grid[b0], sd_grid[b1])],
+                      options={'xatol': 1e-4, 'fatol': 1e-5, 'maxiter': 200})
+
+    return result.x if result.fun <= gap[a, b] else x_node
+
+
+def refinement_simplex(location_table, x, bounds):
+    """
+    Initial Nelder-Mead simplex around x, with edges of half the local grid spacing (kept inside bounds).
+
+    Parameters:
+        location_table : lookup table of one location
+        x : [M, S] starting forcing changes (%)
+        bounds : [(M_min, M_max), (S_min, S_max)]
+
+    Returns:
+        simplex : [3 x 2] initial simplex
+    """
+    mean_grid, sd_grid, _, _ = location_table
+    simplex = np.tile(np.asarray(x, dtype=np.float64), (3, 1))
+    for d, grid in enumerate((mean_grid, sd_grid)):
+        i = min(max(np.searchsorted(grid, x[d]), 1), len(grid) - 1)
+        step = 0.5 * (grid[i] - grid[i - 1])
+        simplex[d + 1, d] = x[d] + step if x[d] + step <= bounds[d][1] else x[d] - step
+    return simplex
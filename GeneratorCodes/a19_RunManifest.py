@@ -0,0 +1,264 @@
+# a19_RunManifest.py
+
+import os
+import json
+import hashlib
+from contextlib import contextmanager
+import numpy as np
+import h5py
+
+"""
+Module: Run Manifest (Checkpoint / Resume / Append)
+
+Keeps a manifest ("Run_Manifest.json") in the result folder that records the inputs of the run,
+the boundary inputs, and every scenario with its target deviation, file number and finished outputs.
+With resume = 1 in a1_, an interrupted run restarts where it stopped, and new target deviations are
+appended to an existing run folder without recomputing the ones already there.
+
+Outputs are written to a temporary ".part" file and renamed once complete, and their sizes are
+recorded in the manifest, so partially written files are detected and redone.
+
+Key Functions:
+    - content_hash(): SHA-256 fingerprint of arrays, numbers and strings
+    - load_manifest(): Loads the manifest of a result folder (or starts a new one)
+    - save_manifest(): Writes the manifest atomically
+    - merge_run_scenarios(): Assigns file numbers to targets, keeping those of the existing run
+    - scenario_is_complete(): Checks that all requested outputs of a scenario exist and are complete
+    - mark_scenario_complete(): Records the finished outputs of a scenario
+    - record_outputs(): Records outputs rewritten after the run (e.g. daily series added by a37_)
+    - atomic_output(): Context manager yielding a temporary path that is renamed when the block finishes
+    - load_boundary_fingerprint(), save_boundary_fingerprint(): Inputs the saved boundaries of a folder belong to
+"""
+
+MANIFEST_NAME = 'Run_Manifest.json'
+BOUNDARY_FINGERPRINT_NAME = 'Boundary_Fingerprint.txt'
+
+
+def content_hash(*items):
+    """
+    SHA-256 fingerprint of the given items (numpy arrays, numbers, strings, lists or None).
+    """
+    digest = hashlib.sha256()
+    for item in items:
+        if item is None:
+            digest.update(b'None')
+        elif isinstance(item, str):
+            digest.update(item.encode('utf-8'))
+        elif isinstance(item, (list, tuple)) and not all(np.isscalar(v) for v in item):
+            digest.update(content_hash(*item).encode('ascii'))
+        else:
+            array = np.ascontiguousarray(np.asarray(item, dtype=np.float64))
+            digest.update(str(array.shape).encode('ascii'))
+            digest.update(array.tobytes())
+        digest.update(b'|')
+    return digest.hexdigest()
+
+
+def load_manifest(scenariofolderpass, run_fingerprint, resume):
+    """
+    Loads the manifest of a result folder.
+
+    A new, empty manifest is returned if resume = 0, if no manifest exists, or if the run inputs
+    (recorded data, random years, seasonality, bounds, solver settings) changed since it was written.
+
+    Parameters:
+        scenariofolderpass : result folder path
+        run_fingerprint : content_hash() of the run inputs
+        resume : 1 = continue an existing run; 0 = start a new one
+
+    Returns:
+        manifest : dict with 'fingerprint', 'boundary_fingerprint' and 'scenarios'
+    """
+    manifest_path = os.path.join(scenariofolderpass, MANIFEST_NAME)
+    new_manifest = {'fingerprint': run_fingerprint, 'boundary_fingerprint': None, 'scenarios': []}
+
+    if resume != 1 or not os.path.exists(manifest_path):
+        return new_manifest
+
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        print("⚠️ Run Manifest Is Unreadable. Starting a New Run.")
+        return new_manifest
+
+    if manifest.get('fingerprint') != run_fingerprint:
+        print("⚠️ Run Inputs Changed Since the Last Run. Starting a New Run.")
+        new_manifest['boundary_fingerprint'] = manifest.get('boundary_fingerprint')
+        return new_manifest
+
+    n_complete = sum(1 for entry in manifest['scenarios'] if entry.get('complete'))
+    print(f"🔄 Resuming Run: {n_complete} of {len(manifest['scenarios'])} Recorded Scenarios Are Complete.")
+    return manifest
+
+
+def save_manifest(scenariofolderpass, manifest):
+    """
+    Writes the manifest atomically (temporary file + rename).
+    """
+    manifest_path = os.path.join(scenariofolderpass, MANIFEST_NAME)
+    with atomic_output(manifest_path) as part_path:
+        with open(part_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+
+
+def target_keys(desired_scenarios1):
+    """
+    Identity of each target row: (mean %, SD %, replicate), where replicate counts repeated targets in order.
+    """
+    seen = {}
+    keys = []
+    for mean, sd in np.asarray(desired_scenarios1, dtype=np.float64):
+        base = (round(float(mean), 6), round(float(sd), 6))
+        replicate = seen.get(base, 0)
+        seen[base] = replicate + 1
+        keys.append((base[0], base[1], replicate))
+    return keys
+
+
+def merge_run_scenarios(manifest, desired_scenarios1, desired_scenarios_monthly):
+    """
+    Merges the targets of this run with the scenarios already recorded in the manifest.
+
+    Targets already in the manifest keep their file number; new targets are appended after the largest
+    number. Recorded scenarios that are not in this run's targets stay part of the run folder.
+
+    Parameters:
+        manifest : run manifest (updated in place)
+        desired_scenarios1 : [Scenario x 2] feasible target deviations of this run
+        desired_scenarios_monthly : [Scenario x 24] monthly target deviations of this run
+
+    Returns:
+        scenario_numbers : file number of each merged scenario (Scenario{number}.h5)
+        desired_scenarios1, desired_scenarios_monthly : merged arrays, ordered by file number
+    """
+    recorded = {(e['mean'], e['sd'], e['replicate']): e for e in manifest['scenarios']}
+    next_number = max([e['number'] for e in manifest['scenarios']], default=0) + 1
+    n_appended = 0
+
+    for key, row_monthly in zip(target_keys(desired_scenarios1), np.asarray(desired_scenarios_monthly)):
+        if key not in recorded:
+            entry = {'number': next_number, 'mean': key[0], 'sd': key[1], 'replicate': key[2],
+                     'monthly': [float(v) for v in row_monthly], 'complete': False, 'outputs': {}}
+            manifest['scenarios'].append(entry)
+            recorded[key] = entry
+            next_number += 1
+            n_appended += 1
+
+    if n_appended > 0 and n_appended < len(manifest['scenarios']):
+        print(f"➕ Appending {n_appended} New Target Deviations to the Existing Run.")
+
+    manifest['scenarios'].sort(key=lambda e: e['number'])
+    scenario_numbers = [e['number'] for e in manifest['scenarios']]
+    desired_scenarios1 = np.array([[e['mean'], e['sd']] for e in manifest['scenarios']], dtype=np.float64)
+    desired_scenarios_monthly = np.array([e['monthly'] for e in manifest['scenarios']], dtype=np.float64)
+
+    return scenario_numbers, desired_scenarios1, desired_scenarios_monthly
+
+
+def expected_outputs(number, daily, monthly, h5):
+    """
+    Relative paths of the outputs requested for scenario `number`.
+    """
+    outputs = []
+    if daily == 1:
+        outputs.append(os.path.join('DailyTimeseriesCSVFiles', f'SynDailyInflow_Scenario_{number}.csv'))
+    if monthly == 1:
+        outputs.append(os.path.join('MonthlyTimeseriesCSVFiles', f'SynMonthlyInflow_Scenario_{number}.csv'))
+    if h5 == 1:
+        outputs.append(os.path.join('OutputData', f'Scenario{number}.h5'))
+    return outputs
+
+
+def scenario_is_complete(manifest, scenariofolderpass, number, daily, monthly, h5):
+    """
+    True if the manifest marks the scenario complete and every requested output exists with its
+    recorded size (and, for .h5 files, opens and carries the 'complete' attribute).
+    """
+    entry = next((e for e in manifest['scenarios'] if e['number'] == number), None)
+    if entry is None or not entry.get('complete'):
+        return False
+
+    for relpath in expected_outputs(number, daily, monthly, h5):
+        path = os.path.join(scenariofolderpass, relpath)
+        size = entry['outputs'].get(relpath.replace(os.sep, '/'))
+        if size is None or not os.path.exists(path) or os.path.getsize(path) != size:
+            return False
+        if path.endswith('.h5'):
+            try:
+                with h5py.File(path, 'r') as h5f:
+                    if h5f.attrs.get('complete', 0) != 1:
+                        return False
+            except OSError:
+                return False
+    return True
+
+
+def mark_scenario_complete(manifest, scenariofolderpass, number, daily, monthly, h5):
+    """
+    Records the finished outputs (with sizes) of a scenario and saves the manifest.
+    """
+    entry = next(e for e in manifest['scenarios'] if e['number'] == number)
+    for relpath in expected_outputs(number, daily, monthly, h5):
+        entry['outputs'][relpath.replace(os.sep, '/')] = os.path.getsize(os.path.join(scenariofolderpass, relpath))
+    entry['complete'] = True
+    save_manifest(scenariofolderpass, manifest)
+
+
+def record_outputs(scenariofolderpass, number, relpaths):
+    """
+    Records the new sizes of outputs of a scenario written after its run, so that a resumed run keeps them.
+    Does nothing without a manifest or if the scenario is not in it.
+    """
+    manifest_path = os.path.join(scenariofolderpass, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    entry = next((e for e in manifest['scenarios'] if e['number'] == number), None)
+    if entry is None:
+        return
+    for relpath in relpaths:
+        entry['outputs'][relpath.replace(os.sep, '/')] = os.path.getsize(os.path.join(scenariofolderpass, relpath))
+    save_manifest(scenariofolderpass, manifest)
+
+
+@contextmanager
+def atomic_output(path):
+    """
+    Yields a temporary "<path>.part" path; renames it to `path` only if the block finishes without error.
+    """
+    part_path = path + '.part'
+    try:
+        yield part_path
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+    os.replace(part_path, path)
+
+
+def load_boundary_fingerprint(boundaryfolderpass):
+    """
+    Fingerprint of the inputs of the boundaries saved in a boundary folder, or None if unknown.
+    """
+    path = os.path.join(boundaryfolderpass, BOUNDARY_FINGERPRINT_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def save_boundary_fingerprint(boundaryfolderpass, boundary_fingerprint):
+    """
+    Records the inputs of the boundaries saved in a boundary folder (None = removes the record, e.g. before the
+    boundaries are regenerated, so that partly overwritten files are never reused).
+    """
+    path = os.path.join(boundaryfolderpass, BOUNDARY_FINGERPRINT_NAME)
+    if boundary_fingerprint is None:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with atomic_output(path) as part_path:
+        with open(part_path, 'w', encoding='utf-8') as f:
+            f.write(boundary_fingerprint)
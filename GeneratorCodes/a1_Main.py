@@ -1,15 +1,26 @@
 # a1_Main.py
 
-import pandas as pd
 import numpy as np
 import os
 import h5py
 
-from a2_MatrixYear import matrix_year
+from a2_MatrixYear import matrix_year, matrix_year_ensemble, load_matrix_year_ensemble, save_matrix_year_ensemble
 from a3_BoundaryCoordinateGenerator import boundary_coordinate_generator
-from a7_RemoveInfeasibleScenarios import remove_infeasible_scenarios
+from a7_RemoveInfeasibleScenarios import feasible_scenarios, drop_infeasible_scenarios, save_desired_scenarios
+from a8_BuildFeasibleAreaPolygon_and_CheckFeasibility import build_all_polygons
 from a9_ModifyInfeasibleScenarios import adjust_scenario_to_feasible
 from a10_InverseApproach_and_MonthlytoDaily import perform_inverse_optimization_and_disaggregation
+from a18_ResponseLookupTable import response_lookup_table
+from a19_RunManifest import content_hash, load_manifest, save_manifest, merge_run_scenarios
+from a19_RunManifest import save_boundary_fingerprint
+from a21_RandomStreams import resolve_random_seed, spawn_stream
+from a23_RecordedData import read_excel_values
+from a28_LocationChunks import chunked_remove_infeasible_scenarios, chunked_adjust_scenario_to_feasible
+from a30_StageCache import StageCache, cached_stage
+from a31_ForcingCache import ForcingCache
+from a33_ExecutionPlanner import plan_run
+from a38_BasinSetup import MEAN_SCENARIO_RANGE, SD_SCENARIO_RANGE, load_recorded_data, load_seasonality, optimization_bounds
+from a38_BasinSetup import boundary_folder_path, boundary_inputs_fingerprint, boundary_files_exist, saved_boundaries_match
 
 # start
 # ====================================================================================
@@ -27,6 +38,7 @@ randomyear_data = 'RandomYearMatrix.xlsx'              # <- (Optional) Pre-gener
 numberofyears_syntheticdata = 38   # Number of synthetic years to simulate (one year will be added because of concatenating Z and Z')
 startyear_synthetic = 1980         # Start year for synthetic daily data (for leap-year alignment)
 alreadyexist = 1                   # 1 = Load existing 'RandomYearMatrix.xlsx'; 0 = Generate new using matrix_year()
+random_seed = None                 # Integer = reproducible run (each scenario, stage and location gets its own random stream); None = new seed, saved in Inputs.h5 and reused on resume
 
 # === Scenario Type: Single or Multiple Target Deviations ===
 range_flag = 1                     # 0 = single target deviation, 1 = multiple target deviations
@@ -39,25 +51,62 @@ desired_change_sd = np.arange(-80, 81, 10)
 single_deviation_mean = 0              # Single target deviation for monthly means (%)
 single_deviation_sd = -10              # Single target deviation for monthly SDs (%)
 numberofscenarios_onetarget = 10       # Generate Multiple Scenario for a Single Target Deviation?
+ensemble_mode = 1                      # 1 = draw the random year matrices of all scenarios at once (saved in Inputs.h5) and optimize them in batches; 0 = draw a new matrix (RandomYearMatrix.xlsx) per scenario
 
 # === Boundary Configuration ===         # 1 = Use saved boundary data; 0 = regenerate boundaries for new recorded inflow data
 BoundaryCoordinate_AlreadyGenerated = 0  # Set it 0 first to generate and save boundary scenarios. Then set it 1 to use the saved data.
+boundary_folder = ''                     # '' = GeneratorCodes/Boundary; else folder of the saved boundaries (relative to the repository folder, or an absolute path), e.g. one per basin. Saved boundaries whose inputs are unchanged (Boundary_Fingerprint.txt) are reused even with 0 above
 
 # === Optimization Criteria ===
 distance_threshold = 0.01         # Minimum acceptable monthly distance (resultant from target, in %) for early stop in optimization
+solver_mode = 'global'            # 'global' = differential evolution only; 'local' = bounded Nelder-Mead from the seasonality-adjusted guess, escalating to differential evolution only if distance_threshold is missed
+
+# === Optimization Budget ===        # 0 = unlimited; a month problem whose share of the budget runs out keeps the best forcing found so far and is flagged (Budget_Limited in the .h5 files)
+scenario_time_budget = 0           # Wall-clock seconds for optimizing one scenario
+run_time_budget = 0                # Wall-clock seconds for optimizing all scenarios of the run (e.g. to finish inside a scheduled window)
+scenario_evaluation_budget = 0     # Objective evaluations per scenario, shared equally by its non-local locations
+run_evaluation_budget = 0          # Objective evaluations of the whole run, shared equally by its scenarios
+
+# === Response Lookup Table ===
+lookup_table = 0                   # 1 = invert targets from a tabulated forcing-response surface (saved in the boundary folder); 0 = differential evolution
+lookup_refinement = 1              # 1 = short local refinement of each lookup result until distance_threshold is met; 0 = use the interpolated forcing
+
+# === Forcing Solution Cache ===
+forcing_cache_folder = ''          # '' = off; folder of an on-disk cache of solved (location, month) forcing pairs shared by all runs and configurations (relative to the repository folder, or an absolute path); cached month problems skip the optimizer
+forcing_cache_entries = 1000000    # Maximum number of cached month problems (the least recently used are evicted)
 
 # === Parallel Optimization ===
 enable_parallel = True             # Set to True to enable parallel optimization for locations in each scenario
 
+# === Station and Horizon Chunking ===
+location_chunk_size = 0            # 0 = process all stations together; N = process stations in chunks of N through boundaries, feasibility and daily disaggregation (bounded memory for networks of hundreds to thousands of stations; the KNN year matching then uses the monthly flows summed per chunk)
+horizon_chunk_years = 0            # 0 = disaggregate and save the daily series of a scenario at once; N = disaggregate and append it to the outputs in blocks of N synthetic years (bounded memory for very long horizons, same results)
+
+# === Execution Backend ===
+execution_mode = 'local'           # 'local' = run all scenarios in this process; 'queue' = publish scenarios to a file-based work queue shared by worker nodes
+queue_folder = 'WorkQueue'         # Work queue folder (relative to the repository folder, or an absolute path on a filesystem shared by all nodes)
+queue_workers = 2                  # Worker processes started on this machine in 'queue' mode (0 = only workers started on other nodes)
+dry_run = 0                        # 1 = plan the run without optimizing: run Steps 1-4, calibrate kernel costs on this machine, and print (and save in resultfolder/Run_Plan.json) the optimizations left, estimated run time, memory and output size, and recommended workers and chunking; 0 = run
+
+# === Generator Service (a36_) ===  # python GeneratorCodes/a36_GeneratorService.py keeps the inputs, boundaries and polygons of this basin loaded and answers scenario requests on http://127.0.0.1:service_port
+service_port = 8765                # Local port of the service
+service_workers = 2                # Requests optimized at the same time (further requests wait, or are refused when too many are waiting)
+
 ## === Define Output/Input Paths ===
 resultfolder = 'Scenarios'            # Change folder name to save new scenarios in a new folder
 
+## === Checkpoint / Resume ===
+resume = 0                            # 1 = continue the run in resultfolder: keep complete scenarios, redo missing or partially written ones, and append new target deviations; 0 = start a new run
+incremental = 1                       # 1 = cache stage outputs in resultfolder/StageCache under a hash of their inputs, and recompute only the stages and (scenario, location) optimizations whose inputs changed (optimizations are reused only with a fixed random_seed); 0 = recompute everything
+
 ## === Saving Timeseries Csv Files ===      # 1 = save; 0 = do not save
 daily = 0
 monthly = 0
 
 ## === Saving .h5 Data of Optimized Scenarios ===      # 1 = save; 0 = do not save 
 h5 = 1                                                 # .h5 files are needed for plotting in c1 to c3
+output_precision = 'float64'                           # Flow datasets in the .h5 files: 'float64' = full precision; 'float32' = about half the size; 'scaled' = 16-bit integers with scale/offset per location, about a quarter of the size (error bounds are saved in the dataset attributes)
+daily_storage = 'full'                                 # Daily series in the .h5 files: 'full' = DailyTimeSeries_Synthetic of each scenario; 'lineage' = only the monthly flows and KNN-selected years of each scenario, with the disaggregation proportions once per run (OutputData/Daily_Lineage.h5); the reader (a26_) rebuilds identical daily series on demand; 'deferred' = stop at the monthly outputs and record what the disaggregation needs, also skipping the KNN year matching (needs daily = 0); the daily series of chosen scenarios are produced later by a37_ (python GeneratorCodes/a37_DailyStage.py Scenarios) or on demand by the reader
 
 # ====================================================================================
 #                               End of USER-DEFINED INPUT SECTION
@@ -66,27 +115,16 @@ h5 = 1                                                 # .h5 files are needed fo
 
 # =================================== Step 1: Load all inputs ===================================
 recorded_data_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', recorded_data))
-Data = pd.read_excel(recorded_data_path, sheet_name='Sheet1', header=None).values
-Data = Data[1:, :]
-numeric_part = Data[:, 2:].astype(float)
-numeric_part[numeric_part <= 0] = 0.001
-Data[:, 2:] = numeric_part
-
-isLocal = pd.read_excel(recorded_data_path, sheet_name='Sheet2', header=None).values
-isLocal = isLocal[1:, :]
+Data, isLocal = load_recorded_data(recorded_data_path)  # Typed, read-only arrays shared by all stages (a23_)
 
 numberofyears_syntheticdata = numberofyears_syntheticdata + 1  # One extra for appending Z and Z'
 
 # === Load Seasonality Change Factors ===
 mean_seasonality_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', mean_seasonality_data))
-meanseasonality_change = pd.read_excel(mean_seasonality_path, header=None).values
-meanseasonality_change = meanseasonality_change[1:, 1:]
-meanseasonality_change = meanseasonality_change.astype(np.float64)
+meanseasonality_change = load_seasonality(mean_seasonality_path)
 
 sd_seasonality_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', sd_seasonality_data))
-SDseasonality_change = pd.read_excel(sd_seasonality_path, header=None).values
-SDseasonality_change = SDseasonality_change[1:, 1:]
-SDseasonality_change = SDseasonality_change.astype(np.float64)
+SDseasonality_change = load_seasonality(sd_seasonality_path)
 
 # === Exposure Space Bounds Configuration ===
 if range_flag == 1:
@@ -99,22 +137,10 @@ else:
     desired_scenarios1 = desired_change
 
 # === Optimization Bounds (Will be used for boundary scenarios generation as well) ===
-mean_scenario_range = [-99, 2000]
-SD_scenario_range = [-2000, 2000]
+mean_scenario_range = list(MEAN_SCENARIO_RANGE)
+SD_scenario_range = list(SD_SCENARIO_RANGE)
 
-range_lb = np.zeros((1, 24))
-range_ub = np.zeros((1, 24))
-range_lb[0, 0:12] = mean_scenario_range[0]
-range_lb[0, 12:24] = SD_scenario_range[0]
-range_ub[0, 0:12] = mean_scenario_range[1]
-range_ub[0, 12:24] = SD_scenario_range[1]
-
-# === Random Year Matrix Handling ===
-randomyear_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', randomyear_data))
-if alreadyexist == 1 and os.path.exists(randomyear_path):
-    randomyear = pd.read_excel(randomyear_path, header=None).values
-else:
-    randomyear = matrix_year(Data, numberofyears_syntheticdata)
+range_lb, range_ub = optimization_bounds(mean_scenario_range, SD_scenario_range)
 
 # === Output/Input Paths ===
 scenariofolderpass = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', resultfolder))
@@ -122,8 +148,29 @@ os.makedirs(scenariofolderpass, exist_ok=True)
 os.makedirs(os.path.join(scenariofolderpass, 'InputData'), exist_ok=True)
 os.makedirs(os.path.join(scenariofolderpass, 'OutputData'), exist_ok=True)
 
+# === Root Seed of the Random Streams ===
+root_seed = resolve_random_seed(random_seed, scenariofolderpass, resume)
+
+# === Random Year Matrix Handling ===
+randomyear_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', randomyear_data))
+if alreadyexist == 1 and os.path.exists(randomyear_path):
+    randomyear = read_excel_values(randomyear_path)
+else:
+    randomyear = matrix_year(Data, numberofyears_syntheticdata, rng=spawn_stream(root_seed, 'randomyear'))
+
+# === Work Queue Folder (execution_mode = 'queue') ===
+queue_folderpass = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', queue_folder))
+
+# === Forcing Solution Cache (shared by every run) ===
+forcing_cache = None
+if forcing_cache_folder != '':
+    forcing_cache = ForcingCache(
+        os.path.join(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', forcing_cache_folder)), 'Forcing_Cache.sqlite'),
+        forcing_cache_entries
+    )
+
 # === Boundary Folder ===
-boundaryfolderpass = os.path.abspath(os.path.join(os.path.dirname(__file__), 'Boundary'))
+boundaryfolderpass = boundary_folder_path(boundary_folder)
 os.makedirs(boundaryfolderpass, exist_ok=True)
 
 # === Construct Monthly Exposure Space Matrix ===
@@ -133,10 +180,10 @@ for i in range(desired_scenarios1.shape[0]):
     desired_scenarios_monthly[i, 12:24] = desired_scenarios1[i, 1]
 
 # === Process Recorded Data ===
-numberoflocations = Data.shape[1] - 3
-n = Data.shape[0]
-firstyear = int(Data[0, 1])
-lastyear = int(Data[-1, 1])
+numberoflocations = Data.numberoflocations
+n = Data.numberofdays
+firstyear = Data.firstyear
+lastyear = Data.lastyear
 numberofyears_recorded = lastyear - firstyear + 1
 
 # === Initialize Output Variables ===
@@ -149,8 +196,9 @@ SD_change_syn = np.zeros((numberoflocations, 12))
 
 # === Save Input Data ===
 h5_path = os.path.join(scenariofolderpass, 'InputData', 'Inputs.h5')
+previous_ensemble = load_matrix_year_ensemble(h5_path) if range_flag == 0 and ensemble_mode == 1 and resume == 1 else None
 with h5py.File(h5_path, 'w') as h5f:
-    dset1 = h5f.create_dataset('DailyData[Day x Location]', data=Data[:, 3:].astype(np.float64))
+    dset1 = h5f.create_dataset('DailyData[Day x Location]', data=Data.flows)
     dset1.attrs['dimension'] = 'Day x Location'
     dset1.attrs['description'] = 'Daily streamflow values for each station'
 
@@ -191,38 +239,154 @@ with h5py.File(h5_path, 'w') as h5f:
     meta_grp.attrs['BoundaryCoordinate_AlreadyGenerated'] = BoundaryCoordinate_AlreadyGenerated
     meta_grp.attrs['range_flag'] = range_flag
     meta_grp.attrs['startyear_synthetic'] = startyear_synthetic
+    meta_grp.attrs['lookup_table'] = lookup_table
+    meta_grp.attrs['solver_mode'] = solver_mode
+    meta_grp.attrs['ensemble_mode'] = ensemble_mode
+    meta_grp.attrs['random_seed'] = str(root_seed)
+    meta_grp.attrs['output_precision'] = output_precision
+    meta_grp.attrs['daily_storage'] = daily_storage
+    meta_grp.attrs['location_chunk_size'] = location_chunk_size
 
 print(f"📁 Input Data Has Been Saved on {resultfolder}\\InputData\\Inputs.h5.")
+
+# === Run Manifest (Checkpoint / Resume) ===
+recorded_numeric = Data.calendar_flows
+run_fingerprint = content_hash(
+    recorded_numeric, isLocal, randomyear if range_flag == 1 else None,
+    meanseasonality_change, SDseasonality_change, range_lb, range_ub,
+    numberofyears_syntheticdata, startyear_synthetic, range_flag,
+    distance_threshold, solver_mode, lookup_table, lookup_refinement,
+    random_seed if random_seed is not None else -1, output_precision,
+    *((location_chunk_size,) if location_chunk_size > 0 else ()),  # Chunked KNN features change the daily series
+    *((daily_storage,) if daily_storage != 'full' else ())
+)
+boundary_fingerprint = boundary_inputs_fingerprint(
+    Data, isLocal, randomyear, mean_scenario_range, SD_scenario_range, numberofyears_syntheticdata
+)
+manifest = load_manifest(scenariofolderpass, run_fingerprint, resume)
+manifest['random_seed'] = str(root_seed)  # Reused by resolve_random_seed() when the run is resumed
+if resume == 1 and manifest['boundary_fingerprint'] == boundary_fingerprint and boundary_files_exist(boundaryfolderpass):
+    BoundaryCoordinate_AlreadyGenerated = 1  # Boundaries of this run were already completed
+if saved_boundaries_match(boundaryfolderpass, boundary_fingerprint):
+    BoundaryCoordinate_AlreadyGenerated = 1  # Saved boundaries of the same inputs (e.g. an earlier run of this basin)
+    print(f"♻️ Boundaries of These Inputs Are Already Saved in {boundaryfolderpass}. Reusing Them.")
+if BoundaryCoordinate_AlreadyGenerated == 0:
+    save_boundary_fingerprint(boundaryfolderpass, None)  # Boundary files are rewritten below
+
+# === Stage Cache: stages and (scenario, location) optimizations are redone only if their inputs changed ===
+stage_cache = None
+if incremental == 1:
+    # Optimization cells are keyed on the root seed: only a configured random_seed can match them again
+    stage_cache = StageCache(os.path.join(scenariofolderpass, 'StageCache'), cache_cells=random_seed is not None)
+feasibility_key = content_hash(
+    boundary_fingerprint, desired_scenarios_monthly, isLocal, meanseasonality_change, SDseasonality_change,
+    mean_scenario_range
+)
 # =================================== End of Step 1 ===================================
 
 # ================ Step 2: Generating or Loading Boundary Scenarios ================
-x_boundary, y_boundary, desired_scenarios_monthly_1 = boundary_coordinate_generator(
-    Data, isLocal, numberofyears_syntheticdata, numberofyears_recorded,
-    numberoflocations, randomyear, mean_scenario_range, SD_scenario_range,
-    boundaryfolderpass, BoundaryCoordinate_AlreadyGenerated
-)
+if location_chunk_size == 0:
+    x_boundary, y_boundary, desired_scenarios_monthly_1 = boundary_coordinate_generator(
+        Data, isLocal, numberofyears_syntheticdata, numberofyears_recorded,
+        numberoflocations, randomyear, mean_scenario_range, SD_scenario_range,
+        boundaryfolderpass, BoundaryCoordinate_AlreadyGenerated
+    )
+else:
+    # === Chunks of stations: boundaries are generated (or loaded) and checked (Step 3) one chunk at a time ===
+    feasible = None if stage_cache is None else stage_cache.get('Feasibility', feasibility_key)
+    desired_scenarios_monthly_1, desired_scenarios_monthly, desired_scenarios1, feasible = chunked_remove_infeasible_scenarios(
+        Data, isLocal, numberofyears_syntheticdata, numberofyears_recorded, numberoflocations, randomyear,
+        mean_scenario_range, SD_scenario_range, boundaryfolderpass, BoundaryCoordinate_AlreadyGenerated,
+        scenariofolderpass, desired_scenarios_monthly, desired_scenarios1,
+        meanseasonality_change, SDseasonality_change, resultfolder, location_chunk_size, feasible
+    )
+    if stage_cache is not None:
+        stage_cache.put('Feasibility', feasibility_key, feasible)
+manifest['boundary_fingerprint'] = boundary_fingerprint
+save_manifest(scenariofolderpass, manifest)
+if BoundaryCoordinate_AlreadyGenerated == 0:
+    save_boundary_fingerprint(boundaryfolderpass, boundary_fingerprint)
+
+# ============ Step 2b: Tabulating or Loading Forcing-Response Lookup Tables ============
+response_table = None
+if lookup_table == 1 and range_flag == 1:  # With range_flag = 0, tables are rebuilt per random year matrix in a10_
+    response_table = response_lookup_table(
+        Data, isLocal, numberofyears_syntheticdata, numberoflocations, randomyear,
+        range_lb, range_ub, boundaryfolderpass, BoundaryCoordinate_AlreadyGenerated
+    )
 
 # ============== Step 3: Removing Fully Infeasible Scenarios ===============
-desired_scenarios_monthly, desired_scenarios1 = remove_infeasible_scenarios(
-    scenariofolderpass, desired_scenarios_monthly_1,
-    mean_scenario_range, x_boundary, y_boundary,
-    desired_scenarios_monthly, desired_scenarios1,
-    isLocal, meanseasonality_change, SDseasonality_change, resultfolder
+if location_chunk_size == 0:
+    feasible = cached_stage(stage_cache, 'Feasibility', feasibility_key, lambda: feasible_scenarios(
+        desired_scenarios_monthly,
+        build_all_polygons(mean_scenario_range, x_boundary, y_boundary, desired_scenarios_monthly_1),
+        isLocal, meanseasonality_change, SDseasonality_change
+    ))
+    desired_scenarios_monthly, desired_scenarios1 = drop_infeasible_scenarios(
+        feasible, scenariofolderpass, desired_scenarios_monthly, desired_scenarios1,
+        meanseasonality_change, SDseasonality_change, resultfolder
+    )
+
+# === Merge with the scenarios already in the run folder (file numbers of existing scenarios are kept) ===
+scenario_numbers, desired_scenarios1, desired_scenarios_monthly = merge_run_scenarios(
+    manifest, desired_scenarios1, desired_scenarios_monthly
 )
+save_desired_scenarios(scenariofolderpass, desired_scenarios1, desired_scenarios_monthly,
+                       meanseasonality_change, SDseasonality_change)
+save_manifest(scenariofolderpass, manifest)
+
+# === Random Year Ensemble (range_flag = 0): one matrix per scenario, drawn at once and saved in Inputs.h5 ===
+randomyear_ensemble = None
+if range_flag == 0 and ensemble_mode == 1:
+    n_recorded = sum(1 for entry in manifest['scenarios'] if entry.get('complete'))
+    randomyear_ensemble = matrix_year_ensemble(
+        Data, numberofyears_syntheticdata, max(scenario_numbers),
+        previous_ensemble if n_recorded > 0 else None,  # Completed scenarios keep their matrices
+        root_seed
+    )
+    save_matrix_year_ensemble(h5_path, randomyear_ensemble)
 
 # ============ Step 4: Adjusting Partially Infeasible Scenarios =============
-adjusted_scenarios = adjust_scenario_to_feasible(
-    desired_scenarios_monthly, meanseasonality_change, SDseasonality_change,
-    mean_scenario_range, x_boundary, y_boundary,
-    numberoflocations, isLocal, desired_scenarios_monthly_1
+adjustment_key = content_hash(
+    boundary_fingerprint, desired_scenarios_monthly, isLocal, meanseasonality_change, SDseasonality_change,
+    mean_scenario_range
 )
+if location_chunk_size == 0:
+    adjusted_scenarios = cached_stage(stage_cache, 'Adjustment', adjustment_key, lambda: adjust_scenario_to_feasible(
+        desired_scenarios_monthly, meanseasonality_change, SDseasonality_change,
+        mean_scenario_range, x_boundary, y_boundary,
+        numberoflocations, isLocal, desired_scenarios_monthly_1
+    ))
+else:
+    adjusted_scenarios = cached_stage(stage_cache, 'Adjustment', adjustment_key, lambda: chunked_adjust_scenario_to_feasible(
+        Data, isLocal, numberofyears_syntheticdata, numberofyears_recorded, numberoflocations, randomyear,
+        mean_scenario_range, SD_scenario_range, boundaryfolderpass,
+        desired_scenarios_monthly, meanseasonality_change, SDseasonality_change, location_chunk_size
+    ))
 
 # ============== Step 5: Optimizing Scenarios + Disaggregating To Daily ===============
-perform_inverse_optimization_and_disaggregation(
-    Data, randomyear, desired_scenarios_monthly, adjusted_scenarios, desired_scenarios1,
-    isLocal, meanseasonality_change, SDseasonality_change,
-    range_lb, range_ub, range_flag, scenariofolderpass,
-    numberofyears_syntheticdata, numberofyears_recorded, numberoflocations,
-    firstyear, startyear_synthetic, distance_threshold,
-    enable_parallel, resultfolder, daily, monthly, h5
-)
+if dry_run == 1:
+    # === Dry Run: estimate Step 5 on this machine instead of running it ===
+    plan_run(
+        Data, randomyear, desired_scenarios_monthly, adjusted_scenarios, desired_scenarios1,
+        isLocal, meanseasonality_change, SDseasonality_change, range_lb, range_ub, range_flag,
+        scenariofolderpass, numberofyears_syntheticdata, startyear_synthetic, distance_threshold,
+        enable_parallel, daily, monthly, h5, lookup_table, lookup_refinement, response_table, solver_mode,
+        scenario_numbers, manifest, execution_mode, queue_workers, randomyear_ensemble, root_seed,
+        output_precision, location_chunk_size, horizon_chunk_years, stage_cache,
+        scenario_time_budget, run_time_budget, desired_scenarios_monthly_1.shape[0], daily_storage
+    )
+else:
+    perform_inverse_optimization_and_disaggregation(
+        Data, randomyear, desired_scenarios_monthly, adjusted_scenarios, desired_scenarios1,
+        isLocal, meanseasonality_change, SDseasonality_change,
+        range_lb, range_ub, range_flag, scenariofolderpass,
+        numberofyears_syntheticdata, numberofyears_recorded, numberoflocations,
+        firstyear, startyear_synthetic, distance_threshold,
+        enable_parallel, resultfolder, daily, monthly, h5,
+        lookup_table, lookup_refinement, response_table, solver_mode,
+        scenario_numbers, manifest,
+        execution_mode, queue_folderpass, queue_workers,
+        randomyear_ensemble, root_seed, output_precision, location_chunk_size, horizon_chunk_years, stage_cache, forcing_cache,
+        scenario_time_budget, run_time_budget, scenario_evaluation_budget, run_evaluation_budget, daily_storage
+    )
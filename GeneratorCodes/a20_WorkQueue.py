@@ -0,0 +1,350 @@
+# a20_WorkQueue.py
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import threading
+import subprocess
+import traceback
+import uuid
+import numpy as np
+import joblib
+from tqdm import tqdm
+
+from a19_RunManifest import atomic_output, expected_outputs, mark_scenario_complete
+
+"""
+Module: File-Based Work Queue (Sharded Multi-Node Execution)
+
+With execution_mode = 'queue', a10_ publishes one task per scenario to a queue folder on a filesystem
+shared by all nodes (a local folder is enough on one machine). Worker processes claim tasks with
+leases, run optimization + disaggregation, and write their outputs into their own shard folder.
+When every task is done, the shards are merged into the normal result folder layout (OutputData, ...).
+
+Queue folder layout:
+    context.pkl             Inputs shared by all scenarios (joblib)
+    tasks/{number}.json     One task per scenario
+    leases/{number}.json    Claimed tasks (worker and claim token); the file modification time is the lease heartbeat
+    done/{number}.json      Finished tasks (worker, shard, solver log, budget-limited months, plotting summary)
+    failed/{number}.json    Tasks that raised an error (with traceback)
+    shards/{worker}/        Outputs of each worker, in the normal result folder layout
+
+A lease not renewed for `lease_seconds` (crashed or disconnected worker) is taken over by another worker.
+A task finished twice (after a lease take-over) is harmless: only the first done record is kept, and a
+worker only removes a lease that still holds its own claim token.
+
+Start a worker on any node with:
+    python GeneratorCodes/a20_WorkQueue.py <queue_folder> [worker_id]
+
+Key Functions:
+    - publish_tasks(): Resets the queue folder and publishes the context and one task per scenario
+    - run_worker(): Claims and runs tasks until the queue is finished
+    - start_local_workers(): Starts worker processes on this machine
+    - wait_for_queue(): Waits until every task is done or failed, and returns the failed ones
+    - merge_shards(): Moves shard outputs into the result folder and records them in the manifest
+"""
+
+LEASE_SECONDS = 600
+POLL_SECONDS = 5
+
+
+def queue_paths(queue_folder):
+    """
+    Paths of the queue subfolders: tasks, leases, done, failed, shards.
+    """
+    return {name: os.path.join(queue_folder, name) for name in ('tasks', 'leases', 'done', 'failed', 'shards')}
+
+
+def publish_tasks(queue_folder, context, tasks):
+    """
+    Resets the queue folder and publishes the shared context and one task per scenario.
+
+    Parameters:
+        queue_folder : work queue folder
+        context : dict of the single-scenario inputs of a10_ (process_scenario keyword arguments)
+        tasks : list of (sce, number) pairs
+    """
+    paths = queue_paths(queue_folder)
+    for path in paths.values():
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+    with atomic_output(os.path.join(queue_folder, 'context.pkl')) as part_path:
+        joblib.dump(context, part_path)
+
+    for sce, number in tasks:
+        with atomic_output(os.path.join(paths['tasks'], f'{number}.json')) as part_path:
+            with open(part_path, 'w', encoding='utf-8') as f:
+                json.dump({'sce': int(sce), 'number': int(number)}, f)
+
+    print(f"📮 {len(tasks)} Scenario Tasks Are Published to {queue_folder}.")
+
+
+def task_numbers(queue_folder, subfolder):
+    """
+    Scenario numbers with a record in the given queue subfolder ('tasks', 'done', 'failed', ...).
+    """
+    folder = queue_paths(queue_folder)[subfolder]
+    if not os.path.isdir(folder):
+        return set()
+    return {int(name[:-5]) for name in os.listdir(folder) if name.endswith('.json') and name[:-5].isdigit()}
+
+
+def queue_finished(queue_folder):
+    """
+    True when every published task is done or failed.
+    """
+    return task_numbers(queue_folder, 'tasks') <= (task_numbers(queue_folder, 'done') | task_numbers(queue_folder, 'failed'))
+
+
+def claim_task(queue_folder, worker_id, lease_seconds=LEASE_SECONDS):
+    """
+    Claims the first open task by creating its lease file exclusively, taking over expired leases.
+
+    Returns:
+        task : dict with 'sce', 'number' and 'claim' (token of this claim, see release_lease()),
+               or None if no task can be claimed right now
+    """
+    paths = queue_paths(queue_folder)
+    finished = task_numbers(queue_folder, 'done') | task_numbers(queue_folder, 'failed')
+
+    for number in sorted(task_numbers(queue_folder, 'tasks') - finished):
+        lease_path = os.path.join(paths['leases'], f'{number}.json')
+
+        if os.path.exists(lease_path):
+            try:
+                expired = time.time() - os.path.getmtime(lease_path) > lease_seconds
+            except FileNotFoundError:
+                expired = False
+            if not expired:
+                continue
+            # Only one worker succeeds in renaming an expired lease away
+            try:
+                os.rename(lease_path, f'{lease_path}.expired.{worker_id}')
+                os.remove(f'{lease_path}.expired.{worker_id}')
+            except OSError:
+                continue
+
+        try:
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            continue
+        claim = uuid.uuid4().hex
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'worker': worker_id, 'claimed': time.time(), 'claim': claim}, f)
+
+        with open(os.path.join(paths['tasks'], f'{number}.json'), 'r', encoding='utf-8') as f:
+            task = json.load(f)
+        task['claim'] = claim
+        return task
+
+    return None
+
+
+def owns_lease(lease_path, claim):
+    """
+    True if the lease file still holds the given claim token (it was not taken over by another worker).
+    """
+    try:
+        with open(lease_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('claim') == claim
+    except (OSError, ValueError):
+        return False
+
+
+def release_lease(lease_path, claim):
+    """
+    Removes a lease file, unless it was taken over by another worker (whose live lease is kept).
+    """
+    if owns_lease(lease_path, claim):
+        try:
+            os.remove(lease_path)
+        except FileNotFoundError:
+            pass
+
+
+class LeaseHeartbeat:
+    """
+    Context manager that renews (touches) a lease file in a background thread while a task runs,
+    as long as the lease still holds this claim.
+    """
+
+    def __init__(self, lease_path, interval, claim):
+        self.lease_path = lease_path
+        self.interval = interval
+        self.claim = claim
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            if not owns_lease(self.lease_path, self.claim):
+                break
+            try:
+                os.utime(self.lease_path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        return False
+
+
+def publish_record(path, record):
+    """
+    Writes a JSON record exclusively: returns False (and writes nothing) if the record already exists.
+    """
+    part_path = f'{path}.{os.getpid()}.part'
+    with open(part_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f)
+    try:
+        os.link(part_path, path)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(part_path)
+
+
+def run_worker(queue_folder, worker_id=None, lease_seconds=LEASE_SECONDS, poll_seconds=POLL_SECONDS):
+    """
+    Claims and runs scenario tasks until every task of the queue is done or failed.
+
+    Parameters:
+        queue_folder : work queue folder
+        worker_id : unique worker name (default: host name and process id)
+        lease_seconds : a lease not renewed for this long is taken over by another worker
+        poll_seconds : wait between claim attempts when all open tasks are leased
+
+    Returns:
+        n_done : number of tasks finished by this worker
+    """
+    from a10_InverseApproach_and_MonthlytoDaily import process_scenario
+
+    worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}'
+    paths = queue_paths(queue_folder)
+    context = joblib.load(os.path.join(queue_folder, 'context.pkl'))
+    shard_folder = os.path.join(paths['shards'], worker_id)
+    n_done = 0
+
+    while True:
+        task = claim_task(queue_folder, worker_id, lease_seconds)
+        if task is None:
+            if queue_finished(queue_folder):
+                break
+            time.sleep(poll_seconds)  # Leased tasks may still expire and become claimable
+            continue
+
+        number = task['number']
+        lease_path = os.path.join(paths['leases'], f'{number}.json')
+        try:
+            with LeaseHeartbeat(lease_path, lease_seconds / 3, task['claim']):
+                solver_log, summary, budget_limited = process_scenario(task['sce'], number, shard_folder, **context)
+        except Exception:
+            publish_record(os.path.join(paths['failed'], f'{number}.json'),
+                           {'sce': task['sce'], 'number': number, 'worker': worker_id, 'error': traceback.format_exc()})
+            print(f"❌ Worker {worker_id}: Scenario {number} Failed.")
+        else:
+            if publish_record(os.path.join(paths['done'], f'{number}.json'),
+                              {'sce': task['sce'], 'number': number, 'worker': worker_id,
+                               'shard': worker_id, 'solver_log': solver_log.tolist(),
+                               'budget_limited': budget_limited.astype(int).tolist(),
+                               'summary': {key: value.tolist() for key, value in summary.items()}}):
+                n_done += 1
+        finally:
+            release_lease(lease_path, task['claim'])
+
+    return n_done
+
+
+def start_local_workers(queue_folder, queue_workers):
+    """
+    Starts `queue_workers` worker processes on this machine (they exit when the queue is finished).
+
+    Returns:
+        processes : list of subprocess.Popen objects
+    """
+    script = os.path.abspath(__file__)
+    processes = []
+    for i in range(queue_workers):
+        worker_id = f'{socket.gethostname()}-{os.getpid()}-{i + 1}'
+        processes.append(subprocess.Popen([sys.executable, script, queue_folder, worker_id],
+                                          cwd=os.path.dirname(script)))
+    if queue_workers > 0:
+        print(f"👷 {queue_workers} Local Workers Are Started.")
+    return processes
+
+
+def wait_for_queue(queue_folder, poll_seconds=POLL_SECONDS):
+    """
+    Waits until every task is done or failed (workers may run on any node sharing the queue folder).
+    Failed tasks are returned rather than raised, so that the done ones can be merged first.
+
+    Returns:
+        failed : sorted scenario numbers of the tasks that failed (and were not done by another worker)
+    """
+    n_tasks = len(task_numbers(queue_folder, 'tasks'))
+    progress_bar = tqdm(total=n_tasks, desc="📬 Waiting for Queue Workers", position=0)
+    while True:
+        n_finished = len(task_numbers(queue_folder, 'done') | task_numbers(queue_folder, 'failed'))
+        progress_bar.update(n_finished - progress_bar.n)
+        if n_finished >= n_tasks:
+            break
+        time.sleep(poll_seconds)
+    progress_bar.close()
+
+    return sorted(task_numbers(queue_folder, 'failed') - task_numbers(queue_folder, 'done'))
+
+
+def merge_shards(queue_folder, scenariofolderpass, manifest, daily, monthly, h5):
+    """
+    Moves the outputs of every done task from its shard into the result folder layout.
+
+    Parameters:
+        queue_folder : work queue folder
+        scenariofolderpass : result folder
+        manifest : run manifest (a19_) or None; merged scenarios are marked complete
+        daily, monthly, h5 : output flags (which files each scenario has)
+
+    Returns:
+        results : {sce: ([Location x Month x Solver x 2] solver log, plotting summary (a24_),
+                         [Location x Month] budget-limited month problems (a32_))}
+    """
+    paths = queue_paths(queue_folder)
+    results = {}
+
+    for number in sorted(task_numbers(queue_folder, 'done')):
+        with open(os.path.join(paths['done'], f'{number}.json'), 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        shard_folder = os.path.join(paths['shards'], record['shard'])
+
+        for relpath in expected_outputs(number, daily, monthly, h5):
+            destination = os.path.join(scenariofolderpass, relpath)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            with atomic_output(destination) as part_path:
+                shutil.move(os.path.join(shard_folder, relpath), part_path)
+
+        if manifest is not None:
+            mark_scenario_complete(manifest, scenariofolderpass, number, daily, monthly, h5)
+        summary = {key: np.array(value, dtype=np.float64) for key, value in record['summary'].items()}
+        results[record['sce']] = (np.array(record['solver_log'], dtype=np.float64), summary,
+                                  np.array(record['budget_limited'], dtype=bool))
+
+    print(f"🧩 {len(results)} Scenario Shards Are Merged into {scenariofolderpass}.")
+    return results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python a20_WorkQueue.py <queue_folder> [worker_id]")
+        sys.exit(1)
+    n_done = run_worker(os.path.abspath(sys.argv[1]), sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"✅ Worker Finished {n_done} Scenario Tasks.")
@@ -0,0 +1,72 @@
+# a21_RandomStreams.py
+
+import os
+import json
+import numpy as np
+
+"""
+Module: Reproducible Random Streams
+
+Every random draw of a run comes from its own stream, derived from one root seed with
+numpy's SeedSequence: the stream of (stage, scenario number, location) is the child that
+SeedSequence(root_seed).spawn() gives at that key path. A stream therefore depends only on
+the root seed and its key, not on the order in which scenarios or locations are run, so
+serial, parallel, batched and queue (sharded) runs give bit-identical results.
+
+Stages:
+    'randomyear' : random year matrices (scenario number 0 = run matrix, n = matrix of scenario n)
+    'knn'        : KNN year selection of the monthly-to-daily disaggregation (a15_)
+    'optimizer'  : differential evolution of each scenario and location (a11_)
+
+Key Functions:
+    - resolve_random_seed(): Root seed of the run (configured, resumed from the manifest, or new)
+    - spawn_stream(): Generator of one (stage, scenario number, location) stream
+"""
+
+STAGES = ('randomyear', 'knn', 'optimizer')
+
+
+def resolve_random_seed(random_seed, scenariofolderpass, resume, manifest_name='Run_Manifest.json'):
+    """
+    Root seed of the run.
+
+    Parameters:
+        random_seed : configured seed (integer), or None for a new seed
+        scenariofolderpass : result folder (its manifest holds the seed of an earlier run)
+        resume : with resume = 1 and random_seed = None, the seed of the resumed run is reused
+
+    Returns:
+        root_seed : integer root seed (record it to reproduce the run)
+    """
+    if random_seed is not None:
+        return int(random_seed)
+
+    manifest_path = os.path.join(scenariofolderpass, manifest_name)
+    if resume == 1 and os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                recorded = json.load(f).get('random_seed')
+            if recorded is not None:
+                return int(recorded)
+        except (OSError, ValueError):
+            pass
+
+    return int(np.random.SeedSequence().entropy)
+
+
+def spawn_stream(root_seed, stage, number=0, location=0):
+    """
+    Random generator of the (stage, scenario number, location) stream.
+
+    Parameters:
+        root_seed : root seed of the run (resolve_random_seed), or None
+        stage : one of STAGES
+        number : scenario file number (0 = run level)
+        location : location index (0 if the stage is not per location)
+
+    Returns:
+        rng : numpy.random.Generator, or None without a root seed (callers then use the global numpy random state)
+    """
+    if root_seed is None:
+        return None
+    return np.random.default_rng(np.random.SeedSequence(root_seed, spawn_key=(STAGES.index(stage), number, location)))
@@ -0,0 +1,261 @@
+# a22_OutputEncoding.py
+
+import warnings
+import numpy as np
+
+"""
+Module: Output Precision and Encoding
+
+Selects how the flow datasets of the scenario .h5 files are stored (output_precision in a1_):
+    'float64' : full precision (default)
+    'float32' : float32 flows, about half the size; relative error below 6e-8
+    'scaled'  : 16-bit unsigned integers with a scale/offset per location (column), about a quarter
+                of the size; absolute error below half the scale of each column
+
+Calendar columns (synthetic year and month of the daily time series) are stored as small integers in
+the compact modes: in 'scaled' mode they stay in the flow dataset as uint16 with scale 1, and in 'float32'
+mode they move to a companion dataset <name>_Calendar[Day] (int16 year, int8 month), named by the
+calendar_dataset attribute of the flow dataset. decode_dataset() puts them back in front of the flows.
+In 'float64' mode they stay float64 columns of the flow dataset, as in earlier files.
+
+Every encoded dataset carries attributes documenting the trade-off:
+    encoding, bytes_per_value, max_abs_error [Column], and for 'scaled' also
+    scale_factor [Column] and add_offset [Column] (decoded = stored * scale_factor + add_offset).
+
+Key Functions:
+    - encode_array(): Encodes a float64 array and returns the stored array and its attributes
+    - create_encoded_dataset(): Writes an encoded dataset into an open h5py file
+    - column_chunks(): One-column chunk shape (reading one location touches only its chunks)
+    - create_appendable_dataset(): Encoded dataset grown block by block with append_encoded_rows()
+    - decode_dataset(): Reads a dataset written by create_encoded_dataset() back as float64
+    - calendar_values(): Calendar columns of a companion calendar dataset as a [Row x Column] array
+"""
+
+OUTPUT_PRECISIONS = ('float64', 'float32', 'scaled')
+SCALED_MAX = np.iinfo(np.uint16).max - 1  # 65535 is kept as the fill value for NaN
+SCALED_FILL = np.iinfo(np.uint16).max
+CALENDAR_FIELDS = (('year', np.int16), ('month', np.int8), ('day', np.int8))  # Companion calendar dtypes
+
+
+def encode_array(array, output_precision, calendar_columns=0):
+    """
+    Encodes a float64 array whose last axis holds the columns (locations).
+
+    Parameters:
+        array : float64 array [... x Column]
+        output_precision : one of OUTPUT_PRECISIONS
+        calendar_columns : number of leading whole-number columns (year, month) stored exactly
+
+    Returns:
+        stored : array to write
+        attrs : dict of encoding attributes
+    """
+    if output_precision not in OUTPUT_PRECISIONS:
+        raise ValueError(f"❌ Unknown output_precision '{output_precision}'. Use one of {OUTPUT_PRECISIONS}.")
+
+    array = np.asarray(array, dtype=np.float64)
+    column_min, column_max = column_range(array) if output_precision == 'scaled' else (None, None)
+    attrs = encoding_from_range(output_precision, column_min, column_max, calendar_columns)
+    stored = encode_with(array, attrs)
+    attrs['max_abs_error'] = encoding_error(stored, attrs, array)
+    attrs['bytes_per_value'] = stored.dtype.itemsize
+    return stored, attrs
+
+
+def column_range(array):
+    """
+    Minimum and maximum of each column (last axis), ignoring NaN (NaN for all-NaN columns).
+    """
+    columns = np.asarray(array, dtype=np.float64).reshape(-1, np.shape(array)[-1])
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # All-NaN columns
+        return np.nanmin(columns, axis=0), np.nanmax(columns, axis=0)
+
+
+def encoding_from_range(output_precision, column_min=None, column_max=None, calendar_columns=0):
+    """
+    Encoding attributes (without the error attributes) of `output_precision`.
+
+    'scaled' needs the minimum / maximum of each column over all the data to be stored (column_range()),
+    so data written in blocks can be encoded exactly as if it were written at once.
+    """
+    if output_precision not in OUTPUT_PRECISIONS:
+        raise ValueError(f"❌ Unknown output_precision '{output_precision}'. Use one of {OUTPUT_PRECISIONS}.")
+    if output_precision != 'scaled':
+        return {'encoding': output_precision}
+
+    offset = np.nan_to_num(column_min, nan=0.0)
+    span = np.nan_to_num(column_max, nan=0.0) - offset
+    scale = np.where(span > 0, span / SCALED_MAX, 1.0)
+    scale[:calendar_columns] = 1.0
+    return {'encoding': 'scaled_uint16', 'scale_factor': scale, 'add_offset': offset,
+            'fill_value': SCALED_FILL}
+
+
+def encode_with(array, attrs):
+    """
+    Encodes a float64 array [... x Column] with the attributes of encoding_from_range().
+    """
+    if attrs['encoding'] == 'float64':
+        return array
+    if attrs['encoding'] == 'float32':
+        return array.astype(np.float32)
+    quantized = np.rint((array - attrs['add_offset']) / attrs['scale_factor'])
+    return np.where(np.isnan(quantized), SCALED_FILL, np.clip(quantized, 0, SCALED_MAX)).astype(np.uint16)
+
+
+def encoding_error(stored, attrs, array):
+    """
+    Largest absolute encoding error of each column (last axis).
+    """
+    error = np.abs(decode_array(stored, attrs) - array).reshape(-1, array.shape[-1])
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nan_to_num(np.nanmax(error, axis=0), nan=0.0)
+
+
+def decode_array(stored, attrs):
+    """
+    Decodes an array stored by encode_array() back to float64.
+    """
+    if attrs.get('encoding') == 'scaled_uint16':
+        decoded = stored.astype(np.float64) * attrs['scale_factor'] + attrs['add_offset']
+        return np.where(stored == attrs['fill_value'], np.nan, decoded)
+    return np.asarray(stored, dtype=np.float64)
+
+
+def column_chunks(shape, max_rows=65536):
+    """
+    Chunk shape holding one column (last axis) and at most `max_rows` entries of the first axis.
+    """
+    return (min(shape[0], max_rows),) + tuple(shape[1:-1]) + (1,)
+
+
+def separate_calendar(attrs, calendar_columns):
+    """
+    True if the calendar columns of an encoding are stored in a companion integer dataset ('float32').
+    """
+    return attrs['encoding'] == 'float32' and calendar_columns > 0
+
+
+def calendar_dtype(calendar_columns):
+    return np.dtype(list(CALENDAR_FIELDS[:calendar_columns]))
+
+
+def create_calendar_dataset(h5f, name, calendar_columns, calendar=None):
+    """
+    Creates the companion calendar dataset of the flow dataset h5f[name] (empty and appendable if calendar is None).
+
+    Returns:
+        dataset : h5py dataset of the calendar rows (one field per calendar column)
+    """
+    dtype = calendar_dtype(calendar_columns)
+    calendar_name = f"{name.split('(')[0].split('[')[0]}_Calendar[Day]"
+    if calendar is None:
+        dataset = h5f.create_dataset(calendar_name, shape=(0,), maxshape=(None,), dtype=dtype, chunks=(65536,))
+    else:
+        dataset = h5f.create_dataset(calendar_name, data=calendar_records(calendar, dtype))
+    dataset.attrs['dimension'] = 'Day'
+    dataset.attrs['description'] = f"Calendar columns ({', '.join(dtype.names)}) of {name}"
+    return dataset
+
+
+def calendar_records(calendar, dtype):
+    """
+    Calendar columns [Row x Column] as a record array of the companion calendar dtype.
+    """
+    records = np.empty(calendar.shape[0], dtype=dtype)
+    for column, field in enumerate(dtype.names):
+        records[field] = np.rint(calendar[:, column])
+    return records
+
+
+def calendar_values(records):
+    """
+    Calendar columns [Row x Column] (float64) of records read from a companion calendar dataset.
+    """
+    return np.column_stack([records[field] for field in records.dtype.names]).astype(np.float64)
+
+
+def create_encoded_dataset(h5f, name, array, output_precision, calendar_columns=0, chunks=None):
+    """
+    Writes `array` encoded with `output_precision` into h5f[name] and attaches the encoding attributes.
+    In 'float32' mode, the calendar columns are written to the companion calendar dataset.
+
+    Parameters:
+        chunks : h5py chunk shape (e.g. column_chunks(array.shape)), or None for contiguous storage
+
+    Returns:
+        dataset : h5py dataset (add 'dimension' / 'description' attributes as usual)
+    """
+    stored, attrs = encode_array(array, output_precision, calendar_columns)
+    if separate_calendar(attrs, calendar_columns):
+        calendar = create_calendar_dataset(h5f, name, calendar_columns, np.asarray(array)[:, :calendar_columns])
+        stored = stored[:, calendar_columns:]
+        attrs['max_abs_error'] = attrs['max_abs_error'][calendar_columns:]
+        attrs['calendar_dataset'] = calendar.name
+    dataset = h5f.create_dataset(name, data=stored, chunks=chunks)
+    for key, value in attrs.items():
+        dataset.attrs[key] = value
+    return dataset
+
+
+def create_appendable_dataset(h5f, name, n_columns, output_precision, calendar_columns=0,
+                              column_min=None, column_max=None, chunk_rows=65536):
+    """
+    Creates an empty encoded [Row x Column] dataset that grows as blocks of rows are appended
+    (append_encoded_rows()), so long series are written without holding them in memory.
+
+    Parameters:
+        n_columns : number of columns
+        output_precision, calendar_columns : as in encode_array()
+        column_min, column_max : ('scaled' only) minimum / maximum of each column over all the blocks
+        chunk_rows : rows per one-column storage chunk
+
+    Returns:
+        dataset : h5py dataset (add 'dimension' / 'description' attributes as usual)
+    """
+    attrs = encoding_from_range(output_precision, column_min, column_max, calendar_columns)
+    dtype = {'float64': np.float64, 'float32': np.float32, 'scaled_uint16': np.uint16}[attrs['encoding']]
+    if separate_calendar(attrs, calendar_columns):
+        attrs['calendar_dataset'] = create_calendar_dataset(h5f, name, calendar_columns).name
+        n_columns = n_columns - calendar_columns
+    dataset = h5f.create_dataset(name, shape=(0, n_columns), maxshape=(None, n_columns), dtype=dtype,
+                                 chunks=(max(1, chunk_rows), 1))
+    for key, value in attrs.items():
+        dataset.attrs[key] = value
+    dataset.attrs['max_abs_error'] = np.zeros(n_columns)
+    dataset.attrs['bytes_per_value'] = np.dtype(dtype).itemsize
+    return dataset
+
+
+def append_encoded_rows(dataset, rows):
+    """
+    Encodes a float64 block [Row x Column] with the attributes of `dataset` and appends it (its calendar
+    columns to the companion calendar dataset, if it has one).
+    """
+    attrs = dict(dataset.attrs)
+    if 'calendar_dataset' in attrs:
+        calendar = dataset.file[attrs['calendar_dataset']]
+        calendar_columns = len(calendar.dtype.names)
+        records = calendar_records(rows[:, :calendar_columns], calendar.dtype)
+        calendar.resize(calendar.shape[0] + records.shape[0], axis=0)
+        calendar[-records.shape[0]:] = records
+        rows = rows[:, calendar_columns:]
+    stored = encode_with(rows, attrs)
+    start = dataset.shape[0]
+    dataset.resize(start + rows.shape[0], axis=0)
+    dataset[start:] = stored
+    dataset.attrs['max_abs_error'] = np.maximum(attrs['max_abs_error'], encoding_error(stored, attrs, rows))
+
+
+def decode_dataset(dataset):
+    """
+    Reads an h5py dataset as float64, decoding it if it was written with scale/offset encoding
+    (with the columns of its companion calendar dataset in front, if it has one).
+    """
+    attrs = dict(dataset.attrs)
+    values = decode_array(dataset[()], attrs)
+    if 'calendar_dataset' in attrs:
+        values = np.column_stack([calendar_values(dataset.file[attrs['calendar_dataset']][()]), values])
+    return values
@@ -0,0 +1,117 @@
+# a23_RecordedData.py
+
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+"""
+Module: Recorded Dataset Container
+
+The recorded daily data (Sheet1 of RecordedData.xlsx) is loaded once in a1_ into a RecordedData
+object instead of being passed around as a mixed object array that every stage re-casts and
+re-slices. The object holds typed, C-contiguous, read-only arrays:
+
+    year, month : int32 calendar columns [Day] (the date / day column of Sheet1 is not used by any stage)
+    flows : float64 station matrix [Day x Location]
+    calendar_flows : float64 [Day x (2 + Location)] = year, month, flows (the layout used by a15_ to a17_)
+    monthly_totals : float64 cached monthly sums [Year x Month x Location]
+    local_indices, nonlocal_indices : int arrays of local / non-local locations
+
+Being plain numeric arrays, they are memory-mapped (not copied) by joblib when sent to parallel workers.
+Stages accept either a RecordedData object or the raw array (converted with as_recorded_data()).
+
+The input Excel sheets are read with read_excel_values(), which keeps the parsed sheets of the process
+keyed by file path, modification time and size: runs of a campaign (a35_) that share an input file parse
+it once.
+
+Key Functions:
+    - RecordedData: Immutable recorded dataset
+    - as_recorded_data(): Returns a RecordedData for a RecordedData or a raw Sheet1 array
+    - read_excel_values(): Values of an Excel sheet, parsed once per file version in this process
+"""
+
+_excel_sheets = {}
+_excel_lock = threading.Lock()
+
+
+def _frozen(array, dtype):
+    """
+    C-contiguous, read-only copy of `array` with the given dtype.
+    """
+    array = np.ascontiguousarray(array, dtype=dtype)
+    array.flags.writeable = False
+    return array
+
+
+class RecordedData:
+    """
+    Immutable recorded daily dataset (see the module description).
+    """
+
+    def __init__(self, year, month, flows, isLocal=None):
+        flows = np.asarray(flows, dtype=np.float64)
+        self.year = _frozen(year, np.int32)
+        self.month = _frozen(month, np.int32)
+        self.flows = _frozen(flows, np.float64)
+        self.calendar_flows = _frozen(np.column_stack([self.year, self.month, self.flows]), np.float64)
+
+        self.firstyear = int(self.year[0])
+        self.lastyear = int(self.year[-1])
+        self.numberofyears_recorded = self.lastyear - self.firstyear + 1
+        self.numberofdays = self.flows.shape[0]
+        self.numberoflocations = self.flows.shape[1]
+
+        # Aggregate historical daily to monthly flow (accumulated in day order)
+        monthly_totals = np.zeros((self.numberofyears_recorded, 12, self.numberoflocations))
+        valid = (self.year >= self.firstyear) & (self.year <= self.lastyear) & (self.month >= 1) & (self.month <= 12)
+        np.add.at(monthly_totals, (self.year[valid] - self.firstyear, self.month[valid] - 1), self.flows[valid])
+        self.monthly_totals = _frozen(monthly_totals, np.float64)
+
+        isLocal = np.zeros(self.numberoflocations) if isLocal is None else np.asarray(isLocal, dtype=np.float64).flatten()
+        self.isLocal = _frozen(isLocal, np.int32)
+        self.local_indices = _frozen(np.where(self.isLocal == 1)[0], np.int64)
+        self.nonlocal_indices = _frozen(np.where(self.isLocal == 0)[0], np.int64)
+
+    @classmethod
+    def from_array(cls, Data, isLocal=None):
+        """
+        Builds the dataset from the Sheet1 array [Day x (3 + Location)]: date, year, month, flows.
+        """
+        Data = np.asarray(Data)
+        return cls(Data[:, 1].astype(np.float64), Data[:, 2].astype(np.float64), Data[:, 3:].astype(np.float64), isLocal)
+
+    def __setattr__(self, name, value):
+        if name in self.__dict__:
+            raise AttributeError(f"RecordedData is immutable: '{name}' cannot be changed.")
+        super().__setattr__(name, value)
+
+    def __repr__(self):
+        return (f"RecordedData({self.numberofdays} days, {self.firstyear}-{self.lastyear}, "
+                f"{self.numberoflocations} locations, {len(self.local_indices)} local)")
+
+
+def as_recorded_data(Data):
+    """
+    Returns `Data` if it is a RecordedData object, else builds one from the raw Sheet1 array.
+    """
+    if isinstance(Data, RecordedData):
+        return Data
+    return RecordedData.from_array(Data)
+
+
+def read_excel_values(path, sheet_name=0):
+    """
+    Values of an Excel sheet without header (pd.read_excel(path, sheet_name, header=None).values).
+    Parsed sheets are kept per (path, sheet, modification time, size), so an unchanged file is parsed once per
+    process; every call returns a fresh copy that the caller may modify.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), sheet_name, stat.st_mtime_ns, stat.st_size)
+    with _excel_lock:
+        values = _excel_sheets.get(key)
+    if values is None:
+        values = pd.read_excel(path, sheet_name=sheet_name, header=None).values
+        with _excel_lock:
+            _excel_sheets[key] = values
+    return values.copy()
@@ -0,0 +1,361 @@
+# a24_RunSummary.py
+
+import os
+import numpy as np
+import h5py
+
+from a22_OutputEncoding import decode_dataset
+from a26_ScenarioStore import SCHEMA, resolve_dataset, scenario_numbers
+from a25_StreamingReducers import RunningEnvelope, QuantileSketch, save_reducer, load_reducer
+
+"""
+Module: Run Summary Store (Precomputed Plotting Summaries)
+
+While scenarios are generated, a10_ appends a compact summary of each finished scenario to
+OutputData/Run_Summary.h5, so the plotting scripts (c1_ to c3_) read kilobytes instead of
+rescanning every Scenario{n}.h5 file.
+
+Datasets (flows in million m3 per month):
+    Exceedance_Probability[Quantile]                  Exceedance probabilities of the FDC quantiles
+    FDC_Recorded[Quantile x Location]                 Recorded monthly flow duration curve
+    Monthly_Recorded[Year x Month x Location]         Recorded monthly flows
+    Scenario_Number[Scenario]                         File number of each summarized scenario (one row each)
+    Target_Deviation[Scenario x 2]                    Target mean / SD deviation (%)
+    FDC_Synthetic[Scenario x Quantile x Location]     Synthetic monthly flow duration curve
+    Monthly_Envelope[Scenario x Statistic x Month x Location]
+                                                      Min, percentiles and max over the synthetic years
+    Opt_Mean_Deviation[Scenario x Location x Month]   Achieved mean deviation (%)
+    Opt_SD_Deviation[Scenario x Location x Month]     Achieved SD deviation (%)
+    Sum_Distance_FromTarget[Scenario x Location]      Distance from target
+    Series_Min / Series_Max[Year x Month x Location]  Running min / max over all summarized scenarios
+
+Streaming reducers of the ensemble (a25_, group Reducers/, size independent of the number of scenarios):
+    Series_Envelope  RunningEnvelope [Year x Month x Location]  Synthetic monthly series (Series_Min / Series_Max)
+    FDC_Envelope     RunningEnvelope [Quantile x Location]      Synthetic flow duration curves
+    FDC_Sketch       QuantileSketch  [Quantile x Location]      Spread of the flow duration curves across scenarios
+    Monthly_Sketch   QuantileSketch  [Month x Location]         Monthly flow over all scenarios and synthetic years
+
+Key Functions:
+    - scenario_summary(): Summary of one scenario (small arrays)
+    - prepare_run_summary(): Creates the store, or keeps it and adds missing completed scenarios on resume
+    - append_scenario_summary(): Adds (or replaces) the row of one scenario
+    - load_run_summary(): Reads the store (rebuilding it from the scenario files if it is missing)
+    - load_run_reducers(): Reads the streaming reducers of the store
+"""
+
+SUMMARY_NAME = 'Run_Summary.h5'
+EXCEEDANCE = np.linspace(0.0, 1.0, 101)
+STATISTICS = ('min', 'p5', 'p25', 'p50', 'p75', 'p95', 'max')
+PERCENTILES = (0, 5, 25, 50, 75, 95, 100)
+
+MONTHLY_RECORDED = SCHEMA['monthly_recorded']
+
+REDUCER_DESCRIPTIONS = {
+    'Series_Envelope': 'Running min / max of the synthetic monthly flow [Year x Month x Location] over all scenarios',
+    'FDC_Envelope': 'Running min / max of the synthetic flow duration curves [Quantile x Location]',
+    'FDC_Sketch': 'Quantile sketch of the synthetic flow duration curves [Quantile x Location] across scenarios',
+    'Monthly_Sketch': 'Quantile sketch of the synthetic monthly flow [Month x Location] over all scenarios and years',
+}
+
+
+def fdc_quantiles(monthly):
+    """
+    Flow duration curve [Quantile x Location] of monthly flows [Year x Month x Location] at EXCEEDANCE.
+    """
+    flows = np.asarray(monthly, dtype=np.float64).reshape(-1, monthly.shape[-1])
+    return np.quantile(flows, 1.0 - EXCEEDANCE, axis=0)
+
+
+def scenario_summary(Monthly_Synthetic, mean_change_syn, SD_change_syn, dist):
+    """
+    Summary of one scenario.
+
+    Parameters:
+        Monthly_Synthetic : [Year x Month x Location] synthetic monthly flow (million m3 per month)
+        mean_change_syn, SD_change_syn : [Location x Month] achieved deviations (%)
+        dist : [Location] distance from target
+
+    Returns:
+        summary : dict of arrays (see append_scenario_summary)
+    """
+    Monthly_Synthetic = np.asarray(Monthly_Synthetic, dtype=np.float64)
+    return {
+        'fdc': fdc_quantiles(Monthly_Synthetic),
+        'envelope': np.percentile(Monthly_Synthetic, PERCENTILES, axis=0),
+        'mean_change': np.asarray(mean_change_syn, dtype=np.float64),
+        'sd_change': np.asarray(SD_change_syn, dtype=np.float64),
+        'distance': np.asarray(dist, dtype=np.float64).ravel(),
+        'monthly': Monthly_Synthetic,
+    }
+
+
+def summary_path(scenariofolderpass):
+    return os.path.join(scenariofolderpass, 'OutputData', SUMMARY_NAME)
+
+
+def create_run_summary(path, Monthly_Recorded):
+    """
+    Creates an empty summary store with the recorded flow summaries.
+    """
+    Monthly_Recorded = np.asarray(Monthly_Recorded, dtype=np.float64)
+    n_years, _, n_locations = Monthly_Recorded.shape
+    n_q, n_s = len(EXCEEDANCE), len(STATISTICS)
+
+    with h5py.File(path, 'w') as h5f:
+        ds = h5f.create_dataset('Exceedance_Probability[Quantile]', data=EXCEEDANCE)
+        ds.attrs['dimension'] = 'Quantile'
+        ds.attrs['description'] = 'Exceedance probability (0-1) of each flow duration curve point'
+
+        ds = h5f.create_dataset('FDC_Recorded(million m3 per month)[Quantile x Location]', data=fdc_quantiles(Monthly_Recorded))
+        ds.attrs['dimension'] = 'Quantile x Location'
+        ds.attrs['description'] = 'Recorded monthly flow duration curve'
+
+        ds = h5f.create_dataset(MONTHLY_RECORDED, data=Monthly_Recorded)
+        ds.attrs['dimension'] = 'Year x Month x Location'
+        ds.attrs['description'] = 'Recorded (historical) monthly streamflow data'
+
+        def rows(name, shape, dimension, description, dtype=np.float64):
+            ds = h5f.create_dataset(name, shape=(0,) + shape, maxshape=(None,) + shape, dtype=dtype,
+                                    chunks=(16,) + shape)
+            ds.attrs['dimension'] = dimension
+            ds.attrs['description'] = description
+            return ds
+
+        rows('Scenario_Number[Scenario]', (), 'Scenario', 'File number of each summarized scenario (Scenario{number}.h5)', np.int64)
+        rows('Target_Deviation[Scenario x 2]', (2,), 'Scenario x 2', 'Target deviation: Column 0 = Mean %, Column 1 = SD %')
+        rows('FDC_Synthetic(million m3 per month)[Scenario x Quantile x Location]', (n_q, n_locations),
+             'Scenario x Quantile x Location', 'Synthetic monthly flow duration curve of each scenario')
+        ds = rows('Monthly_Envelope(million m3 per month)[Scenario x Statistic x Month x Location]', (n_s, 12, n_locations),
+                  'Scenario x Statistic x Month x Location', 'Statistics of the synthetic monthly flow over the synthetic years')
+        ds.attrs['statistics'] = np.array(STATISTICS, dtype='S')
+        rows('Opt_Mean_Deviation[Scenario x Location x Month]', (n_locations, 12),
+             'Scenario x Location x Month', 'Actual mean deviation achieved by optimization')
+        rows('Opt_SD_Deviation[Scenario x Location x Month]', (n_locations, 12),
+             'Scenario x Location x Month', 'Actual standard deviation deviation achieved by optimization')
+        rows('Sum_Distance_FromTarget[Scenario x Location]', (n_locations,),
+             'Scenario x Location', 'Total distance from target per location')
+
+        h5f.attrs['n_series'] = 0
+
+
+def append_scenario_summary(path, number, target_deviation, summary):
+    """
+    Adds the summary of scenario `number` to the store and its streaming reducers (replacing its row and
+    rebuilding the reducers if it is already there).
+    """
+    with h5py.File(path, 'a') as h5f:
+        numbers = h5f['Scenario_Number[Scenario]']
+        existing = np.where(numbers[()] == number)[0]
+        new_row = len(existing) == 0
+        if not new_row:
+            row = int(existing[0])
+        else:
+            row = numbers.shape[0]
+            for name in h5f:
+                if isinstance(h5f[name], h5py.Dataset) and h5f[name].maxshape[0] is None:
+                    h5f[name].resize(row + 1, axis=0)
+
+        numbers[row] = number
+        h5f['Target_Deviation[Scenario x 2]'][row] = target_deviation
+        h5f['FDC_Synthetic(million m3 per month)[Scenario x Quantile x Location]'][row] = summary['fdc']
+        h5f['Monthly_Envelope(million m3 per month)[Scenario x Statistic x Month x Location]'][row] = summary['envelope']
+        h5f['Opt_Mean_Deviation[Scenario x Location x Month]'][row] = summary['mean_change']
+        h5f['Opt_SD_Deviation[Scenario x Location x Month]'][row] = summary['sd_change']
+        h5f['Sum_Distance_FromTarget[Scenario x Location]'][row] = summary['distance']
+
+        # Streaming reducers of the ensemble: a new scenario is folded in; a replaced scenario cannot be taken
+        # out of them, so they are rebuilt over every summarized scenario
+        if new_row:
+            reducers = read_reducers(h5f) if 'Reducers' in h5f else new_reducers(summary)
+            fold_into_reducers(reducers, summary['monthly'], summary['fdc'])
+        else:
+            reducers = rebuild_reducers(h5f, os.path.dirname(path), number, summary)
+        for name, reducer in reducers.items():
+            save_reducer(h5f, f'Reducers/{name}', reducer, REDUCER_DESCRIPTIONS[name])
+
+        series_min, series_max = reducers['Series_Envelope'].result()
+        for name, description, values in (('Series_Min', 'Minimum', series_min), ('Series_Max', 'Maximum', series_max)):
+            name = f'{name}(million m3 per month)[Year x Month x Location]'
+            if name not in h5f:
+                ds = h5f.create_dataset(name, data=values)
+                ds.attrs['dimension'] = 'Year x Month x Location'
+                ds.attrs['description'] = f'{description} synthetic monthly flow over all summarized scenarios'
+            else:
+                h5f[name][...] = values
+        if new_row:
+            h5f.attrs['n_series'] = int(h5f.attrs['n_series']) + 1
+
+
+def new_reducers(summary):
+    """
+    Empty streaming reducers shaped for the arrays of a scenario summary.
+    """
+    monthly = summary['monthly']
+    return {
+        'Series_Envelope': RunningEnvelope(monthly.shape),
+        'FDC_Envelope': RunningEnvelope(summary['fdc'].shape),
+        'FDC_Sketch': QuantileSketch(summary['fdc'].shape),
+        'Monthly_Sketch': QuantileSketch(monthly.shape[1:]),
+    }
+
+
+def fold_into_reducers(reducers, monthly, fdc):
+    """
+    Folds the monthly series and flow duration curve of one scenario into the streaming reducers.
+    """
+    if monthly is not None:
+        reducers['Series_Envelope'].update(monthly)
+        reducers['Monthly_Sketch'].update(monthly)
+    if fdc is not None:
+        reducers['FDC_Envelope'].update(fdc)
+        reducers['FDC_Sketch'].update(fdc)
+
+
+def rebuild_reducers(h5f, outputfolder, number, summary):
+    """
+    Streaming reducers rebuilt over every scenario of an open summary store, with the new summary of scenario
+    `number` (its row is already replaced). The flow duration curves are read from the store and the monthly
+    series of the other scenarios from their Scenario{n}.h5 files in outputfolder. If one of these files cannot
+    be read, the monthly reducers keep their earlier contents and the new series is folded in.
+    """
+    reducers = new_reducers(summary)
+    for fdc in h5f['FDC_Synthetic(million m3 per month)[Scenario x Quantile x Location]']:
+        fold_into_reducers(reducers, None, fdc)
+
+    for other in h5f['Scenario_Number[Scenario]'][()]:
+        monthly = summary['monthly'] if other == number else read_monthly_synthetic(
+            os.path.join(outputfolder, f'Scenario{int(other)}.h5'))
+        if monthly is None:
+            print(f"⚠️ Scenario{int(other)}.h5 Cannot Be Read. The Monthly Reducers Still Include the Replaced Series of Scenario {number}.")
+            previous = read_reducers(h5f) if 'Reducers' in h5f else new_reducers(summary)
+            reducers['Series_Envelope'], reducers['Monthly_Sketch'] = previous['Series_Envelope'], previous['Monthly_Sketch']
+            fold_into_reducers(reducers, summary['monthly'], None)
+            break
+        fold_into_reducers(reducers, monthly, None)
+    return reducers
+
+
+def read_monthly_synthetic(file_path):
+    """
+    Synthetic monthly flow [Year x Month x Location] of a Scenario{n}.h5 file, or None if it cannot be read.
+    """
+    try:
+        with h5py.File(file_path, 'r') as h5f:
+            return np.asarray(decode_dataset(resolve_dataset(h5f, 'monthly')), dtype=np.float64)
+    except (OSError, KeyError):
+        return None
+
+
+def read_reducers(h5f):
+    """
+    Streaming reducers {name: reducer} of an open summary store.
+    """
+    return {name: load_reducer(h5f['Reducers'], name) for name in h5f['Reducers']}
+
+
+def summary_from_scenario_file(file_path):
+    """
+    Summary of a scenario read back from its Scenario{n}.h5 file.
+
+    Returns:
+        target_deviation, summary (None, None if the file cannot be read)
+    """
+    try:
+        with h5py.File(file_path, 'r') as h5f:
+            return np.asarray(h5f.attrs['target_deviation'], dtype=np.float64), scenario_summary(
+                decode_dataset(resolve_dataset(h5f, 'monthly')),
+                resolve_dataset(h5f, 'mean_deviation')[()],
+                resolve_dataset(h5f, 'sd_deviation')[()],
+                resolve_dataset(h5f, 'distance')[()],
+            )
+    except (OSError, KeyError):
+        return None, None
+
+
+def prepare_run_summary(scenariofolderpass, Monthly_Recorded, complete_numbers):
+    """
+    Creates a new summary store, or, if scenarios of the run are already complete (resume), keeps the
+    existing store and adds the completed scenarios it does not contain yet (read from their files).
+
+    Parameters:
+        scenariofolderpass : result folder
+        Monthly_Recorded : [Year x Month x Location] recorded monthly flow (million m3 per month)
+        complete_numbers : file numbers of the scenarios already complete in this run folder
+
+    Returns:
+        path : path of the summary store
+    """
+    path = summary_path(scenariofolderpass)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    summarized = set()
+    if complete_numbers and os.path.exists(path):
+        try:
+            with h5py.File(path, 'r') as h5f:
+                summarized = set(int(v) for v in h5f['Scenario_Number[Scenario]'][()])
+        except (OSError, KeyError):
+            summarized = set()
+            os.remove(path)
+    if not complete_numbers or not os.path.exists(path):
+        create_run_summary(path, Monthly_Recorded)
+
+    for number in sorted(set(complete_numbers) - summarized):
+        target, summary = summary_from_scenario_file(os.path.join(scenariofolderpass, 'OutputData', f'Scenario{number}.h5'))
+        if summary is not None:
+            append_scenario_summary(path, number, target, summary)
+
+    return path
+
+
+def rebuild_run_summary(scenariofolderpass):
+    """
+    Builds the summary store of a result folder from its Scenario{n}.h5 files.
+    """
+    numbers = scenario_numbers(os.path.join(scenariofolderpass, 'OutputData'))
+    if not numbers:
+        raise FileNotFoundError(f"❌ No Scenario .h5 Files Found in {os.path.join(scenariofolderpass, 'OutputData')}.")
+
+    with h5py.File(os.path.join(scenariofolderpass, 'OutputData', f'Scenario{numbers[0]}.h5'), 'r') as h5f:
+        Monthly_Recorded = decode_dataset(resolve_dataset(h5f, 'monthly_recorded'))
+    path = summary_path(scenariofolderpass)
+    create_run_summary(path, Monthly_Recorded)
+    for number in numbers:
+        target, summary = summary_from_scenario_file(os.path.join(scenariofolderpass, 'OutputData', f'Scenario{number}.h5'))
+        if summary is not None:
+            append_scenario_summary(path, number, target, summary)
+    return path
+
+
+def existing_summary_path(scenariofolderpass):
+    """
+    Path of the summary store of a result folder, rebuilt from the scenario files first if it does not exist.
+    """
+    path = summary_path(scenariofolderpass)
+    if not os.path.exists(path):
+        print("📊 Run Summary Not Found. Building It from the Scenario Files.")
+        rebuild_run_summary(scenariofolderpass)
+    return path
+
+
+def load_run_summary(scenariofolderpass, names=None):
+    """
+    Reads the summary store of a result folder into a dict {dataset name: array} (plus 'n_series').
+    The store is rebuilt from the scenario files first if it does not exist.
+
+    Parameters:
+        scenariofolderpass : result folder
+        names : dataset names to read (default: every dataset; the per-scenario rows grow with the ensemble)
+    """
+    with h5py.File(existing_summary_path(scenariofolderpass), 'r') as h5f:
+        names = [name for name in h5f if isinstance(h5f[name], h5py.Dataset)] if names is None else names
+        summary = {name: h5f[name][()] for name in names}
+        summary['n_series'] = int(h5f.attrs['n_series'])
+    return summary
+
+
+def load_run_reducers(scenariofolderpass):
+    """
+    Reads the streaming reducers (a25_) of the summary store of a result folder: {name: reducer}.
+    """
+    with h5py.File(existing_summary_path(scenariofolderpass), 'r') as h5f:
+        return read_reducers(h5f)
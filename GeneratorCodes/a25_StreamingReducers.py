@@ -0,0 +1,270 @@
+# a25_StreamingReducers.py
+
+import numpy as np
+
+"""
+Module: Streaming Ensemble Reducers
+
+Reducers that consume scenarios one at a time and keep a fixed-size state per cell (for example
+per Month x Location), so ensemble statistics need memory independent of the number of scenarios:
+
+    RunningEnvelope : exact running minimum / maximum (and count) of every cell
+    QuantileSketch  : approximate quantiles of every cell from a log-bucket histogram
+                      (each returned quantile is within `relative_accuracy` of the value of an
+                      element of that rank; values <= 0, e.g. dry months, are counted exactly as 0)
+
+Both reducers can be merged (partial ensembles, queue shards) and saved to / loaded from an h5py
+group, and both accept one scenario array of the cell shape, or a stack [Sample x cell shape]
+(e.g. all synthetic years of one scenario) per update.
+
+Usage:
+    envelope = RunningEnvelope((12, n_locations))
+    sketch = QuantileSketch((12, n_locations))
+    for scenario in scenarios:
+        envelope.update(scenario)     # scenario [Year x Month x Location]: every year is one sample
+        sketch.update(scenario)
+    p5, p50, p95 = sketch.quantile([0.05, 0.5, 0.95])
+
+Key Functions:
+    - RunningEnvelope: Running min / max per cell
+    - QuantileSketch: Approximate quantiles per cell
+    - save_reducer(): Writes a reducer into an h5py group
+    - load_reducer(): Reads a reducer written by save_reducer()
+"""
+
+
+def _samples(values, shape):
+    """
+    Values as a float64 [Sample x Cell] array (one sample if `values` has the cell shape).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n_cells = int(np.prod(shape))
+    if values.shape == tuple(shape):
+        return values.reshape(1, n_cells)
+    if values.ndim < len(shape) or values.shape[values.ndim - len(shape):] != tuple(shape):
+        raise ValueError(f"❌ Reducer Values of Shape {values.shape} Do Not End with the Cell Shape {tuple(shape)}.")
+    return values.reshape(-1, n_cells)
+
+
+class RunningEnvelope:
+    """
+    Exact running minimum and maximum of every cell (NaN values are ignored).
+    """
+
+    def __init__(self, shape):
+        self.shape = tuple(shape)
+        self.count = np.zeros(self.shape, dtype=np.int64)
+        self.min = np.full(self.shape, np.inf)
+        self.max = np.full(self.shape, -np.inf)
+
+    def update(self, values):
+        """
+        Folds one scenario (cell shape) or a stack of samples [Sample x cell shape] into the envelope.
+        """
+        values = _samples(values, self.shape)
+        valid = ~np.isnan(values)
+        self.count += valid.sum(axis=0).reshape(self.shape)
+        self.min = np.minimum(self.min, np.where(valid, values, np.inf).min(axis=0).reshape(self.shape))
+        self.max = np.maximum(self.max, np.where(valid, values, -np.inf).max(axis=0).reshape(self.shape))
+        return self
+
+    def merge(self, other):
+        """
+        Adds the samples of another envelope with the same shape.
+        """
+        self.count += other.count
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        return self
+
+    def result(self):
+        """
+        Returns:
+            minimum, maximum : arrays of the cell shape (NaN where a cell has no samples)
+        """
+        empty = self.count == 0
+        return np.where(empty, np.nan, self.min), np.where(empty, np.nan, self.max)
+
+    def state(self):
+        return {'count': self.count, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_state(cls, state, attrs=None):
+        reducer = cls(np.shape(state['count']))
+        reducer.count = np.asarray(state['count'], dtype=np.int64)
+        reducer.min = np.asarray(state['min'], dtype=np.float64)
+        reducer.max = np.asarray(state['max'], dtype=np.float64)
+        return reducer
+
+
+class QuantileSketch:
+    """
+    Approximate quantiles of every cell (log-bucket histogram with relative accuracy `relative_accuracy`).
+
+    A positive value x falls into bucket i = ceil(log(x) / log(gamma)), gamma = (1 + a) / (1 - a), whose
+    representative value 2 * gamma**i / (gamma + 1) is within a relative error a of every value in it.
+    The bucket range grows as new values arrive; its size depends only on the spread of the values
+    (about 115 buckets per factor of 10 for a = 0.01), not on the number of samples.
+    """
+
+    def __init__(self, shape, relative_accuracy=0.01):
+        self.shape = tuple(shape)
+        self.relative_accuracy = float(relative_accuracy)
+        self.gamma = (1.0 + self.relative_accuracy) / (1.0 - self.relative_accuracy)
+        self.log_gamma = np.log(self.gamma)
+        n_cells = int(np.prod(self.shape))
+        self.zero_count = np.zeros(n_cells, dtype=np.int64)
+        self.counts = np.zeros((n_cells, 0), dtype=np.int64)
+        self.offset = 0  # Bucket index of counts[:, 0]
+
+    def _extend(self, low, high):
+        """
+        Grows the bucket range to cover the bucket indices low..high.
+        """
+        if self.counts.shape[1] == 0:
+            self.counts = np.zeros((self.counts.shape[0], high - low + 1), dtype=np.int64)
+            self.offset = low
+            return
+        new_low = min(low, self.offset)
+        new_high = max(high, self.offset + self.counts.shape[1] - 1)
+        if new_low == self.offset and new_high == self.offset + self.counts.shape[1] - 1:
+            return
+        counts = np.zeros((self.counts.shape[0], new_high - new_low + 1), dtype=np.int64)
+        counts[:, self.offset - new_low:self.offset - new_low + self.counts.shape[1]] = self.counts
+        self.counts = counts
+        self.offset = new_low
+
+    def update(self, values):
+        """
+        Folds one scenario (cell shape) or a stack of samples [Sample x cell shape] into the sketch.
+        """
+        values = _samples(values, self.shape)
+        valid = ~np.isnan(values)
+        positive = valid & (values > 0)
+        self.zero_count += (valid & ~positive).sum(axis=0)
+
+        if positive.any():
+            index = np.ceil(np.log(values[positive]) / self.log_gamma).astype(np.int64)
+            self._extend(int(index.min()), int(index.max()))
+            cell = np.nonzero(positive)[1]
+            np.add.at(self.counts, (cell, index - self.offset), 1)
+        return self
+
+    def merge(self, other):
+        """
+        Adds the samples of another sketch with the same shape and relative accuracy.
+        """
+        if other.relative_accuracy != self.relative_accuracy or other.shape != self.shape:
+            raise ValueError("❌ Only Sketches with the Same Shape and Relative Accuracy Can Be Merged.")
+        self.zero_count += other.zero_count
+        if other.counts.shape[1] > 0:
+            self._extend(other.offset, other.offset + other.counts.shape[1] - 1)
+            start = other.offset - self.offset
+            self.counts[:, start:start + other.counts.shape[1]] += other.counts
+        return self
+
+    @property
+    def count(self):
+        return (self.zero_count + self.counts.sum(axis=1)).reshape(self.shape)
+
+    def quantile(self, q):
+        """
+        Approximate quantiles of every cell.
+
+        Parameters:
+            q : quantile (0-1) or sequence of quantiles
+
+        Returns:
+            values : [Quantile x cell shape] (cell shape for a scalar q); NaN where a cell has no samples
+        """
+        q_array = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        if np.any((q_array < 0) | (q_array > 1)):
+            raise ValueError("❌ Quantiles Must Be between 0 and 1.")
+
+        cumulative = np.concatenate([self.zero_count[:, None], self.counts], axis=1).cumsum(axis=1)
+        total = cumulative[:, -1]
+        bucket_values = np.concatenate([[0.0], 2.0 * self.gamma ** (self.offset + np.arange(self.counts.shape[1])) / (self.gamma + 1.0)])
+
+        result = np.full((len(q_array), cumulative.shape[0]), np.nan)
+        for j, quantile in enumerate(q_array):
+            rank = np.floor(quantile * (total - 1))  # Lower-rank convention: q = 0 gives the minimum
+            column = (cumulative <= rank[:, None]).sum(axis=1)
+            has_values = total > 0
+            result[j, has_values] = bucket_values[column[has_values]]
+
+        result = result.reshape((len(q_array),) + self.shape)
+        return result[0] if np.ndim(q) == 0 else result
+
+    def state(self):
+        return {'zero_count': self.zero_count.reshape(self.shape), 'counts': self.counts}
+
+    def attrs(self):
+        return {'relative_accuracy': self.relative_accuracy, 'offset': self.offset}
+
+    @classmethod
+    def from_state(cls, state, attrs):
+        reducer = cls(np.shape(state['zero_count']), float(attrs['relative_accuracy']))
+        reducer.zero_count = np.asarray(state['zero_count'], dtype=np.int64).ravel()
+        reducer.counts = np.asarray(state['counts'], dtype=np.int64).reshape(reducer.zero_count.shape[0], -1)
+        reducer.offset = int(attrs['offset'])
+        return reducer
+
+
+REDUCERS = {'RunningEnvelope': RunningEnvelope, 'QuantileSketch': QuantileSketch}
+
+
+def save_reducer(h5f, name, reducer, description=''):
+    """
+    Writes (or overwrites) a reducer as the h5py group h5f[name].
+
+    A group written before is updated in place, so that saving a reducer after every scenario does not
+    grow the file (HDF5 does not reclaim the space of deleted datasets): the state datasets keep their
+    shapes, and the bucket axis of a sketch's counts is resizable (it only grows).
+    """
+    group = h5f[name] if name in h5f else None
+    state = {key: np.asarray(value) for key, value in reducer.state().items()}
+    if group is not None and (group.attrs.get('reducer') != type(reducer).__name__ or set(group) != set(state) or any(
+            not _fits(group[key], value) for key, value in state.items())):
+        del h5f[name]
+        group = None
+
+    if group is None:
+        group = h5f.create_group(name)
+        for key, value in state.items():
+            if key == 'counts':
+                group.create_dataset(key, data=value, maxshape=(value.shape[0], None),
+                                     chunks=(max(1, value.shape[0]), 64))
+            else:
+                group.create_dataset(key, data=value)
+    else:
+        for key, value in state.items():
+            if group[key].shape != value.shape:
+                group[key].resize(value.shape)
+            group[key][...] = value
+
+    group.attrs['reducer'] = type(reducer).__name__
+    group.attrs['description'] = description
+    group.attrs['shape'] = np.array(reducer.shape, dtype=np.int64)
+    for key, value in (reducer.attrs().items() if hasattr(reducer, 'attrs') else ()):
+        group.attrs[key] = value
+
+
+def _fits(ds, value):
+    """
+    True if the saved dataset `ds` can take `value` in place (same shape, or a wider resizable bucket axis).
+    """
+    if ds.dtype != value.dtype or ds.ndim != value.ndim:
+        return False
+    if ds.shape == value.shape:
+        return True
+    return all(size == new or (limit is None and new >= size)
+               for size, new, limit in zip(ds.shape, value.shape, ds.maxshape))
+
+
+def load_reducer(h5f, name):
+    """
+    Reads a reducer written by save_reducer() from h5f[name].
+    """
+    group = h5f[name]
+    cls = REDUCERS[str(group.attrs['reducer'])]
+    return cls.from_state({key: group[key][()] for key in group}, dict(group.attrs))
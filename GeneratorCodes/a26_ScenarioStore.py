@@ -0,0 +1,336 @@
+# a26_ScenarioStore.py
+
+import os
+import glob
+import numpy as np
+import h5py
+
+from a22_OutputEncoding import decode_array, calendar_values
+from a34_DailyLineage import DailyLineage, is_lineage
+
+"""
+Module: Scenario Store Reader
+
+One schema and one reader for the scenario outputs of a run (OutputData/Scenario{number}.h5), so
+downstream code does not open files by name or index long dataset names.
+
+    store = ScenarioStore('Scenarios')                 # Result folder (or its OutputData folder)
+    store.numbers                                      # Scenario file numbers, sorted
+    store.daily                                        # Lazy view [Scenario x Day x Location] (m3 per s)
+    store.daily[:, :, 3]                               # One station's daily series of every scenario
+    store.daily[10:20, 365:730, [0, 5]]                # Scenarios 11-20, second year, two stations
+    store.monthly[:, :, 6, :]                          # July of every year, scenario and location
+
+Scenario indices of the views are positions in store.numbers (store.position(number) converts a file
+number). Indexing is orthogonal, as in h5py: every axis is selected on its own by an integer, a slice or
+a list, so store.monthly[[0, 1], :, :, [2, 5]] has shape [2 x Year x Month x 2]. Views read with h5py partial reads, one file at a time, and decode only the selected columns;
+with the per-location chunks written by a10_, one station's series touches only that station's chunks.
+The calendar (synthetic year and month of each day) is shared by every scenario: store.calendar().
+Scenario files saved with daily_storage = 'lineage' or 'deferred' (a34_) have no daily dataset: the daily
+view rebuilds the selected locations of each scenario from its lineage, with the same values as a 'full' file.
+
+Schema (view name: dataset name [dimensions], units):
+    daily            DailyTimeSeries_Synthetic(m3 per s)[Day x Location]                 (calendar columns hidden)
+    monthly          Monthly_Synthetic(million m3 per month)[Year x Month x Location]
+    monthly_recorded Monthly_Recorded(million m3 per month)[Year x Month x Location]
+    forcing          Opt_Forcing_Scenario[Location x 24]
+    mean_deviation   Opt_Mean_Deviation[Location x Month]
+    sd_deviation     Opt_SD_Deviation[Location x Month]
+    distance         Sum_Distance_FromTarget[Location x 1]
+    solver_evaluations, solver_distance   Solver_{Evaluations, Distance}[Location x Month x Solver]
+
+Key Functions:
+    - ScenarioStore: Reader of the scenario files of a result folder
+    - ScenarioView: Lazy, sliceable view of one dataset across scenarios
+    - resolve_dataset(): Dataset of an open scenario file for a schema name
+"""
+
+SCHEMA = {
+    'daily': 'DailyTimeSeries_Synthetic(m3 per s)[Day x Location]',
+    'monthly': 'Monthly_Synthetic(million m3 per month)[Year x Month x Location]',
+    'monthly_recorded': 'Monthly_Recorded(million m3 per month)[Year x Month x Location]',
+    'forcing': 'Opt_Forcing_Scenario[Location x 24]',
+    'mean_deviation': 'Opt_Mean_Deviation[Location x Month]',
+    'sd_deviation': 'Opt_SD_Deviation[Location x Month]',
+    'distance': 'Sum_Distance_FromTarget[Location x 1]',
+    'solver_evaluations': 'Solver_Evaluations[Location x Month x Solver]',
+    'solver_distance': 'Solver_Distance[Location x Month x Solver]',
+}
+CALENDAR_COLUMNS = {'daily': 2}   # Leading year / month columns hidden from the view
+
+
+def resolve_dataset(h5f, key):
+    """
+    Dataset of an open scenario file for the schema name `key`.
+
+    Raises:
+        KeyError : if the file has no such dataset
+    """
+    name = SCHEMA[key]
+    if isinstance(h5f.get(name), h5py.Dataset):
+        return h5f[name]
+    raise KeyError(f"❌ Dataset '{name}' Not Found in {h5f.filename}.")
+
+
+def scenario_numbers(output_folder):
+    """
+    Sorted file numbers of the Scenario{number}.h5 files of an OutputData folder.
+    """
+    names = (os.path.basename(f)[8:-3] for f in glob.glob(os.path.join(output_folder, 'Scenario*.h5')))
+    return sorted(int(n) for n in names if n.isdigit())
+
+
+def _axis_selection(index, size):
+    """
+    Splits an index of one axis into an h5py selection and the numpy index applied after reading.
+
+    Integers and increasing slices are read as they are; lists / arrays are read as their sorted
+    unique values and reversed slices as their bounding slice, then reordered after reading.
+
+    Returns:
+        selection : int, slice or sorted list of positions (h5py selection)
+        reorder : numpy index of the read axis, or None
+    """
+    if isinstance(index, (int, np.integer)):
+        if not -size <= index < size:
+            raise IndexError(f"❌ Index {index} Is Out of Bounds for an Axis of Size {size}.")
+        return int(index) % size, None
+    if isinstance(index, slice):
+        start, stop, step = index.indices(size)
+        if step > 0:
+            return slice(start, max(start, stop), step), None
+        positions = np.arange(start, stop, step)
+        if len(positions) == 0:
+            return slice(0, 0), None
+        return slice(int(positions.min()), int(positions.max()) + 1), positions - positions.min()
+    positions = np.asarray(index)
+    if positions.dtype == bool:
+        positions = np.nonzero(positions)[0]
+    if np.any((positions < -size) | (positions >= size)):
+        raise IndexError(f"❌ Index {index} Is Out of Bounds for an Axis of Size {size}.")
+    unique, inverse = np.unique(positions.astype(np.int64) % size, return_inverse=True)
+    return [int(u) for u in unique], inverse
+
+
+def _stored_calendar_columns(dataset, key):
+    """
+    Calendar columns in front of the locations of a dataset (none if they are in a companion dataset, a22_).
+    """
+    return 0 if 'calendar_dataset' in dataset.attrs else CALENDAR_COLUMNS.get(key, 0)
+
+
+def _shift(selection, offset):
+    """
+    Selection moved by `offset` positions (to skip the calendar columns).
+    """
+    if isinstance(selection, int):
+        return selection + offset
+    if isinstance(selection, list):
+        return [s + offset for s in selection]
+    return slice(selection.start + offset, selection.stop + offset, selection.step)
+
+
+def _positions(selection):
+    """
+    Positions read by an h5py selection (int, or array for a slice / list).
+    """
+    if isinstance(selection, int):
+        return selection
+    if isinstance(selection, list):
+        return np.asarray(selection, dtype=np.int64)
+    return np.arange(selection.start, selection.stop, selection.step or 1)
+
+
+class ScenarioView:
+    """
+    Lazy view of one schema dataset across the scenarios of a store: shape [Scenario x dataset shape].
+    Indexing reads only the selected part of each selected scenario file.
+    """
+
+    def __init__(self, store, key):
+        self.store = store
+        self.key = key
+        with h5py.File(store.path(store.numbers[0]), 'r') as h5f:
+            if key == 'daily' and is_lineage(h5f):
+                shape = store.daily_lineage().shape(h5f)
+                hidden = CALENDAR_COLUMNS.get(key, 0)
+            else:
+                ds = resolve_dataset(h5f, key)
+                shape = ds.shape
+                hidden = _stored_calendar_columns(ds, key)
+        self.dataset_shape = shape[:-1] + (shape[-1] - hidden,)
+
+    @property
+    def shape(self):
+        return (len(self.store.numbers),) + self.dataset_shape
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return f"ScenarioView('{self.key}', shape={self.shape})"
+
+    def __array__(self, dtype=None):
+        values = self[...]
+        return values if dtype is None else values.astype(dtype)
+
+    def _normalize(self, index):
+        index = index if isinstance(index, tuple) else (index,)
+        if any(i is Ellipsis for i in index):
+            at = next(k for k, i in enumerate(index) if i is Ellipsis)
+            index = index[:at] + (slice(None),) * (self.ndim - len(index) + 1) + index[at + 1:]
+        if len(index) > self.ndim:
+            raise IndexError(f"❌ Too Many Indices for a View of Shape {self.shape}.")
+        return index + (slice(None),) * (self.ndim - len(index))
+
+    def __getitem__(self, index):
+        index = self._normalize(index)
+        numbers = np.asarray(self.store.numbers)
+        sce_positions = np.atleast_1d(np.arange(len(numbers))[index[0]])
+
+        # h5py selection of the dataset axes: h5py accepts one list per read, further list axes
+        # are read as their bounding slice
+        selections, reorders = [], []
+        for i, size in zip(index[1:], self.dataset_shape):
+            selection, reorder = _axis_selection(i, size)
+            if isinstance(selection, list) and any(isinstance(s, list) for s in selections):
+                reorder = np.asarray(selection)[reorder] - selection[0]
+                selection = slice(selection[0], selection[-1] + 1)
+            selections.append(selection)
+            reorders.append(reorder)
+        location_selection = selections[-1]
+
+        values = []
+        for number in numbers[sce_positions]:
+            with h5py.File(self.store.path(number), 'r') as h5f:
+                if self.key == 'daily' and is_lineage(h5f):
+                    values.append(self._reorder(self._rebuild(h5f, selections[0], location_selection),
+                                                selections, reorders))
+                    continue
+                ds = resolve_dataset(h5f, self.key)
+                column_selection = _shift(location_selection, _stored_calendar_columns(ds, self.key))
+                stored = ds[tuple(selections[:-1]) + (column_selection,)]
+                attrs = dict(ds.attrs)
+            if attrs.get('encoding') == 'scaled_uint16':
+                columns = _positions(column_selection)  # Per-column scale / offset of the read columns
+                attrs = dict(attrs, scale_factor=attrs['scale_factor'][columns], add_offset=attrs['add_offset'][columns])
+            values.append(self._reorder(decode_array(stored, attrs), selections, reorders))
+
+        if isinstance(index[0], (int, np.integer)):
+            return values[0]
+        return np.stack(values) if values else np.empty((0,) + self.dataset_shape)
+
+    def _rebuild(self, h5f, day_selection, location_selection):
+        """
+        Selected days and locations of the daily series of a lineage scenario file (a34_), shaped as an h5py read.
+        """
+        locations = np.atleast_1d(_positions(location_selection))
+        daily = self.store.daily_lineage().daily(h5f, locations)[:, 2:]
+        daily = daily[_positions(day_selection)]
+        return daily[..., 0] if isinstance(location_selection, int) else daily
+
+    @staticmethod
+    def _reorder(values, selections, reorders):
+        """
+        Applies the numpy reordering of list / reversed-slice axes after the h5py read.
+        """
+        axis = 0
+        for selection, reorder in zip(selections, reorders):
+            if isinstance(selection, int):
+                continue
+            if reorder is not None:
+                values = np.take(values, reorder, axis=axis)
+            axis += 1
+        return values
+
+
+class ScenarioStore:
+    """
+    Reader of the scenario outputs of a result folder (see the module description).
+
+    Parameters:
+        folder : result folder (with OutputData/) or the OutputData folder itself
+        numbers : scenario file numbers to include (default: every Scenario{number}.h5 found)
+    """
+
+    def __init__(self, folder, numbers=None):
+        output_folder = os.path.join(folder, 'OutputData')
+        self.output_folder = output_folder if os.path.isdir(output_folder) else folder
+        self.numbers = scenario_numbers(self.output_folder) if numbers is None else sorted(int(n) for n in numbers)
+        if not self.numbers:
+            raise FileNotFoundError(f"❌ No Scenario .h5 Files Found in {self.output_folder}.")
+        self._views = {}
+        self._lineage = None
+
+    def path(self, number):
+        return os.path.join(self.output_folder, f'Scenario{number}.h5')
+
+    def position(self, number):
+        """
+        Position of scenario file `number` along the scenario axis of the views.
+        """
+        return self.numbers.index(int(number))
+
+    def select(self, numbers):
+        """
+        Store restricted to the given scenario file numbers.
+        """
+        return ScenarioStore(self.output_folder, numbers)
+
+    def daily_lineage(self):
+        """
+        DailyLineage (a34_) of the run, for scenario files saved with daily_storage = 'lineage' or 'deferred'.
+        """
+        if self._lineage is None:
+            self._lineage = DailyLineage(self.output_folder)
+        return self._lineage
+
+    def view(self, key):
+        """
+        Lazy view of the schema dataset `key` (see SCHEMA) across the scenarios.
+        """
+        if key not in SCHEMA:
+            raise KeyError(f"❌ Unknown Scenario Dataset '{key}'. Use one of {tuple(SCHEMA)}.")
+        if key not in self._views:
+            self._views[key] = ScenarioView(self, key)
+        return self._views[key]
+
+    def __getattr__(self, key):
+        if key in SCHEMA:
+            return self.view(key)
+        raise AttributeError(key)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def __repr__(self):
+        return f"ScenarioStore({self.output_folder}, {len(self.numbers)} scenarios)"
+
+    def calendar(self):
+        """
+        Synthetic year and month of each day [Day x 2] (shared by every scenario).
+        """
+        with h5py.File(self.path(self.numbers[0]), 'r') as h5f:
+            if is_lineage(h5f):
+                return self.daily_lineage().layout(h5f)['calendar'].astype(np.int64)
+            ds = resolve_dataset(h5f, 'daily')
+            attrs = dict(ds.attrs)
+            if 'calendar_dataset' in attrs:  # Small-integer calendar of a 'float32' file (a22_)
+                return calendar_values(h5f[attrs['calendar_dataset']][()]).astype(np.int64)
+            if attrs.get('encoding') == 'scaled_uint16':
+                attrs = dict(attrs, scale_factor=attrs['scale_factor'][:2], add_offset=attrs['add_offset'][:2])
+            return decode_array(ds[:, :2], attrs).astype(np.int64)
+
+    def target_deviation(self):
+        """
+        Target mean / SD deviation (%) of each scenario [Scenario x 2].
+        """
+        values = []
+        for number in self.numbers:
+            with h5py.File(self.path(number), 'r') as h5f:
+                values.append(np.asarray(h5f.attrs['target_deviation'], dtype=np.float64))
+        return np.array(values)
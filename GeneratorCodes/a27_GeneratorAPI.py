@@ -0,0 +1,170 @@
+# a27_GeneratorAPI.py
+
+import os
+import numpy as np
+
+from a2_MatrixYear import matrix_year, matrix_year_ensemble
+from a3_BoundaryCoordinateGenerator import boundary_coordinate_generator
+from a7_RemoveInfeasibleScenarios import remove_infeasible_scenarios
+from a9_ModifyInfeasibleScenarios import adjust_scenario_to_feasible
+from a10_InverseApproach_and_MonthlytoDaily import generate_scenario, save_scenario, prepare_local_stations
+from a18_ResponseLookupTable import build_response_lookup
+from a19_RunManifest import save_boundary_fingerprint
+from a21_RandomStreams import resolve_random_seed, spawn_stream
+from a23_RecordedData import RecordedData
+from a32_OptimizationBudget import RunBudget
+from a34_DailyLineage import save_daily_lineage
+from a38_BasinSetup import (MEAN_SCENARIO_RANGE, SD_SCENARIO_RANGE, clean_recorded_array, optimization_bounds,
+                            boundary_inputs_fingerprint, saved_boundaries_match)
+
+"""
+Module: In-Process Generator API
+
+Runs the pipeline of a1_ (boundaries, feasibility, optimization, disaggregation) on arrays and yields
+the scenarios one at a time, so a simulator can consume synthetic inflows as they are produced,
+without Excel inputs or a file round-trip. Writing the usual outputs is optional.
+
+    from a27_GeneratorAPI import generate_scenarios
+    for result in generate_scenarios(Data, isLocal, targets, mean_seasonality, sd_seasonality, random_seed=7):
+        simulate(result.daily[:, 2:])      # [Day x Location] m3/s; result.daily[:, :2] = synthetic year, month
+
+Each yielded ScenarioResult (a10_) holds number, target_deviation, forcing, distance, mean_change,
+sd_change, monthly_synthetic, monthly_recorded (million m3 per month), daily, solver_log and budget_limited.
+Scenarios that are fully infeasible are dropped (as in a1_); the others keep their order.
+
+Key Functions:
+    - generate_scenarios(): Generator of ScenarioResult records
+"""
+
+
+def generate_scenarios(
+    recorded_data, isLocal, desired_scenarios, meanseasonality_change, SDseasonality_change,
+    numberofyears_syntheticdata=38, startyear_synthetic=1980,
+    randomyear=None, range_flag=1, random_seed=None,
+    mean_scenario_range=tuple(MEAN_SCENARIO_RANGE), SD_scenario_range=tuple(SD_SCENARIO_RANGE),
+    distance_threshold=0.01, solver_mode='global', lookup_table=0, lookup_refinement=1,
+    enable_parallel=True, boundaryfolderpass=None,
+    outputfolder=None, daily=0, monthly=0, h5=0, output_precision='float64', horizon_chunk_years=0,
+    forcing_cache=None, scenario_time_budget=0, run_time_budget=0, scenario_evaluation_budget=0, run_evaluation_budget=0,
+    daily_storage='full'
+):
+    """
+    Generates synthetic scenarios in this process and yields them one at a time.
+
+    Parameters:
+        recorded_data : RecordedData (a23_), or the Sheet1 array of RecordedData.xlsx [Day x (3 + Location)]
+                        without its header row (flows <= 0 are set to 0.001, as in a1_)
+        isLocal : [Location] or [1 x Location] flags (1 = local, 0 = non-local)
+        desired_scenarios : [Scenario x 2] target mean / SD deviations (%)
+        meanseasonality_change, SDseasonality_change : [Location x Month] seasonality changes (%)
+        numberofyears_syntheticdata : number of synthetic years (one is added for concatenating Z and Z', as in a1_)
+        startyear_synthetic : start year of the synthetic daily data (leap-year alignment)
+        randomyear : [Year x Month] random year matrix; None = drawn from the random streams
+        range_flag : 1 = one random year matrix for all scenarios; 0 = one matrix per scenario
+        random_seed : root seed (a21_); None = new seed
+        mean_scenario_range, SD_scenario_range : forcing bounds (%) of the optimization and boundaries
+        distance_threshold, solver_mode, lookup_table, lookup_refinement, enable_parallel : as in a1_
+        boundaryfolderpass : folder with saved boundaries (loaded if they were saved for these inputs, else
+                             generated and saved there); None = generate them in memory
+        outputfolder : result folder for the optional outputs (daily / monthly CSV, h5 = Scenario{number}.h5)
+        daily, monthly, h5, output_precision : output flags and h5 precision (as in a1_); all 0 = no files
+        horizon_chunk_years : > 0 = result.daily is a DailyBlocks object (a29_): iterate it for the daily series in
+                              blocks of this many synthetic years instead of holding the whole series
+        forcing_cache : (Optional) ForcingCache (a31_) of solved month problems, shared with other runs
+        scenario_time_budget, run_time_budget, scenario_evaluation_budget, run_evaluation_budget :
+                        optimization budgets (a32_, as in a1_); the run clock starts with the first scenario.
+                        result.budget_limited flags the month problems they stopped
+        daily_storage : 'lineage' = the .h5 files store the lineage of the daily series (a34_, as in a1_), and
+                        result.daily is a DailyBlocks object as for horizon_chunk_years > 0; 'deferred' = no daily
+                        series (needs h5 = 1 and daily = 0): result.daily is a DeferredDaily object (a34_) and the
+                        daily series are produced later from the .h5 files (a37_)
+
+    Yields:
+        result : ScenarioResult record of each scenario (a10_), in the order of desired_scenarios
+    """
+    isLocal = np.asarray(isLocal, dtype=np.float64).reshape(1, -1)
+    if isinstance(recorded_data, RecordedData):
+        Data = recorded_data
+    else:
+        Data = RecordedData.from_array(clean_recorded_array(recorded_data), isLocal)
+    if (daily == 1 or monthly == 1 or h5 == 1) and outputfolder is None:
+        raise ValueError("❌ outputfolder Is Needed to Save daily, monthly or h5 Outputs.")
+    if daily_storage == 'deferred' and (h5 == 0 or daily == 1):
+        raise ValueError("❌ daily_storage = 'deferred' Needs h5 = 1 and daily = 0 (Daily CSV Files Are Written by a37_).")
+
+    numberofyears_syntheticdata = numberofyears_syntheticdata + 1  # One extra for appending Z and Z'
+    numberoflocations = Data.numberoflocations
+    numberofyears_recorded = Data.numberofyears_recorded
+    meanseasonality_change = np.asarray(meanseasonality_change, dtype=np.float64)
+    SDseasonality_change = np.asarray(SDseasonality_change, dtype=np.float64)
+    root_seed = resolve_random_seed(random_seed, outputfolder or '', 0)
+
+    desired_scenarios1 = np.asarray(desired_scenarios, dtype=np.float64).reshape(-1, 2)
+    desired_scenarios_monthly = np.repeat(desired_scenarios1, 12, axis=1)
+    range_lb, range_ub = optimization_bounds(mean_scenario_range, SD_scenario_range)
+
+    if randomyear is None:
+        randomyear = matrix_year(Data, numberofyears_syntheticdata, save=False, rng=spawn_stream(root_seed, 'randomyear'))
+
+    # === Boundaries, feasibility and feasible targets (Steps 2 to 4 of a1_) ===
+    boundaries_saved = False
+    if boundaryfolderpass is not None:
+        boundary_fingerprint = boundary_inputs_fingerprint(
+            Data, isLocal, randomyear, mean_scenario_range, SD_scenario_range, numberofyears_syntheticdata
+        )
+        boundaries_saved = saved_boundaries_match(boundaryfolderpass, boundary_fingerprint)
+        if not boundaries_saved:
+            save_boundary_fingerprint(boundaryfolderpass, None)  # Boundary files are rewritten below
+    x_boundary, y_boundary, desired_scenarios_monthly_1 = boundary_coordinate_generator(
+        Data, isLocal, numberofyears_syntheticdata, numberofyears_recorded,
+        numberoflocations, randomyear, mean_scenario_range, SD_scenario_range,
+        boundaryfolderpass, 1 if boundaries_saved else 0
+    )
+    if boundaryfolderpass is not None and not boundaries_saved:
+        save_boundary_fingerprint(boundaryfolderpass, boundary_fingerprint)
+    desired_scenarios_monthly, desired_scenarios1 = remove_infeasible_scenarios(
+        None, desired_scenarios_monthly_1, mean_scenario_range, x_boundary, y_boundary,
+        desired_scenarios_monthly, desired_scenarios1,
+        isLocal, meanseasonality_change, SDseasonality_change, None
+    )
+    adjusted_scenarios = adjust_scenario_to_feasible(
+        desired_scenarios_monthly, meanseasonality_change, SDseasonality_change,
+        mean_scenario_range, x_boundary, y_boundary,
+        numberoflocations, isLocal, desired_scenarios_monthly_1
+    )
+
+    n_scenarios = desired_scenarios1.shape[0]
+    randomyear_ensemble = None
+    if range_flag == 0:
+        randomyear_ensemble = matrix_year_ensemble(Data, numberofyears_syntheticdata, n_scenarios, None, root_seed)
+    response_table = None
+    if lookup_table == 1 and range_flag == 1:
+        response_table = build_response_lookup(
+            Data, isLocal, numberofyears_syntheticdata, numberoflocations,
+            randomyear, range_lb, range_ub, show_progress=False
+        )
+
+    # === Optimize and disaggregate each scenario (Step 5 of a1_), yielding it when it is ready ===
+    budget = RunBudget(scenario_time_budget, run_time_budget, scenario_evaluation_budget, run_evaluation_budget, n_scenarios)
+    local_stations = prepare_local_stations(Data, isLocal, numberofyears_syntheticdata, numberofyears_recorded)
+    if h5 == 1 and daily_storage in ('lineage', 'deferred'):
+        save_daily_lineage(os.path.join(outputfolder, 'OutputData'), Data, startyear_synthetic)
+    for sce in range(n_scenarios):
+        result = generate_scenario(
+            sce, sce + 1,
+            Data, randomyear, desired_scenarios_monthly, adjusted_scenarios, desired_scenarios1,
+            isLocal.flatten(), meanseasonality_change, SDseasonality_change,
+            range_lb=range_lb, range_ub=range_ub, range_flag=range_flag,
+            numberofyears_syntheticdata=numberofyears_syntheticdata, numberofyears_recorded=numberofyears_recorded,
+            numberoflocations=numberoflocations, firstyear=Data.firstyear, startyear_synthetic=startyear_synthetic,
+            distance_threshold=distance_threshold, enable_parallel=enable_parallel,
+            daily=daily, monthly=monthly, h5=h5,
+            lookup_table=lookup_table, lookup_refinement=lookup_refinement, response_table=response_table,
+            solver_mode=solver_mode, randomyear_ensemble=randomyear_ensemble, random_seed=root_seed,
+            output_precision=output_precision, horizon_chunk_years=horizon_chunk_years, forcing_cache=forcing_cache,
+            budget=budget, local_stations=local_stations, daily_storage=daily_storage
+        )
+        if daily == 1 or monthly == 1 or h5 == 1:
+            save_scenario(result, outputfolder, daily, monthly, h5, output_precision,
+                          meanseasonality_change, SDseasonality_change, daily_storage)
+        yield result
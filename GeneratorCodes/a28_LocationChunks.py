@@ -0,0 +1,113 @@
+# a28_LocationChunks.py
+
+import numpy as np
+
+from a3_BoundaryCoordinateGenerator import boundary_coordinate_generator
+from a7_RemoveInfeasibleScenarios import feasible_scenarios, drop_infeasible_scenarios
+from a8_BuildFeasibleAreaPolygon_and_CheckFeasibility import build_all_polygons
+from a9_ModifyInfeasibleScenarios import adjust_scenario_to_feasible
+
+"""
+Module: Location-Chunked Boundaries and Feasibility
+
+With location_chunk_size > 0, Steps 2 to 4 of a1_ process the stations in chunks of
+location_chunk_size, so only one chunk of boundaries [Boundary Scenario x Month x Chunk] and its
+(location, month) polygons are in memory at a time, instead of those of every station:
+
+    Pass 1 (Steps 2-3): for each chunk, generate (or load) its boundaries, written into the same
+                        location-chunked Boundary_Coordinates.h5 datasets as an unchunked run, and flag
+                        the scenarios feasible at one of its non-local stations. A scenario is removed
+                        when no chunk flags it (same result as remove_infeasible_scenarios).
+    Pass 2 (Step 4):    for each chunk, load its boundaries and adjust its non-local stations of the
+                        feasible scenarios into one shared adjusted_scenarios array.
+
+The saved boundaries are identical to those of an unchunked run, so both modes can reuse them.
+
+Key Functions:
+    - location_chunks(): Ranges of location indices of each chunk
+    - chunked_remove_infeasible_scenarios(): Pass 1
+    - chunked_adjust_scenario_to_feasible(): Pass 2
+"""
+
+
+def location_chunks(numberoflocations, location_chunk_size):
+    """
+    Ranges of location indices of each chunk (one range of every location for location_chunk_size <= 0).
+    """
+    size = numberoflocations if location_chunk_size <= 0 else location_chunk_size
+    return [range(start, min(start + size, numberoflocations)) for start in range(0, numberoflocations, size)]
+
+
+def chunked_remove_infeasible_scenarios(
+    Data, isLocal, numberofyears_syntheticdata, numberofyears_recorded, numberoflocations, randomyear,
+    mean_scenario_range, SD_scenario_range, boundaryfolderpass, BoundaryCoordinate_AlreadyGenerated,
+    scenariofolderpass, desired_scenarios_monthly, desired_scenarios1,
+    meanseasonality_change, SDseasonality_change, resultfolder, location_chunk_size, feasible=None
+):
+    """
+    Generates (or loads) the boundaries chunk by chunk of stations and removes the fully infeasible scenarios.
+
+    Parameters are those of boundary_coordinate_generator (a3_) and remove_infeasible_scenarios (a7_), plus:
+        location_chunk_size : number of stations per chunk
+        feasible : (Optional) feasibility flags of the targets already known (stage cache, a30_); the chunks
+                   then only generate the boundaries (if BoundaryCoordinate_AlreadyGenerated = 0)
+
+    Returns:
+        desired_scenarios_monthly_1 : boundary scenarios [Boundary Scenario x 24]
+        desired_scenarios_monthly, desired_scenarios1 : scenario arrays with the infeasible ones removed
+        feasible : feasibility flag of each target before the removal
+    """
+    scan = feasible is None
+    if scan:
+        feasible = np.zeros(len(desired_scenarios1), dtype=bool)
+
+    for locations in location_chunks(numberoflocations, location_chunk_size):
+        x_boundary, y_boundary, desired_scenarios_monthly_1 = boundary_coordinate_generator(
+            Data, isLocal, numberofyears_syntheticdata, numberofyears_recorded,
+            numberoflocations, randomyear, mean_scenario_range, SD_scenario_range,
+            boundaryfolderpass, BoundaryCoordinate_AlreadyGenerated, locations
+        )
+        if not scan and BoundaryCoordinate_AlreadyGenerated == 1:
+            break  # Nothing to generate or check: the boundary scenarios of the first chunk are enough
+        if scan:
+            polygon_cache = build_all_polygons(mean_scenario_range, x_boundary, y_boundary,
+                                               desired_scenarios_monthly_1, locations)
+            feasible |= feasible_scenarios(desired_scenarios_monthly, polygon_cache, isLocal,
+                                           meanseasonality_change, SDseasonality_change, locations)
+
+    desired_scenarios_monthly, desired_scenarios1 = drop_infeasible_scenarios(
+        feasible, scenariofolderpass, desired_scenarios_monthly, desired_scenarios1,
+        meanseasonality_change, SDseasonality_change, resultfolder
+    )
+    return desired_scenarios_monthly_1, desired_scenarios_monthly, desired_scenarios1, feasible
+
+
+def chunked_adjust_scenario_to_feasible(
+    Data, isLocal, numberofyears_syntheticdata, numberofyears_recorded, numberoflocations, randomyear,
+    mean_scenario_range, SD_scenario_range, boundaryfolderpass,
+    desired_scenarios_monthly, meanseasonality_change, SDseasonality_change, location_chunk_size
+):
+    """
+    Adjusts the partially infeasible scenarios chunk by chunk of stations, loading each chunk's saved boundaries.
+
+    Parameters are those of boundary_coordinate_generator (a3_) and adjust_scenario_to_feasible (a9_), plus:
+        location_chunk_size : number of stations per chunk
+
+    Returns:
+        adjusted_scenarios : adjusted feasible scenarios [Scenario x 24 x Location]
+    """
+    adjusted_scenarios = np.zeros((desired_scenarios_monthly.shape[0], 24, numberoflocations))
+
+    for locations in location_chunks(numberoflocations, location_chunk_size):
+        x_boundary, y_boundary, desired_scenarios_monthly_1 = boundary_coordinate_generator(
+            Data, isLocal, numberofyears_syntheticdata, numberofyears_recorded,
+            numberoflocations, randomyear, mean_scenario_range, SD_scenario_range,
+            boundaryfolderpass, 1, locations
+        )
+        adjust_scenario_to_feasible(
+            desired_scenarios_monthly, meanseasonality_change, SDseasonality_change,
+            mean_scenario_range, x_boundary, y_boundary,
+            numberoflocations, isLocal, desired_scenarios_monthly_1, locations, adjusted_scenarios
+        )
+
+    return adjusted_scenarios
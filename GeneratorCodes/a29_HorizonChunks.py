@@ -0,0 +1,147 @@
+# a29_HorizonChunks.py
+
+import numpy as np
+import pandas as pd
+
+from a15_SyntheticMonthlytoDailyNonLocals import synthetic_monthly_to_daily_nonlocals
+from a16_SyntheticMonthlytoDailyLocals import synthetic_monthly_to_daily_locals
+from a22_OutputEncoding import column_range, create_appendable_dataset, append_encoded_rows
+
+"""
+Module: Horizon-Chunked Daily Disaggregation
+
+For long synthetic horizons (e.g. 10,000 years for drought return periods) the daily series of a
+scenario [Day x (2 + Location)] does not fit comfortably in memory. With horizon_chunk_years > 0,
+a10_ keeps only the monthly flows and the KNN-selected recorded years of the scenario and returns a
+DailyBlocks object instead of the daily array: iterating it disaggregates blocks of
+horizon_chunk_years synthetic years on demand, and the outputs are appended block by block to the
+daily CSV file and to a growable .h5 dataset.
+
+Blocks are whole synthetic years, so the February (leap-year) adjustment and the synthetic year
+numbering continue across blocks, and the series is identical to the one disaggregated at once.
+The monthly series itself (Year x Month per location, with the Z / Z' year stitching of a4_) is
+generated whole by the optimization, since its mean / SD are the optimization targets; it is small
+compared to the daily series.
+
+Key Functions:
+    - DailyBlocks: Daily series of a scenario, disaggregated block by block
+    - write_daily_dataset(): Appends the blocks to an encoded .h5 dataset
+    - write_daily_csv(): Appends the blocks to a CSV file
+"""
+
+
+class DailyBlocks:
+    """
+    Synthetic daily series of one scenario, disaggregated on demand in blocks of synthetic years.
+
+    Parameters:
+        Data : RecordedData (a23_)
+        Monthly_Synthetic : synthetic monthly flow [Year x Month x Location] (m3 per s)
+        Monthly_Recorded : recorded monthly flow [Year x Month x Location] (m3 per s)
+        selected_years : recorded year matched to each synthetic year (KNN, a15_)
+        isLocal : 1D array of local (1) / non-local (0) flags
+        firstyear : first year in the recorded data
+        startyear_synthetic : start year of the synthetic daily data (leap-year alignment)
+        horizon_chunk_years : synthetic years per block (0 = one block)
+        location_chunk_size : stations per disaggregation chunk (a17_)
+        local_proportions : (Optional) disaggregation proportions of the local stations built once per run (a16_)
+
+    Iterating yields the blocks [Day x (2 + Location)]: synthetic year, month and daily flow of each location.
+    """
+
+    def __init__(self, Data, Monthly_Synthetic, Monthly_Recorded, selected_years, isLocal,
+                 firstyear, startyear_synthetic, horizon_chunk_years=0, location_chunk_size=0, local_proportions=None):
+        self.Data = Data
+        self.Monthly_Synthetic = Monthly_Synthetic
+        self.Monthly_Recorded = Monthly_Recorded
+        self.selected_years = selected_years
+        self.local_indices = np.where(isLocal == 1)[0].tolist()
+        self.nonlocal_indices = np.where(isLocal == 0)[0].tolist()
+        self.firstyear = firstyear
+        self.startyear_synthetic = startyear_synthetic
+        self.n_years = Monthly_Synthetic.shape[0]
+        self.block_years = self.n_years if horizon_chunk_years <= 0 else horizon_chunk_years
+        self.location_chunk_size = location_chunk_size
+        self.local_proportions = local_proportions
+
+    @property
+    def n_columns(self):
+        return 2 + self.Monthly_Synthetic.shape[2]
+
+    def __iter__(self):
+        for start in range(0, self.n_years, self.block_years):
+            yield self.block(start, min(start + self.block_years, self.n_years))
+
+    def block(self, start, stop):
+        """
+        Daily series of synthetic years start + 1 to stop [Day x (2 + Location)].
+        """
+        years = self.selected_years[start:stop]
+        startyear = self.startyear_synthetic + start  # Leap years of the block's calendar years
+
+        if len(self.nonlocal_indices) > 0:
+            section_nonlocal, _ = synthetic_monthly_to_daily_nonlocals(
+                self.Data, self.Monthly_Synthetic[start:stop][:, :, self.nonlocal_indices],
+                self.Monthly_Recorded[:, :, self.nonlocal_indices],
+                self.firstyear, startyear, None, self.nonlocal_indices,
+                location_chunk_size=self.location_chunk_size, selected_years=years
+            )
+        else:
+            section_nonlocal = np.empty((0, 0))
+
+        if len(self.local_indices) > 0:
+            section_local = synthetic_monthly_to_daily_locals(
+                self.Data, self.Monthly_Synthetic[start:stop][:, :, self.local_indices],
+                self.Monthly_Recorded[:, :, self.local_indices],
+                years.reshape(-1, 1), self.firstyear, startyear,
+                self.local_indices, self.location_chunk_size, self.local_proportions
+            )
+        else:
+            section_local = np.empty((0, 0))
+
+        if section_nonlocal.shape[0] == 0 and section_local.shape[0] == 0:
+            raise ValueError("❌ No output generated: both local and non-local sections are empty.")
+
+        # === Place the station columns of both sections into one preallocated daily array ===
+        base = section_nonlocal if section_nonlocal.shape[0] > 0 else section_local
+        daily = np.empty((base.shape[0], self.n_columns))
+        daily[:, :2] = base[:, :2]
+        daily[:, 0] += start  # Synthetic year numbers continue across blocks
+        if section_nonlocal.shape[1] > 2:
+            daily[:, [2 + k for k in self.nonlocal_indices]] = section_nonlocal[:, 2:]
+        if section_local.shape[1] > 2:
+            daily[:, [2 + k for k in self.local_indices]] = section_local[:, 2:]
+        return daily
+
+
+def write_daily_dataset(h5f, name, daily_blocks, output_precision):
+    """
+    Writes the daily series block by block into a growable encoded dataset (a22_).
+    With output_precision = 'scaled', a first pass over the blocks finds the range of each column.
+
+    Returns:
+        dataset : h5py dataset
+    """
+    column_min = column_max = None
+    if output_precision == 'scaled':
+        for block in daily_blocks:
+            block_min, block_max = column_range(block)
+            column_min = block_min if column_min is None else np.fmin(column_min, block_min)
+            column_max = block_max if column_max is None else np.fmax(column_max, block_max)
+
+    dataset = None
+    for block in daily_blocks:
+        if dataset is None:
+            dataset = create_appendable_dataset(h5f, name, daily_blocks.n_columns, output_precision, calendar_columns=2,
+                                                column_min=column_min, column_max=column_max,
+                                                chunk_rows=min(block.shape[0], 65536))
+        append_encoded_rows(dataset, block)
+    return dataset
+
+
+def write_daily_csv(path, daily_blocks):
+    """
+    Writes the daily series block by block into one CSV file (same format as a whole-series CSV).
+    """
+    for i, block in enumerate(daily_blocks):
+        pd.DataFrame(block).to_csv(path, index=False, header=False, mode='w' if i == 0 else 'a')
@@ -1,8 +1,15 @@
 # a2_MatrixYear.py
+import os
 import numpy as np
 import pandas as pd
+import h5py
 
-def matrix_year(Data, numberofyears_syntheticdata):
+from a21_RandomStreams import spawn_stream
+from a23_RecordedData import as_recorded_data
+
+ENSEMBLE_DATASET = 'RandomYearEnsemble[Scenario x Year x Month]'
+
+def matrix_year(Data, numberofyears_syntheticdata, save=True, rng=None):
     """
      Generate Random Year Matrix for Synthetic Scenarios
      This function generates a fixed matrix of randomly selected years from
@@ -12,21 +19,93 @@ def matrix_year(Data, numberofyears_syntheticdata):
     Input:
           Data - Full daily recorded streamflow dataset (with year info)
           numberofyears_syntheticdata - Number of synthetic years to generate (original numberofyears_syntheticdata + 1)
-    
+          save - If True, also write the matrix to 'RandomYearMatrix.xlsx'
+          rng - (Optional) numpy Generator to draw from (a21_ stream); default is the global numpy random state
+
     Output:
           randomyear - A (numberofyears_syntheticdata x 12) matrix
           Each entry is a randomly chosen year from historical range
     """
 
     # Extract time span from input data
-    firstyear = int(Data[0, 1])
-    lastyear = int(Data[-1, 1])
+    Data = as_recorded_data(Data)
+    firstyear, lastyear = Data.firstyear, Data.lastyear
     
     # Generate random year matrix for 12 months over desired synthetic years
-    randomyear = np.random.randint(firstyear, lastyear + 1,
-                                   size=(numberofyears_syntheticdata, 12))
+    if rng is not None:
+        randomyear = rng.integers(firstyear, lastyear + 1, size=(numberofyears_syntheticdata, 12))
+    else:
+        randomyear = np.random.randint(firstyear, lastyear + 1,
+                                       size=(numberofyears_syntheticdata, 12))
 
     # Save randomyear to Excel
-    pd.DataFrame(randomyear).to_excel('RandomYearMatrix.xlsx', header=False, index=False)
+    if save:
+        pd.DataFrame(randomyear).to_excel('RandomYearMatrix.xlsx', header=False, index=False)
+
+    return randomyear
+
+
+def matrix_year_ensemble(Data, numberofyears_syntheticdata, numberofscenarios, previous=None, root_seed=None):
+    """
+     Generate the Random Year Matrices of All Realizations at Once
+     Used with range_flag = 0: every scenario (realization of the single target deviation)
+     gets its own random year matrix. All matrices are drawn in one call and kept in memory
+     instead of drawing (and saving to Excel) a new matrix for each scenario.
+
+    Input:
+          Data - Full daily recorded streamflow dataset (with year info)
+          numberofyears_syntheticdata - Number of synthetic years to generate (original numberofyears_syntheticdata + 1)
+          numberofscenarios - Number of realizations
+          previous - (Optional) Ensemble of an earlier run; its matrices are kept and only the missing ones are drawn
+          root_seed - (Optional) Root seed of the run (a21_); matrix i + 1 is drawn from the 'randomyear' stream of
+                      scenario number i + 1, so it does not depend on the ensemble size or on the draws before it
+
+    Output:
+          randomyear_ensemble - A (numberofscenarios x numberofyears_syntheticdata x 12) array
+          randomyear_ensemble[i] is the random year matrix of scenario number i + 1
+    """
+
+    Data = as_recorded_data(Data)
+    firstyear, lastyear = Data.firstyear, Data.lastyear
+
+    if previous is None or previous.shape[1:] != (numberofyears_syntheticdata, 12):
+        previous = np.empty((0, numberofyears_syntheticdata, 12), dtype=int)
+    previous = previous[:numberofscenarios].astype(int)
+
+    if root_seed is not None:  # One stream per scenario number
+        new = np.array([
+            spawn_stream(root_seed, 'randomyear', number).integers(firstyear, lastyear + 1, size=(numberofyears_syntheticdata, 12))
+            for number in range(previous.shape[0] + 1, numberofscenarios + 1)
+        ], dtype=int).reshape(-1, numberofyears_syntheticdata, 12)
+    else:
+        new = np.random.randint(firstyear, lastyear + 1,
+                                size=(numberofscenarios - previous.shape[0], numberofyears_syntheticdata, 12))
+
+    return np.concatenate([previous, new], axis=0)
+
 
-    return randomyear
\ No newline at end of file
+def load_matrix_year_ensemble(h5_path):
+    """
+     Load the random year ensemble saved in a run's Inputs.h5 (None if there is none)
+    """
+    if not os.path.exists(h5_path):
+        return None
+    try:
+        with h5py.File(h5_path, 'r') as h5f:
+            if ENSEMBLE_DATASET not in h5f:
+                return None
+            return h5f[ENSEMBLE_DATASET][()].astype(int)
+    except OSError:
+        return None
+
+
+def save_matrix_year_ensemble(h5_path, randomyear_ensemble):
+    """
+     Save the random year ensemble into a run's Inputs.h5 (replacing an earlier one)
+    """
+    with h5py.File(h5_path, 'a') as h5f:
+        if ENSEMBLE_DATASET in h5f:
+            del h5f[ENSEMBLE_DATASET]
+        dset = h5f.create_dataset(ENSEMBLE_DATASET, data=randomyear_ensemble.astype(np.float64))
+        dset.attrs['dimension'] = 'Scenario x Year x Month'
+        dset.attrs['description'] = 'Random year matrix of each scenario (row i = scenario number i + 1), range_flag = 0'
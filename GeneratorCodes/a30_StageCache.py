@@ -0,0 +1,182 @@
+# a30_StageCache.py
+
+import os
+import glob
+import joblib
+
+from a19_RunManifest import content_hash, atomic_output
+from a23_RecordedData import as_recorded_data
+
+"""
+Module: Stage Cache (Dependency-Tracked Incremental Recomputation)
+
+The a1_ pipeline is treated as a graph of stages whose outputs are cached in the result folder
+(StageCache/) under a content hash of their exact inputs. A rerun recomputes only the stages, and
+the (scenario, location) optimizations, whose inputs changed:
+
+    Boundaries   (Step 2)  : boundary_fingerprint of a1_ (recorded data, random years, bounds); saved in
+                             GeneratorCodes/Boundary as before
+    Feasibility  (Step 3)  : boundaries, targets, local flags, seasonality and mean range
+                             -> flag of each target (StageCache/Feasibility_{key}.pkl)
+    Adjustment   (Step 4)  : boundaries, feasible targets, local flags, seasonality and mean range
+                             -> adjusted targets (StageCache/Adjustment_{key}.pkl)
+    Optimization (Step 5)  : one cell per (scenario, location): recorded monthly flow of the location,
+                             random year matrix of the scenario, the location's target and seasonality
+                             rows, bounds, solver settings and its random stream (root seed, scenario
+                             number, location) -> LocationResult (a11_) (StageCache/Cells/{key}.pkl)
+
+For example, after a change of one location's row in SD_Seasonality.xlsx, Steps 3 and 4 are rerun,
+but only that location is re-optimized in each scenario; the daily disaggregation of every scenario
+is redone (it is cheap compared to the optimization). Optimization cells are only cached when the run
+has a configured random_seed (a1_): an unseeded run draws a new root seed (a21_), so its cells could never
+be matched again.
+
+Each stage keeps only its latest entry. Cells accumulate up to MAX_CELLS files; beyond that, the least
+recently used ones are removed when the next run opens the cache. StageCache/ can be deleted at any time.
+Entries are written atomically, one file each, so queue workers (a20_) can share the cache.
+
+Key Functions:
+    - StageCache: Cache of stage outputs and optimization cells of a result folder
+    - cached_stage(): Stage output from a StageCache, or computed directly without one
+    - optimization_cell_key(): Content hash of the inputs of one (scenario, location) optimization
+"""
+
+
+MAX_CELLS = 20000  # Optimization cells kept in StageCache/Cells (least recently used ones are removed first)
+
+
+class StageCache:
+    """
+    Stage outputs and optimization cells cached under content hashes of their inputs.
+
+    Parameters:
+        folder : cache folder (<result folder>/StageCache)
+        cache_cells : False = optimization cells are neither read nor written (run without a configured random_seed)
+        max_cells : number of optimization cells kept (see prune_cells())
+    """
+
+    def __init__(self, folder, cache_cells=True, max_cells=MAX_CELLS):
+        self.folder = folder
+        self.cache_cells = cache_cells
+        self.max_cells = max_cells
+        if cache_cells:
+            self.prune_cells()
+
+    def stage_path(self, name, key):
+        return os.path.join(self.folder, f'{name}_{key}.pkl')
+
+    def get(self, name, key):
+        """
+        Cached output of stage `name` for the inputs hashed into `key`, or None.
+        """
+        path = self.stage_path(name, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            value = joblib.load(path)
+        except (OSError, EOFError, ValueError):
+            return None
+        print(f"♻️ {name} Inputs Are Unchanged. Reusing the Cached Result.")
+        return value
+
+    def put(self, name, key, value):
+        """
+        Caches the output of stage `name`, replacing its entry for earlier inputs.
+        """
+        path = self.stage_path(name, key)
+        if os.path.exists(path):
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        for old_path in glob.glob(os.path.join(self.folder, f'{name}_*.pkl')):
+            os.remove(old_path)  # Only the latest inputs of a stage are kept
+        with atomic_output(path) as part_path:
+            joblib.dump(value, part_path)
+
+    def stage(self, name, key, compute):
+        """
+        Output of stage `name` for the inputs hashed into `key`: loaded if cached, else compute() (and cached).
+        """
+        value = self.get(name, key)
+        if value is None:
+            value = compute()
+            self.put(name, key, value)
+        return value
+
+    def cell_path(self, key):
+        return os.path.join(self.folder, 'Cells', f'{key}.pkl')
+
+    def get_cell(self, key):
+        """
+        Cached optimization cell, or None (also for key = None, i.e. not cacheable).
+        """
+        if not self.cache_cells or key is None or not os.path.exists(self.cell_path(key)):
+            return None
+        try:
+            record = joblib.load(self.cell_path(key))
+        except (OSError, EOFError, ValueError, TypeError):  # TypeError: record of an older LocationResult layout
+            return None
+        try:
+            os.utime(self.cell_path(key))  # Marks the cell as recently used for prune_cells()
+        except OSError:
+            pass
+        return record
+
+    def put_cell(self, key, record):
+        """
+        Caches an optimization cell (ignored for key = None).
+        """
+        if not self.cache_cells or key is None:
+            return
+        os.makedirs(os.path.dirname(self.cell_path(key)), exist_ok=True)
+        with atomic_output(self.cell_path(key)) as part_path:
+            joblib.dump(record, part_path)
+
+    def prune_cells(self):
+        """
+        Removes the least recently used optimization cells beyond max_cells.
+        """
+        paths = glob.glob(os.path.join(self.folder, 'Cells', '*.pkl'))
+        if len(paths) <= self.max_cells:
+            return
+        used = []
+        for path in paths:
+            try:
+                used.append((os.path.getmtime(path), path))
+            except OSError:
+                pass
+        for _, path in sorted(used)[:len(used) - self.max_cells]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def cached_stage(stage_cache, name, key, compute):
+    """
+    StageCache.stage(), or compute() if stage_cache is None (incremental recomputation switched off).
+    """
+    return compute() if stage_cache is None else stage_cache.stage(name, key, compute)
+
+
+def optimization_cell_key(
+    Data, k, isLocal_k, randomyear, monthly_scenario, meanseasonality_change1, SDseasonality_change1,
+    range_lb, range_ub, numberofyears_syntheticdata, distance_threshold,
+    lookup_table, lookup_refinement, solver_mode, random_seed, number
+):
+    """
+    Content hash of the inputs of the optimization of location k in scenario `number` (a10_ optimize_location).
+    random_seed is the root seed of the run's random streams; whether cells are cached at all is decided by
+    the StageCache (cache_cells).
+
+    Returns:
+        key : hex digest, or None without a root seed
+    """
+    if random_seed is None:
+        return None
+    data = as_recorded_data(Data)
+    return content_hash(
+        'optimization', data.monthly_totals[:, :, k], data.firstyear, isLocal_k, randomyear,
+        monthly_scenario, meanseasonality_change1, SDseasonality_change1, range_lb, range_ub,
+        numberofyears_syntheticdata, distance_threshold, lookup_table, lookup_refinement, solver_mode,
+        str(random_seed), number, k
+    )
@@ -0,0 +1,130 @@
+# a31_ForcingCache.py
+
+import os
+import time
+import sqlite3
+import threading
+
+from a19_RunManifest import content_hash
+from a23_RecordedData import as_recorded_data
+
+"""
+Module: Persistent Forcing Solution Cache
+
+The same month problems of a11_ (one location, one random year matrix, one seasonality-adjusted
+mean / SD target) come up again and again across runs and configurations. This cache keeps the
+solved forcing pair of each (location, month) problem in one SQLite file shared by every run, so
+a11_ reuses a hit directly instead of running the solvers again.
+
+A problem is keyed by a content hash of:
+    - the recorded monthly flow of the location, its first year and the random year matrix (synthetic horizon
+      included),
+    - the month and its seasonality-adjusted mean / SD target (the target a12_ measures the distance to),
+    - the solver settings (month bounds, distance_threshold, solver_mode, lookup table and refinement).
+
+The random stream of the scenario is not part of the key: a hit returns the forcing found by an earlier
+run, which may differ slightly from the one a fresh solve with this run's stream would find (both are
+solutions of the same problem). The cache is bounded to max_entries; the least recently used entries
+are evicted first. Workers of the same machine (joblib, a20_ queue workers) can share one cache file,
+and threads (a36_ service workers) can share one ForcingCache object: each thread opens its own connection.
+
+Key Functions:
+    - ForcingCache: On-disk cache of solved (location, month) forcing pairs
+    - forcing_problem_key(): Content hash of the month-independent inputs of a location's problems
+"""
+
+EVICTION_INTERVAL = 1000  # Insertions between two checks of the size bound
+
+
+class ForcingCache:
+    """
+    On-disk cache of solved forcing pairs (SQLite), bounded to max_entries with least-recently-used eviction.
+
+    Parameters:
+        path : cache file (e.g. <folder>/Forcing_Cache.sqlite); created if missing
+        max_entries : maximum number of cached month problems
+    """
+
+    def __init__(self, path, max_entries=1000000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._insertions = 0
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_local']  # Each worker process opens its own connection
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:  # SQLite connections are used only by the thread that opened them
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=60)
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS forcing ('
+                'key TEXT PRIMARY KEY, mean REAL, sd REAL, distance REAL, last_used REAL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS forcing_last_used ON forcing (last_used)')
+            connection.commit()
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        """
+        Cached forcing pair (mean, SD change %) of a month problem, or None.
+        """
+        connection = self.connection()
+        row = connection.execute('SELECT mean, sd FROM forcing WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        connection.execute('UPDATE forcing SET last_used = ? WHERE key = ?', (time.time(), key))
+        connection.commit()
+        return float(row[0]), float(row[1])
+
+    def put(self, key, mean, sd, distance):
+        """
+        Caches the forcing pair of a month problem and its distance from the target.
+        """
+        connection = self.connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO forcing (key, mean, sd, distance, last_used) VALUES (?, ?, ?, ?, ?)',
+            (key, float(mean), float(sd), float(distance), time.time())
+        )
+        connection.commit()
+        self._insertions += 1
+        if self._insertions % EVICTION_INTERVAL == 1:
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries beyond max_entries.
+        """
+        connection = self.connection()
+        excess = connection.execute('SELECT COUNT(*) FROM forcing').fetchone()[0] - self.max_entries
+        if excess > 0:
+            connection.execute(
+                'DELETE FROM forcing WHERE key IN (SELECT key FROM forcing ORDER BY last_used LIMIT ?)', (excess,)
+            )
+            connection.commit()
+
+    def __len__(self):
+        return self.connection().execute('SELECT COUNT(*) FROM forcing').fetchone()[0]
+
+
+def forcing_problem_key(
+    Data, k, randomyear, numberofyears_syntheticdata, range_lb, range_ub,
+    distance_threshold, solver_mode, use_lookup, lookup_refinement
+):
+    """
+    Content hash of the inputs shared by the month problems of location k (a11_ adds the month and its target).
+    """
+    recorded = as_recorded_data(Data)
+    return content_hash(
+        'forcing', recorded.monthly_totals[:, :, k], recorded.firstyear, randomyear, numberofyears_syntheticdata,
+        range_lb, range_ub, distance_threshold, solver_mode, use_lookup, lookup_refinement
+    )
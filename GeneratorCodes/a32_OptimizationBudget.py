@@ -0,0 +1,131 @@
+# a32_OptimizationBudget.py
+
+import time
+import numpy as np
+
+"""
+Module: Optimization Budgets
+
+Hard-to-reach targets near the feasibility boundary can run differential evolution to maxiter for
+every month, so the run time of a10_ is unpredictable. Budgets bound it, in wall-clock seconds or
+objective evaluations, per scenario and per run (0 = unlimited):
+
+    scenario_time_budget        the optimizations of a scenario stop this many seconds after it starts
+    run_time_budget             every optimization stops this many seconds after Step 5 of a1_ starts
+    scenario_evaluation_budget  evaluations per scenario, shared equally by its non-local locations
+    run_evaluation_budget       evaluations of the run, shared equally by its pending scenarios
+
+Evaluation budgets are split up front (not first come, first served), so the results do not depend on
+the execution order and stay reproducible with a fixed random_seed. Within a location, a11_ gives each
+month a fair share of what is left (evaluations and time), so budget unused by easy months is carried to
+later ones. A month whose share runs out keeps the best forcing found so far (or the seasonality-adjusted
+starting guess if nothing was evaluated) and is flagged as budget-limited: Budget_Limited[Location x Month]
+in the scenario .h5 file and a summary of the distance lost in OutputData/Solver_Summary.h5.
+
+Key Functions:
+    - RunBudget: Budgets of a run, handing out the budget of each location optimization
+    - LocationBudget: Deadline and evaluation limit of one location optimization
+    - summarize_budget(): Count and distances of the budget-limited month problems of a run
+"""
+
+
+class LocationBudget:
+    """
+    Budget of the optimization of one location (a11_).
+
+    Parameters:
+        deadline : time.time() at which the optimization stops (None = no time limit)
+        max_evaluations : objective evaluations of the location (None = no limit)
+    """
+
+    def __init__(self, deadline=None, max_evaluations=None):
+        self.deadline = deadline
+        self.max_evaluations = max_evaluations
+
+    def month_share(self, used_evaluations, remaining_months):
+        """
+        Deadline and evaluation limit of the next month: a fair share of what is left for the remaining months.
+
+        Returns:
+            deadline : time.time() limit of the month, or None
+            max_evaluations : evaluation limit of the month, or None
+        """
+        deadline = None
+        if self.deadline is not None:
+            now = time.time()
+            deadline = now + max(0.0, self.deadline - now) / remaining_months
+        max_evaluations = None
+        if self.max_evaluations is not None:
+            max_evaluations = max(0, self.max_evaluations - used_evaluations) // remaining_months
+        return deadline, max_evaluations
+
+
+class RunBudget:
+    """
+    Budgets of a run (see the module description); 0 = unlimited.
+
+    Parameters:
+        scenario_time_budget, run_time_budget : wall-clock seconds
+        scenario_evaluation_budget, run_evaluation_budget : objective evaluations
+        n_scenarios : number of scenarios sharing run_evaluation_budget
+
+    The run clock starts when the RunBudget is created.
+    """
+
+    def __init__(self, scenario_time_budget=0, run_time_budget=0,
+                 scenario_evaluation_budget=0, run_evaluation_budget=0, n_scenarios=1):
+        self.scenario_time_budget = scenario_time_budget
+        self.run_deadline = time.time() + run_time_budget if run_time_budget > 0 else None
+        limits = [scenario_evaluation_budget] if scenario_evaluation_budget > 0 else []
+        if run_evaluation_budget > 0:
+            limits.append(run_evaluation_budget // max(1, n_scenarios))
+        self.scenario_evaluations = min(limits) if limits else None
+
+    @property
+    def active(self):
+        return self.scenario_time_budget > 0 or self.run_deadline is not None or self.scenario_evaluations is not None
+
+    def location_budget(self, scenario_start, n_optimized):
+        """
+        Budget of each location optimization of a scenario whose optimization started at scenario_start.
+
+        Parameters:
+            scenario_start : time.time() when the scenario's optimization started
+            n_optimized : number of locations of the scenario sharing its evaluation budget (non-locals)
+
+        Returns:
+            LocationBudget, or None if no budget is set
+        """
+        if not self.active:
+            return None
+        deadlines = [d for d in (self.run_deadline,
+                                 scenario_start + self.scenario_time_budget if self.scenario_time_budget > 0 else None)
+                     if d is not None]
+        max_evaluations = None
+        if self.scenario_evaluations is not None:
+            max_evaluations = self.scenario_evaluations // max(1, n_optimized)
+        return LocationBudget(min(deadlines) if deadlines else None, max_evaluations)
+
+
+def summarize_budget(budget_limited, solver_log, distance_threshold):
+    """
+    Budget-limited month problems of a run and the distance from the target they ended at.
+
+    Parameters:
+        budget_limited : [... x Month] flags of budget-limited month problems
+        solver_log : [... x Month x Solver x 2] solver log of the same problems (a11_)
+        distance_threshold : distance the problems aimed at
+
+    Returns:
+        n_limited : number of budget-limited problems
+        limited_distance : best distance of each budget-limited problem (NaN = no evaluation within the budget)
+        distance_lost : mean excess of those distances over distance_threshold
+    """
+    limited = np.asarray(budget_limited, dtype=bool)
+    distances = solver_log[..., 1][limited]  # [Problem x Solver]
+    limited_distance = np.full(distances.shape[0], np.nan)
+    evaluated = ~np.all(np.isnan(distances), axis=1)
+    limited_distance[evaluated] = np.nanmin(distances[evaluated], axis=1)
+    excess = np.maximum(limited_distance - distance_threshold, 0)
+    distance_lost = float(np.nanmean(excess)) if np.any(evaluated) else np.nan
+    return int(limited.sum()), limited_distance, distance_lost
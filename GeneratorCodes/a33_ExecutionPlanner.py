@@ -0,0 +1,337 @@
+# a33_ExecutionPlanner.py
+
+import os
+import json
+import time
+import numpy as np
+import h5py
+
+from a4_Function_Synthetic_Flow_Generator_Monthly import synthetic_flow_generator_monthly
+from a10_InverseApproach_and_MonthlytoDaily import location_target, location_cell_keys, scenario_random_years
+from a11_Optimization import optimize_forcing_scenario, SOLVER_NAMES
+from a12_Distance1 import a12_Distance1
+from a15_SyntheticMonthlytoDailyNonLocals import select_knn_years
+from a18_ResponseLookupTable import location_lookup
+from a19_RunManifest import scenario_is_complete, atomic_output
+from a23_RecordedData import as_recorded_data
+from a29_HorizonChunks import DailyBlocks
+from a32_OptimizationBudget import LocationBudget
+
+"""
+Module: Dry Run Cost Estimator and Execution Planner
+
+With dry_run = 1, a1_ loads the inputs and runs the cheap stages (boundaries, feasibility and
+adjustment, Steps 1 to 4), then plans Step 5 instead of running it:
+
+    1. Counts the (scenario, location, month) optimizations left: pending scenarios (complete ones are
+       skipped on resume) x non-local locations x 12, minus the locations cached in the stage cache (a30_).
+    2. Calibrates per-kernel costs with a short micro-benchmark on this machine:
+           evaluation      seconds per objective evaluation (a12_)
+           problem         objective evaluations per month problem: from the Solver_Summary.h5 of an
+                           earlier run with the same solver settings, else from one calibration solve
+                           of a pending location (limited to calibration_seconds)
+           disaggregation  seconds per synthetic year and location of the daily disaggregation (a29_)
+    3. Estimates the run time of the configured backend (local or queue workers on this machine), the
+       peak memory and the output size, and recommends the worker count and chunking.
+
+The plan is printed and saved as Run_Plan.json in the result folder. Estimates assume the optimization
+parallelizes over the non-local locations (or the scenarios of a batch) up to the CPU count, and do not
+count the forcing cache (a31_), so they are an upper bound when it is used.
+
+Key Functions:
+    - benchmark_kernels(): Per-kernel costs on this machine
+    - recorded_evaluations_per_problem(): Evaluations per month problem of an earlier run
+    - plan_run(): Counts, estimates, recommendations and Run_Plan.json
+"""
+
+
+def available_memory():
+    """
+    Physical memory of this machine in bytes, or None if it cannot be read.
+    """
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def format_bytes(n_bytes):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n_bytes < 1024:
+            return f"{n_bytes:.1f} {unit}"
+        n_bytes /= 1024
+    return f"{n_bytes:.1f} TB"
+
+
+def format_seconds(seconds):
+    if seconds < 120:
+        return f"{seconds:.0f} s"
+    if seconds < 7200:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def recorded_evaluations_per_problem(scenariofolderpass, solver_mode, distance_threshold):
+    """
+    Objective evaluations per month problem in the Solver_Summary.h5 of an earlier run of the result folder
+    (None if there is none with the same solver_mode and distance_threshold).
+    """
+    path = os.path.join(scenariofolderpass, 'OutputData', 'Solver_Summary.h5')
+    if not os.path.exists(path):
+        return None
+    with h5py.File(path, 'r') as h5f:
+        if h5f.attrs.get('solver_mode') != solver_mode or h5f.attrs.get('distance_threshold') != distance_threshold:
+            return None
+        attempts = h5f['Attempts[Solver]'][:]
+        evaluations = h5f['Evaluations[Solver]'][:]
+    if attempts.max() == 0:
+        return None
+    return float(evaluations.sum() / attempts.max())  # Every problem runs the first stage
+
+
+def benchmark_kernels(
+    Data, isLocal, numberofyears_syntheticdata, randomyear, monthly_target, k,
+    meanseasonality_change, SDseasonality_change, range_lb, range_ub, distance_threshold,
+    solver_mode, location_table, lookup_refinement, startyear_synthetic, location_chunk_size,
+    calibration_seconds=30, n_evaluations=20, n_locations=8, n_years=5
+):
+    """
+    Per-kernel costs on this machine (see the module description).
+
+    Parameters:
+        monthly_target, k : target [24] and index of the non-local location of the calibration solve (None = none)
+        location_table : lookup table of location k (a18_) or None
+        calibration_seconds : time limit of the calibration solve
+        n_evaluations : objective evaluations timed
+        n_locations, n_years : locations and synthetic years of the timed daily disaggregation
+
+    Returns:
+        costs : dict of evaluation_seconds, evaluations_per_problem (None without a non-local location),
+                calibration_limited (the calibration solve hit its time limit) and disaggregation_seconds
+                (per synthetic year and location)
+    """
+    data = as_recorded_data(Data)
+    costs = {'evaluations_per_problem': None, 'calibration_limited': False}
+
+    # === Objective evaluation (a12_) ===
+    k_eval = k if k is not None else 0
+    for i in range(n_evaluations + 1):
+        if i == 1:
+            start = time.perf_counter()  # The first call only compiles the numba kernels
+        a12_Distance1(i % 5, -(i % 5), i % 12, data, k_eval, numberofyears_syntheticdata, randomyear,
+                      np.zeros(24), meanseasonality_change[k_eval, :], SDseasonality_change[k_eval, :])
+    costs['evaluation_seconds'] = (time.perf_counter() - start) / n_evaluations
+
+    # === Evaluations per month problem: one calibration solve of a pending location ===
+    if k is not None:
+        result = optimize_forcing_scenario(
+            data, k, 0, numberofyears_syntheticdata, randomyear, data.numberofyears_recorded,
+            monthly_target, meanseasonality_change[k, :], SDseasonality_change[k, :],
+            range_lb, range_ub, distance_threshold, location_table, lookup_refinement, solver_mode,
+            None, None, LocationBudget(time.time() + calibration_seconds)
+        )
+        costs['evaluations_per_problem'] = float(np.nansum(result.solver_log[:, :, 0]) / 12)
+        costs['calibration_limited'] = bool(result.budget_limited.any())
+
+    # === Daily disaggregation of a few years of the first locations (a29_) ===
+    locations = list(range(min(n_locations, data.numberoflocations)))
+    years = min(n_years, numberofyears_syntheticdata - 1)
+    Monthly_Synthetic = np.zeros((years, 12, len(locations)))
+    Monthly_Recorded = np.zeros((data.numberofyears_recorded, 12, len(locations)))
+    for i in locations:
+        x3, x4 = synthetic_flow_generator_monthly(data, i, numberofyears_syntheticdata, randomyear, np.zeros(12), np.zeros(12))
+        Monthly_Synthetic[:, :, i] = x3[:years, :12]
+        Monthly_Recorded[:, :, i] = x4[:data.numberofyears_recorded, :12]
+    isLocal_sample = np.asarray(isLocal).flatten()[locations]
+    nonlocal_sample = np.where(isLocal_sample == 0)[0]
+
+    for repeat in range(2):
+        start = time.perf_counter()  # Timed on the second pass (the first one compiles the numba kernels)
+        if len(nonlocal_sample) > 0:
+            selected_years = select_knn_years(Monthly_Synthetic[:, :, nonlocal_sample], Monthly_Recorded[:, :, nonlocal_sample],
+                                              data.firstyear, data.numberofyears_recorded)
+        else:
+            selected_years = np.empty((years,), dtype=int)
+        DailyBlocks(data, Monthly_Synthetic, Monthly_Recorded, selected_years, isLocal_sample, data.firstyear,
+                    startyear_synthetic, 0, location_chunk_size).block(0, years)
+    costs['disaggregation_seconds'] = (time.perf_counter() - start) / (years * len(locations))
+    return costs
+
+
+def plan_run(
+    Data, randomyear, desired_scenarios_monthly, adjusted_scenarios, desired_scenarios1,
+    isLocal, meanseasonality_change, SDseasonality_change, range_lb, range_ub, range_flag,
+    scenariofolderpass, numberofyears_syntheticdata, startyear_synthetic, distance_threshold,
+    enable_parallel, daily, monthly, h5, lookup_table, lookup_refinement, response_table, solver_mode,
+    scenario_numbers, manifest, execution_mode, queue_workers, randomyear_ensemble, random_seed,
+    output_precision, location_chunk_size, horizon_chunk_years, stage_cache,
+    scenario_time_budget, run_time_budget, n_boundary_scenarios, daily_storage='full', calibration_seconds=30
+):
+    """
+    Plans Step 5 of a1_ without running it: prints the counts, estimates and recommendations and saves them
+    in Run_Plan.json of the result folder.
+
+    Parameters are those of perform_inverse_optimization_and_disaggregation (a10_), plus:
+        n_boundary_scenarios : number of boundary scenarios (rows of Boundary_Scenarios.h5)
+        calibration_seconds : time limit of the calibration solve
+
+    Returns:
+        plan : dict saved in Run_Plan.json
+    """
+    data = as_recorded_data(Data)
+    isLocal = np.asarray(isLocal).flatten()
+    numberoflocations = data.numberoflocations
+    nonlocal_indices = np.where(isLocal == 0)[0].tolist()
+    n_nonlocal = len(nonlocal_indices)
+    n_years = numberofyears_syntheticdata - 1
+    n_days = int(round(n_years * 365.25))
+    cpu = os.cpu_count() or 1
+
+    # === 1. Optimizations left ===
+    pending = [sce for sce in range(desired_scenarios1.shape[0])
+               if manifest is None or not scenario_is_complete(manifest, scenariofolderpass, scenario_numbers[sce], daily, monthly, h5)]
+    n_cached = 0
+    if stage_cache is not None:
+        for sce in pending:
+            randomyear_s, _ = scenario_random_years(
+                scenario_numbers[sce], data, randomyear, randomyear_ensemble, isLocal, range_flag,
+                numberofyears_syntheticdata, numberoflocations, range_lb, range_ub, 0, None, random_seed
+            )
+            keys = location_cell_keys(
+                sce, scenario_numbers[sce], randomyear_s, data, isLocal, desired_scenarios_monthly, adjusted_scenarios,
+                meanseasonality_change, SDseasonality_change, range_lb, range_ub,
+                numberofyears_syntheticdata, numberoflocations, distance_threshold,
+                lookup_table, lookup_refinement, solver_mode, random_seed
+            )
+            n_cached += sum(1 for k in nonlocal_indices if stage_cache.get_cell(keys[k]) is not None)
+    n_problems = (len(pending) * n_nonlocal - n_cached) * 12
+
+    # === 2. Per-kernel costs ===
+    print("⏱️ Dry Run: Calibrating Kernel Costs on This Machine...")
+    sce_calibration = pending[len(pending) // 2] if pending else None
+    k_calibration = nonlocal_indices[0] if nonlocal_indices and pending else None
+    location_table = None
+    if k_calibration is not None and lookup_table == 1 and response_table is not None:
+        location_table = location_lookup(response_table, k_calibration)
+    costs = benchmark_kernels(
+        data, isLocal, numberofyears_syntheticdata, randomyear,
+        None if k_calibration is None else location_target(sce_calibration, k_calibration, isLocal, desired_scenarios_monthly, adjusted_scenarios),
+        k_calibration, meanseasonality_change, SDseasonality_change, range_lb, range_ub, distance_threshold,
+        solver_mode, location_table, lookup_refinement, startyear_synthetic, location_chunk_size, calibration_seconds
+    )
+    recorded = recorded_evaluations_per_problem(scenariofolderpass, solver_mode, distance_threshold)
+    evaluations_per_problem = recorded if recorded is not None else (costs['evaluations_per_problem'] or 0.0)
+
+    # === 3. Run time of the configured backend (on this machine) ===
+    per_scenario_jobs = min(cpu, max(1, n_nonlocal)) if enable_parallel else 1
+    if execution_mode == 'queue':
+        processes = max(1, queue_workers)
+        optimization_parallel = min(cpu, processes * per_scenario_jobs)
+    elif range_flag == 0 and randomyear_ensemble is not None and enable_parallel:
+        processes = 1
+        optimization_parallel = cpu  # Scenarios of a batch are optimized together
+    else:
+        processes = 1
+        optimization_parallel = per_scenario_jobs
+    optimization_seconds = n_problems * evaluations_per_problem * costs['evaluation_seconds'] / optimization_parallel
+    if scenario_time_budget > 0:
+        optimization_seconds = min(optimization_seconds, len(pending) * scenario_time_budget / processes)
+    if run_time_budget > 0:
+        optimization_seconds = min(optimization_seconds, run_time_budget)
+    disaggregation_seconds = len(pending) * n_years * numberoflocations * costs['disaggregation_seconds'] / processes
+    if daily_storage in ('lineage', 'deferred') and daily == 0:
+        disaggregation_seconds = 0.0  # Daily series are rebuilt by the reader (a34_) or a37_, not during the run
+    total_seconds = optimization_seconds + disaggregation_seconds
+
+    # === Memory: recorded data (per optimization process), boundaries of a chunk, scenarios in flight ===
+    bytes_per_value = {'float64': 8, 'float32': 4, 'scaled': 2}[output_precision]
+    data_bytes = data.flows.nbytes + data.calendar_flows.nbytes + data.monthly_totals.nbytes
+    chunk_locations = numberoflocations if location_chunk_size <= 0 else min(location_chunk_size, numberoflocations)
+    boundary_bytes = 2 * 2 * n_boundary_scenarios * 12 * chunk_locations * 8  # Mean / SD boundaries and their polygons
+    block_years = n_years if horizon_chunk_years <= 0 else min(horizon_chunk_years, n_years)
+    daily_bytes = 3 * int(round(block_years * 365.25)) * (2 + numberoflocations) * 8  # Sections, daily array, encoding
+    monthly_bytes = 4 * (n_years + data.numberofyears_recorded) * 12 * numberoflocations * 8
+    in_flight = processes if execution_mode == 'queue' else 1
+    peak_bytes = data_bytes * (1 + optimization_parallel) + boundary_bytes + in_flight * (daily_bytes + monthly_bytes)
+
+    # === Output size ===
+    scenario_output_bytes = 0
+    if h5 == 1:
+        scenario_output_bytes += (n_years + data.numberofyears_recorded) * 12 * numberoflocations * bytes_per_value
+        if daily_storage == 'lineage':
+            scenario_output_bytes += (n_years * 12 * numberoflocations + n_years) * 8  # Monthly flows, selected years
+        elif daily_storage == 'deferred':
+            scenario_output_bytes += (n_years + data.numberofyears_recorded) * 12 * numberoflocations * 8  # KNN inputs
+        else:
+            scenario_output_bytes += n_days * (2 + numberoflocations) * bytes_per_value
+        scenario_output_bytes += numberoflocations * (24 + 1 + 4 * 12 + 2 * 12 * len(SOLVER_NAMES)) * 8
+    if daily == 1:
+        scenario_output_bytes += n_days * (2 + numberoflocations) * 20  # About 20 characters per CSV value
+    if monthly == 1:
+        scenario_output_bytes += n_years * 12 * (2 + numberoflocations) * 20
+    output_bytes = len(pending) * scenario_output_bytes
+    if h5 == 1 and daily_storage in ('lineage', 'deferred'):
+        output_bytes += data.calendar_flows.shape[0] * (2 + numberoflocations) * 8  # Daily_Lineage.h5 of the run
+
+    # === Recommendations ===
+    memory = available_memory()
+    recommendations = {}
+    if enable_parallel and 0 < n_nonlocal < cpu and len(pending) > 1:
+        workers = -(-cpu // n_nonlocal)
+        if memory is not None:
+            workers = max(1, min(workers, int(0.5 * memory // max(1, daily_bytes + monthly_bytes + data_bytes))))
+        if workers > 1 and (execution_mode != 'queue' or queue_workers != workers):
+            recommendations['execution_mode'] = 'queue'
+            recommendations['queue_workers'] = workers
+    elif execution_mode == 'queue' and queue_workers > 1 and n_nonlocal >= cpu:
+        recommendations['queue_workers'] = 1  # One scenario already uses every CPU of this machine
+    if memory is not None:
+        year_bytes = 3 * 366 * (2 + numberoflocations) * 8
+        if in_flight * 3 * int(round(n_years * 365.25)) * (2 + numberoflocations) * 8 > 0.25 * memory:
+            recommendations['horizon_chunk_years'] = max(1, int(0.25 * memory / in_flight // year_bytes))
+        all_boundary_bytes = 2 * 2 * n_boundary_scenarios * 12 * numberoflocations * 8
+        if all_boundary_bytes > 0.25 * memory:
+            recommendations['location_chunk_size'] = max(1, int(numberoflocations * 0.25 * memory // all_boundary_bytes))
+
+    plan = {
+        'pending_scenarios': len(pending),
+        'nonlocal_locations': n_nonlocal,
+        'month_problems': int(n_problems),
+        'cached_locations': int(n_cached),
+        'evaluation_seconds': costs['evaluation_seconds'],
+        'evaluations_per_problem': evaluations_per_problem,
+        'evaluations_source': 'earlier run' if recorded is not None else
+                              ('calibration (time-limited, lower bound)' if costs['calibration_limited'] else 'calibration'),
+        'disaggregation_seconds_per_year_location': costs['disaggregation_seconds'],
+        'execution_mode': execution_mode,
+        'optimization_parallel': optimization_parallel,
+        'optimization_seconds': optimization_seconds,
+        'disaggregation_seconds': disaggregation_seconds,
+        'total_seconds': total_seconds,
+        'peak_memory_bytes': int(peak_bytes),
+        'available_memory_bytes': memory,
+        'output_bytes': int(output_bytes),
+        'recommendations': recommendations,
+    }
+
+    print(f"🧭 Dry Run Plan: {len(pending)} Scenarios x {n_nonlocal} Non-Local Locations x 12 Months = "
+          f"{n_problems} Month Problems to Optimize ({n_cached} Locations Cached).")
+    print(f"🧮 Kernel Costs: {1000 * costs['evaluation_seconds']:.2f} ms per Evaluation, "
+          f"{evaluations_per_problem:.0f} Evaluations per Problem ({plan['evaluations_source']}), "
+          f"{1000 * costs['disaggregation_seconds']:.2f} ms per Synthetic Year and Location of Disaggregation.")
+    print(f"⏳ Estimated Run Time ({execution_mode}, {optimization_parallel} Parallel Optimizations): {format_seconds(total_seconds)} "
+          f"(Optimization {format_seconds(optimization_seconds)}, Disaggregation {format_seconds(disaggregation_seconds)}).")
+    print(f"💾 Estimated Peak Memory {format_bytes(peak_bytes)}"
+          + (f" of {format_bytes(memory)}" if memory is not None else "")
+          + f"; Output Size {format_bytes(output_bytes)}.")
+    if recommendations:
+        print("💡 Recommended: " + ", ".join(f"{key} = {value!r}" for key, value in recommendations.items()))
+    else:
+        print("💡 The Configured Backend and Chunking Fit This Run.")
+
+    os.makedirs(scenariofolderpass, exist_ok=True)
+    with atomic_output(os.path.join(scenariofolderpass, 'Run_Plan.json')) as part_path:
+        with open(part_path, 'w', encoding='utf-8') as f:
+            json.dump(plan, f, indent=2)
+    print(rf"📁 Run Plan Is Saved on {scenariofolderpass} \Run_Plan.json.")
+    return plan
@@ -0,0 +1,322 @@
+# a34_DailyLineage.py
+
+import os
+import numpy as np
+import h5py
+
+from a15_SyntheticMonthlytoDailyNonLocals import select_knn_years
+from a17_Disaggregation import build_proportion_matrix
+from a19_RunManifest import atomic_output
+from a21_RandomStreams import spawn_stream
+from a22_OutputEncoding import encode_array, decode_array, column_chunks
+from a23_RecordedData import as_recorded_data
+
+"""
+Module: Lineage-Based Compact Daily Storage
+
+The synthetic daily series of a scenario is fully determined by its synthetic monthly flows, the
+recorded year matched to each synthetic year (KNN, a15_) and the daily-to-monthly proportions of the
+recorded data (a17_). With daily_storage = 'lineage', the scenario .h5 files keep only this lineage
+instead of DailyTimeSeries_Synthetic, which dominates their size:
+
+    Scenario{number}.h5   Lineage_Monthly_Synthetic(m3 per s)[Year x Month x Location]   (float64, exact)
+                          Selected_Years[Year]
+    Daily_Lineage.h5      Daily_Proportions[Day x Location] and Recorded_Calendar[Day x 2] of the
+                          recorded data, written once per run in OutputData
+
+The scenario reader (a26_) rebuilds the daily series of any scenario and location on demand
+(store.daily[...] works on both layouts). The reconstruction repeats the arithmetic of the
+disaggregation (monthly flow x proportion, then the February leap-year adjustment of a17_) with
+vectorized gathers, so the values are identical to those a 'full' run stores with the same
+output_precision (the encoding of a22_ is applied to the rebuilt columns).
+
+With daily_storage = 'deferred', the run also skips the KNN year matching: each scenario file keeps, instead
+of Selected_Years, the exact inputs of the matching (the recorded monthly flows it compares against and the
+seed, scenario number and chunking of its random stream), and stops at the monthly outputs. The daily series
+of chosen scenarios are produced later, in bulk by the daily stage (a37_) or on demand by the reader; the KNN
+draws are repeated from the same random stream, so the values are again those of a 'full' run.
+
+    Scenario{number}.h5   Lineage_Monthly_Synthetic(m3 per s)[Year x Month x Location]   (float64, exact)
+                          Lineage_Monthly_Recorded(m3 per s)[Year x Month x Location]    (float64, exact)
+                          attributes knn_seed, knn_number, location_chunk_size, nonlocal_indices, firstyear
+
+Key Functions:
+    - save_daily_lineage(): Writes the run's proportions (Daily_Lineage.h5)
+    - write_scenario_lineage(): Writes the lineage datasets of a scenario into its open .h5 file
+    - DeferredDaily, write_scenario_deferred(): Daily series of a 'deferred' scenario and its saved KNN inputs
+    - is_lineage(): True if an open scenario file stores its daily series as lineage (or deferred)
+    - DailyLineage: Reader rebuilding daily series from a run's Daily_Lineage.h5
+    - lineage_calendar(), lineage_daily(): Reconstruction kernels
+"""
+
+LINEAGE_FILE = 'Daily_Lineage.h5'
+LINEAGE_MONTHLY = 'Lineage_Monthly_Synthetic(m3 per s)[Year x Month x Location]'
+LINEAGE_RECORDED = 'Lineage_Monthly_Recorded(m3 per s)[Year x Month x Location]'
+DAILY_STORAGES = ('full', 'lineage', 'deferred')
+LINEAGE_DATASETS = (LINEAGE_MONTHLY, LINEAGE_RECORDED, 'Selected_Years[Year]')
+LINEAGE_ATTRS = ('daily_storage', 'knn_seed', 'knn_number', 'location_chunk_size', 'nonlocal_indices', 'firstyear')
+
+
+def save_daily_lineage(output_folder, Data, startyear_synthetic):
+    """
+    Writes the daily-to-monthly proportions of every recorded station into OutputData/Daily_Lineage.h5.
+    The proportions of a station do not depend on the scenario or on the location chunks, so they are shared
+    by every scenario of the run.
+
+    Parameters:
+        output_folder : OutputData folder of the run
+        Data : RecordedData (a23_)
+        startyear_synthetic : start year of the synthetic daily data (leap-year alignment)
+    """
+    data = as_recorded_data(Data)
+    proportions, years, months = build_proportion_matrix(
+        data.calendar_flows, data.monthly_totals, data.firstyear, np.arange(data.numberoflocations)
+    )
+    os.makedirs(output_folder, exist_ok=True)
+    path = os.path.join(output_folder, LINEAGE_FILE)
+    with atomic_output(path) as part_path, h5py.File(part_path, 'w') as h5f:
+        ds1 = h5f.create_dataset('Daily_Proportions[Day x Location]', data=proportions,
+                                 chunks=column_chunks(proportions.shape))
+        ds1.attrs['dimension'] = 'Day x Location'
+        ds1.attrs['description'] = 'Recorded daily flow divided by its monthly total (disaggregation proportions)'
+
+        ds2 = h5f.create_dataset('Recorded_Calendar[Day x 2]', data=np.column_stack([years, months]))
+        ds2.attrs['dimension'] = 'Day x 2 (year, month)'
+        ds2.attrs['description'] = 'Calendar year and month of each recorded day'
+
+        h5f.attrs['startyear_synthetic'] = startyear_synthetic
+
+
+def write_scenario_lineage(h5f, monthly_synthetic, selected_years):
+    """
+    Writes the lineage of a scenario's daily series into its open .h5 file (instead of DailyTimeSeries_Synthetic).
+
+    Parameters:
+        h5f : open scenario .h5 file
+        monthly_synthetic : synthetic monthly flow [Year x Month x Location] (m3 per s, as disaggregated)
+        selected_years : recorded year matched to each synthetic year [Year]
+    """
+    _write_lineage_monthly(h5f, monthly_synthetic)
+
+    ds2 = h5f.create_dataset('Selected_Years[Year]', data=np.asarray(selected_years, dtype=np.int64))
+    ds2.attrs['dimension'] = 'Year'
+    ds2.attrs['description'] = 'Recorded year whose daily proportions disaggregate each synthetic year'
+
+    h5f.attrs['daily_storage'] = 'lineage'
+
+
+def _write_lineage_monthly(h5f, monthly_synthetic):
+    ds1 = h5f.create_dataset(LINEAGE_MONTHLY, data=np.asarray(monthly_synthetic, dtype=np.float64),
+                             chunks=column_chunks(monthly_synthetic.shape))
+    ds1.attrs['dimension'] = 'Year x Month x Location'
+    ds1.attrs['description'] = 'Synthetic monthly flow disaggregated into the daily series (exact, m3 per s)'
+
+
+class DeferredDaily:
+    """
+    Daily series of a scenario of a 'deferred' run (a10_ generate_scenario()): holds the inputs of its KNN year
+    matching, which is only done when the series is produced (selected_years()).
+
+    Parameters:
+        Monthly_Synthetic, Monthly_Recorded : synthetic and recorded monthly flow [Year x Month x Location] (m3 per s)
+        nonlocal_indices : indices of the non-local stations (the KNN features)
+        firstyear : first recorded year
+        random_seed, number : root seed of the run and scenario number (the 'knn' stream of a21_)
+        location_chunk_size : chunking of the KNN features (a1_)
+    """
+
+    def __init__(self, Monthly_Synthetic, Monthly_Recorded, nonlocal_indices, firstyear, random_seed, number,
+                 location_chunk_size=0):
+        self.Monthly_Synthetic = Monthly_Synthetic
+        self.Monthly_Recorded = Monthly_Recorded
+        self.nonlocal_indices = np.asarray(nonlocal_indices, dtype=np.int64)
+        self.firstyear = int(firstyear)
+        self.random_seed = random_seed
+        self.number = int(number)
+        self.location_chunk_size = int(location_chunk_size)
+
+    def selected_years(self):
+        """
+        KNN-selected recorded year of each synthetic year, as drawn in a 'full' run (a10_ generate_scenario()).
+        """
+        if self.nonlocal_indices.size == 0:
+            return np.empty((self.Monthly_Synthetic.shape[0],), dtype=int)
+        return select_knn_years(
+            self.Monthly_Synthetic[:, :, self.nonlocal_indices], self.Monthly_Recorded[:, :, self.nonlocal_indices],
+            self.firstyear, self.Monthly_Recorded.shape[0],
+            spawn_stream(self.random_seed, 'knn', self.number), self.location_chunk_size
+        )
+
+
+def write_scenario_deferred(h5f, deferred):
+    """
+    Writes the KNN inputs of a 'deferred' scenario (DeferredDaily) into its open .h5 file.
+    """
+    _write_lineage_monthly(h5f, deferred.Monthly_Synthetic)
+
+    ds2 = h5f.create_dataset(LINEAGE_RECORDED, data=np.asarray(deferred.Monthly_Recorded, dtype=np.float64))
+    ds2.attrs['dimension'] = 'Year x Month x Location'
+    ds2.attrs['description'] = 'Recorded monthly flow the synthetic years are matched against (exact, m3 per s)'
+
+    h5f.attrs['daily_storage'] = 'deferred'
+    h5f.attrs['knn_seed'] = str(deferred.random_seed)
+    h5f.attrs['knn_number'] = deferred.number
+    h5f.attrs['location_chunk_size'] = deferred.location_chunk_size
+    h5f.attrs['nonlocal_indices'] = deferred.nonlocal_indices
+    h5f.attrs['firstyear'] = deferred.firstyear
+
+
+def read_scenario_deferred(h5f):
+    """
+    DeferredDaily of an open 'deferred' scenario file (write_scenario_deferred()).
+    """
+    seed = h5f.attrs['knn_seed']
+    return DeferredDaily(
+        h5f[LINEAGE_MONTHLY][()], h5f[LINEAGE_RECORDED][()], h5f.attrs['nonlocal_indices'], h5f.attrs['firstyear'],
+        None if seed == 'None' else int(seed), h5f.attrs['knn_number'], h5f.attrs['location_chunk_size']
+    )
+
+
+def is_lineage(h5f):
+    """
+    True if the open scenario file stores its daily series as lineage (write_scenario_lineage()), or only the
+    inputs of the lineage (write_scenario_deferred()).
+    """
+    return h5f.attrs.get('daily_storage', 'full') in ('lineage', 'deferred')
+
+
+class DailyLineage:
+    """
+    Rebuilds the daily series of the lineage scenario files of a run (see the module description).
+
+    Parameters:
+        output_folder : OutputData folder of the run (with Daily_Lineage.h5)
+    """
+
+    def __init__(self, output_folder):
+        self.path = os.path.join(output_folder, LINEAGE_FILE)
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"❌ {LINEAGE_FILE} Not Found in {output_folder}; Lineage Scenarios Cannot Be Rebuilt.")
+        with h5py.File(self.path, 'r') as h5f:
+            calendar = h5f['Recorded_Calendar[Day x 2]'][()]
+            self.startyear_synthetic = int(h5f.attrs['startyear_synthetic'])
+        self.recorded_years = calendar[:, 0].astype(np.int64)
+        self.recorded_months = calendar[:, 1].astype(np.int64)
+        self._layouts = {}  # Layout of each scenario file version (the KNN matching of 'deferred' files is done once)
+
+    def layout(self, h5f):
+        """
+        lineage_calendar() of an open lineage scenario file (for a 'deferred' file, after its KNN year matching).
+        """
+        key = (os.path.abspath(h5f.filename), os.path.getmtime(h5f.filename))
+        if key not in self._layouts:
+            if h5f.attrs['daily_storage'] == 'deferred':
+                selected_years = read_scenario_deferred(h5f).selected_years()
+            else:
+                selected_years = h5f['Selected_Years[Year]'][()]
+            self._layouts[key] = lineage_calendar(selected_years, self.recorded_years, self.recorded_months,
+                                                  self.startyear_synthetic)
+        return self._layouts[key]
+
+    def shape(self, h5f):
+        """
+        Shape [Day x (2 + Location)] of the daily series of an open lineage scenario file.
+        """
+        return len(self.layout(h5f)['rows']), 2 + h5f[LINEAGE_MONTHLY].shape[2]
+
+    def daily(self, h5f, locations, layout=None):
+        """
+        Daily series of some locations of an open lineage scenario file, decoded as a 'full' file with the
+        scenario's output_precision would be.
+
+        Parameters:
+            h5f : open lineage scenario file
+            locations : increasing list of location indices
+            layout : (Optional) layout(h5f), if already computed
+
+        Returns:
+            daily : [Day x (2 + len(locations))] synthetic year, month and daily flow of each location
+        """
+        daily = self.rebuild(h5f, locations, layout)
+        stored, attrs = encode_array(daily, h5f.attrs.get('output_precision', 'float64'), calendar_columns=2)
+        return decode_array(stored, attrs)
+
+    def rebuild(self, h5f, locations, layout=None):
+        """
+        daily() before the output_precision encoding: the float64 series a 'full' run disaggregates (and encodes
+        when it saves it).
+        """
+        locations = [int(k) for k in locations]
+        with h5py.File(self.path, 'r') as lineage_file:
+            proportions = lineage_file['Daily_Proportions[Day x Location]'][:, locations]
+        monthly_synthetic = h5f[LINEAGE_MONTHLY][:, :, locations]
+        return lineage_daily(monthly_synthetic, proportions, self.layout(h5f) if layout is None else layout)
+
+
+def lineage_calendar(selected_years, recorded_years, recorded_months, startyear_synthetic):
+    """
+    Row layout of the daily series disaggregated from `selected_years`: the rows of a17_
+    disaggregate_monthly_flows and the February leap-year adjustment of adjust_february.
+
+    Returns:
+        layout : dict of
+            calendar : [Day x 2] synthetic year index and month of each day
+            source : recorded day whose proportion each row uses (rows before the adjustment)
+            year, month : synthetic year and month (0-based) of each row before the adjustment
+            rows : row (before the adjustment) of each day
+            merged_from : rows of non-leap Feb 29 added to the previous day and removed
+            halved : days that are inserted Feb 29 copies of the previous day, halved
+    """
+    # Recorded days of each year, month by month, in recorded order (the loop order of disaggregate_monthly_flows)
+    order = np.lexsort((np.arange(len(recorded_years)), recorded_months, recorded_years))
+    sorted_years = recorded_years[order]
+    selected_years = np.asarray(selected_years, dtype=np.int64)
+    starts = np.searchsorted(sorted_years, selected_years, side='left')
+    lengths = np.searchsorted(sorted_years, selected_years, side='right') - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    source = order[offsets + np.arange(lengths.sum())]
+    year = np.repeat(np.arange(len(selected_years)), lengths)
+    month = recorded_months[source] - 1
+
+    # February runs: Feb 29 inserted in leap years with 28 days, removed in other years with 29 days
+    edges = np.diff(np.concatenate(([0], (month == 1).astype(np.int8), [0])))
+    run_stops = np.nonzero(edges == -1)[0]
+    run_lengths = run_stops - np.nonzero(edges == 1)[0]
+    calendar_years = year[run_stops - 1] + startyear_synthetic
+    leap = ((calendar_years % 4 == 0) & (calendar_years % 100 != 0)) | (calendar_years % 400 == 0)
+    inserted_after = run_stops[leap & (run_lengths == 28)] - 1
+    merged_from = run_stops[~leap & (run_lengths == 29)] - 1
+
+    repeats = np.ones(len(source), dtype=np.int64)
+    repeats[inserted_after] = 2
+    repeats[merged_from] = 0
+    rows = np.repeat(np.arange(len(source)), repeats)
+    halved = np.nonzero(np.diff(rows, prepend=-1) == 0)[0]
+    return {
+        'calendar': np.column_stack([year[rows] + 1, month[rows] + 1]), 'source': source,
+        'year': year, 'month': month, 'rows': rows, 'merged_from': merged_from, 'halved': halved,
+    }
+
+
+def lineage_daily(monthly_synthetic, proportions, layout):
+    """
+    Daily flows rebuilt from the lineage, with the arithmetic of a17_ (hence identical values).
+
+    Parameters:
+        monthly_synthetic : synthetic monthly flow [Year x Month x Station] (m3 per s)
+        proportions : daily-to-monthly proportions of the same stations [Recorded Day x Station]
+        layout : lineage_calendar() of the scenario
+
+    Returns:
+        daily : [Day x (2 + Station)] synthetic year, month and daily flow of each station
+    """
+    flows = monthly_synthetic[layout['year'], layout['month'], :] * proportions[layout['source'], :]
+    merged_from = layout['merged_from']
+    flows[merged_from - 1] += flows[merged_from]
+    flows = flows[layout['rows']]
+    flows[layout['halved']] /= 2
+
+    daily = np.empty((flows.shape[0], 2 + flows.shape[1]))
+    daily[:, :2] = layout['calendar']
+    daily[:, 2:] = flows
+    return daily
@@ -0,0 +1,189 @@
+# a35_Campaign.py
+
+import os
+import sys
+import json
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+Module: Multi-Basin Campaign Mode
+
+Runs many configurations of a1_ (basins, target grids, seasonality files, seeds, ...) from one campaign
+file in a single long-lived process, instead of one Run.py process per configuration. The runs share
+what a fresh process would rebuild each time:
+
+    - imported modules and compiled numba kernels (a4_, a12_, a13_), compiled once for the campaign
+    - the joblib worker pool of the parallel optimizations (a10_), started once and reused by every run
+    - parsed input Excel sheets (a23_ read_excel_values()), read once per file
+    - boundaries and lookup tables: each basin gets its own boundary folder, reused by all its runs whose
+      boundary inputs are unchanged (Boundary_Fingerprint.txt, a19_)
+    - the forcing solution cache (a31_), if a shared forcing_cache_folder is set
+
+Campaign file (JSON, paths relative to the repository folder):
+
+    {
+        "concurrent_runs": 2,
+        "shared": {"forcing_cache_folder": "ForcingCache", "random_seed": 7},
+        "runs": [
+            {"resultfolder": "Scenarios_BasinA", "recorded_data": "BasinA.xlsx"},
+            {"resultfolder": "Scenarios_BasinA_Wet", "recorded_data": "BasinA.xlsx",
+             "desired_change_mean": {"expr": "np.arange(0, 41, 10)"}},
+            {"resultfolder": "Scenarios_BasinB", "recorded_data": "BasinB.xlsx"}
+        ]
+    }
+
+Each run is InputData.txt with the "shared" values, then its own values, assigned on top (any variable of
+the USER-DEFINED INPUT SECTION of a1_; {"expr": ...} is inserted as Python code). Unless given, a run's
+boundary_folder is Boundaries/<recorded data file name> and its queue_folder is <resultfolder>/WorkQueue.
+Runs of the same boundary folder are run one after another (the first generates the boundaries, the
+others reuse them); runs of different boundary folders run concurrently, up to concurrent_runs at a time.
+A failed run is reported and does not stop the others. Campaign_Summary.json is saved next to the
+campaign file.
+
+Usage:
+    python GeneratorCodes/a35_Campaign.py Campaign.json
+
+Key Functions:
+    - load_campaign(): Reads and checks a campaign file
+    - build_run_source(): Source of a1_ with the inputs of one run
+    - run_campaign(): Runs all runs of a campaign and saves its summary
+"""
+
+REPOSITORY_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+MAIN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'a1_Main.py')
+INPUT_FILE = os.path.join(REPOSITORY_FOLDER, 'InputData.txt')
+
+
+def load_campaign(campaign_path):
+    """
+    Reads a campaign file and resolves the settings of each run (see the module description).
+
+    Returns:
+        runs : list of dict of the input values of each run (shared values, defaults and its own values)
+        concurrent_runs : number of boundary folders run at the same time
+    """
+    with open(campaign_path, 'r', encoding='utf-8') as f:
+        campaign = json.load(f)
+    shared = campaign.get('shared', {})
+    runs = []
+    for i, run in enumerate(campaign.get('runs', [])):
+        if 'resultfolder' not in run:
+            raise ValueError(f"❌ Run {i + 1} of the Campaign Has No resultfolder.")
+        settings = dict(shared)
+        settings.update(run)
+        recorded_data = settings.get('recorded_data', 'RecordedData.xlsx')
+        settings.setdefault('boundary_folder', os.path.join('Boundaries', os.path.splitext(os.path.basename(recorded_data))[0]))
+        settings.setdefault('queue_folder', os.path.join(settings['resultfolder'], 'WorkQueue'))
+        runs.append(settings)
+
+    resultfolders = [_resolve(run['resultfolder']) for run in runs]
+    if len(set(resultfolders)) != len(resultfolders):
+        raise ValueError("❌ Runs of a Campaign Must Have Different resultfolder Values.")
+    return runs, max(1, int(campaign.get('concurrent_runs', 1)))
+
+
+def build_run_source(settings, main_lines, input_lines):
+    """
+    Source of a1_ with the inputs of one run: InputData.txt between '# start' and '# end' (as Run.py does),
+    followed by the assignments of the run's values.
+
+    Parameters:
+        settings : dict of input values of the run
+        main_lines, input_lines : lines of a1_Main.py and InputData.txt
+
+    Returns:
+        source : Python source of the run
+    """
+    markers = [line.strip().lower() for line in main_lines]
+    start_index = markers.index('# start')
+    end_index = markers.index('# end')
+    assigned = {line.split('=', 1)[0].strip() for line in input_lines
+                if '=' in line and not line.startswith((' ', '#'))}
+
+    overrides = ['# === Campaign Run Values ===']
+    for name, value in settings.items():
+        if name not in assigned:
+            raise ValueError(f"❌ Unknown Input '{name}' in the Campaign (not in InputData.txt).")
+        if isinstance(value, dict) and 'expr' in value:
+            overrides.append(f"{name} = {value['expr']}")
+        else:
+            overrides.append(f"{name} = {value!r}")
+    return '\n'.join(main_lines[:start_index + 1] + input_lines + overrides + main_lines[end_index:])
+
+
+def _resolve(folder):
+    return os.path.abspath(os.path.join(REPOSITORY_FOLDER, folder))
+
+
+def _run_chain(chain, main_lines, input_lines):
+    """
+    Runs the runs of one boundary folder one after another, in this process.
+
+    Returns:
+        summaries : list of dict (resultfolder, status, seconds, error) of each run
+    """
+    summaries = []
+    for settings in chain:
+        start = time.time()
+        print(f"🚀 Campaign Run {settings['resultfolder']} Started.")
+        try:
+            source = build_run_source(settings, main_lines, input_lines)
+            exec(compile(source, MAIN_FILE, 'exec'), {'__name__': '__campaign__', '__file__': MAIN_FILE})
+            status, error = 'complete', None
+            print(f"✅ Campaign Run {settings['resultfolder']} Finished in {time.time() - start:.1f} s.")
+        except SystemExit as exc:
+            # a1_ stops with sys.exit() when no scenario remains (a7_); only this run is stopped
+            status, error = 'failed', f"SystemExit: Run Stopped (exit code {exc.code})"
+            print(f"❌ Campaign Run {settings['resultfolder']} Failed: {error}")
+        except Exception as exc:
+            status, error = 'failed', ''.join(traceback.format_exception_only(type(exc), exc)).strip()
+            traceback.print_exc()
+            print(f"❌ Campaign Run {settings['resultfolder']} Failed: {error}")
+        summaries.append({'resultfolder': settings['resultfolder'], 'boundary_folder': settings['boundary_folder'],
+                          'status': status, 'seconds': round(time.time() - start, 1), 'error': error})
+    return summaries
+
+
+def run_campaign(campaign_path):
+    """
+    Runs all runs of a campaign file in this process (see the module description) and saves
+    Campaign_Summary.json next to it.
+
+    Parameters:
+        campaign_path : path of the campaign JSON file
+
+    Returns:
+        summaries : list of dict (resultfolder, boundary_folder, status, seconds, error), in campaign order
+    """
+    runs, concurrent_runs = load_campaign(campaign_path)
+    with open(MAIN_FILE, 'r', encoding='utf-8') as f:
+        main_lines = f.read().splitlines()
+    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
+        input_lines = f.read().splitlines()
+
+    # === Runs sharing a boundary folder form a chain: the first one generates the boundaries ===
+    chains = {}
+    for settings in runs:
+        chains.setdefault(_resolve(settings['boundary_folder']), []).append(settings)
+    print(f"📋 Campaign: {len(runs)} Runs on {len(chains)} Boundary Folders, {min(concurrent_runs, len(chains))} at a Time.")
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=concurrent_runs) as executor:
+        futures = [executor.submit(_run_chain, chain, main_lines, input_lines) for chain in chains.values()]
+        by_folder = {summary['resultfolder']: summary for future in futures for summary in future.result()}
+    summaries = [by_folder[settings['resultfolder']] for settings in runs]
+
+    n_failed = sum(summary['status'] == 'failed' for summary in summaries)
+    summary_path = os.path.join(os.path.dirname(os.path.abspath(campaign_path)), 'Campaign_Summary.json')
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump({'campaign': os.path.abspath(campaign_path), 'seconds': round(time.time() - start, 1),
+                   'runs': summaries}, f, indent=2)
+    print(f"🏁 Campaign Finished in {time.time() - start:.1f} s: {len(summaries) - n_failed} Runs Complete, "
+          f"{n_failed} Failed. Summary Saved in {summary_path}.")
+    return summaries
+
+
+if __name__ == '__main__':
+    run_campaign(sys.argv[1] if len(sys.argv) > 1 else os.path.join(REPOSITORY_FOLDER, 'Campaign.json'))
@@ -0,0 +1,332 @@
+# a36_GeneratorService.py
+
+import os
+import sys
+import json
+import time
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+from a2_MatrixYear import matrix_year
+from a3_BoundaryCoordinateGenerator import boundary_coordinate_generator
+from a7_RemoveInfeasibleScenarios import feasible_scenarios
+from a8_BuildFeasibleAreaPolygon_and_CheckFeasibility import build_all_polygons
+from a9_ModifyInfeasibleScenarios import adjust_scenario_to_feasible
+from a10_InverseApproach_and_MonthlytoDaily import generate_scenario, prepare_local_stations
+from a18_ResponseLookupTable import response_lookup_table
+from a19_RunManifest import content_hash, save_boundary_fingerprint, target_keys
+from a21_RandomStreams import resolve_random_seed, spawn_stream
+from a23_RecordedData import read_excel_values
+from a31_ForcingCache import ForcingCache
+from a32_OptimizationBudget import RunBudget
+from a38_BasinSetup import MEAN_SCENARIO_RANGE, SD_SCENARIO_RANGE, load_recorded_data, load_seasonality, optimization_bounds
+from a38_BasinSetup import boundary_folder_path, boundary_inputs_fingerprint, saved_boundaries_match
+
+"""
+Module: Local Generator Service
+
+Keeps the warm state of one basin in a long-running process and answers scenario requests over HTTP on
+localhost, for interactive what-if sessions that need one or a few targets quickly. The inputs of
+InputData.txt (recorded data, seasonality, random year matrix), the boundaries, the feasibility polygons,
+the local stations (a10_ prepare_local_stations()) and the lookup table (lookup_table = 1) are loaded or
+built once when the service starts; numba kernels are compiled by the first request. A request then only
+checks and adjusts its targets and optimizes and disaggregates them (Step 5 of a1_).
+
+    python GeneratorCodes/a36_GeneratorService.py          # serves http://127.0.0.1:<service_port>
+
+    GET  /status      basin, settings and load of the service
+    POST /scenarios   {"targets": [[mean %, SD %], ...], "daily": 0 or 1, "random_seed": (optional) int}
+                      -> {"seconds": ..., "scenarios": [one entry per target, in order]}
+
+Each entry holds target_deviation and feasible, and for feasible targets forcing [Location x 24],
+distance [Location], mean_change and sd_change [Location x Month], monthly_synthetic [Year x Month x Location]
+(million m3 per month), budget_limited [Location x Month] and, with "daily": 1, daily [Day x (2 + Location)]
+(m3/s). With a fixed random_seed (in InputData.txt or the request), each target has its own random streams
+(a21_), whatever its position in the request: targets of the desired_change_mean x desired_change_sd grid
+of InputData.txt get the scenario number a new run of a1_ (range_flag = 1) gives them, so they match its
+Scenario{number}.h5; other targets are numbered from a hash of (mean, SD, replicate).
+
+Requests are served by a bounded pool of service_workers threads; up to 4 requests per worker wait for a
+free worker, and further requests are refused with HTTP 503 until the service catches up. The service
+only listens on 127.0.0.1. request_scenarios() is a client for scripts and tests on the same machine.
+
+Key Functions:
+    - load_input_settings(): Values of InputData.txt
+    - GeneratorService: Warm state of a basin; generate() answers one request
+    - serve(): Starts the HTTP service of a GeneratorService
+    - request_scenarios(): Client of a running service
+"""
+
+REPOSITORY_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+TARGET_NUMBER_OFFSET = 1000000  # Numbers of targets outside the grid, above any a1_ scenario number
+
+
+def load_input_settings(input_path=os.path.join(REPOSITORY_FOLDER, 'InputData.txt')):
+    """
+    Values of the USER-DEFINED INPUT SECTION in InputData.txt, as a dict.
+    """
+    with open(input_path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    settings = {'np': np}
+    exec(compile(source, input_path, 'exec'), settings)
+    return {name: value for name, value in settings.items() if name not in ('np', '__builtins__')}
+
+
+def _path(name):
+    return os.path.abspath(os.path.join(REPOSITORY_FOLDER, name))
+
+
+class GeneratorService:
+    """
+    Warm state of one basin: inputs, boundaries, feasibility polygons, local stations and lookup table.
+
+    Parameters:
+        settings : dict of input values (load_input_settings()); uses recorded_data, mean_seasonality_data,
+                   sd_seasonality_data, randomyear_data, alreadyexist, numberofyears_syntheticdata,
+                   startyear_synthetic, random_seed, boundary_folder, BoundaryCoordinate_AlreadyGenerated,
+                   desired_change_mean, desired_change_sd, distance_threshold, solver_mode, lookup_table,
+                   lookup_refinement, enable_parallel,
+                   forcing_cache_folder, forcing_cache_entries and the optimization budgets (run budgets
+                   apply to each request)
+    """
+
+    def __init__(self, settings):
+        start = time.time()
+        self.settings = settings
+
+        # === Inputs (as in Step 1 of a1_) ===
+        self.Data, self.isLocal = load_recorded_data(_path(settings['recorded_data']))
+        self.meanseasonality_change = load_seasonality(_path(settings['mean_seasonality_data']))
+        self.SDseasonality_change = load_seasonality(_path(settings['sd_seasonality_data']))
+        self.numberofyears_syntheticdata = settings['numberofyears_syntheticdata'] + 1  # One extra for appending Z and Z'
+        self.numberoflocations = self.Data.numberoflocations
+        self.numberofyears_recorded = self.Data.numberofyears_recorded
+        self.root_seed = resolve_random_seed(settings['random_seed'], '', 0)
+
+        self.mean_scenario_range = list(MEAN_SCENARIO_RANGE)
+        self.SD_scenario_range = list(SD_SCENARIO_RANGE)
+        self.range_lb, self.range_ub = optimization_bounds(self.mean_scenario_range, self.SD_scenario_range)
+
+        randomyear_path = _path(settings['randomyear_data'])
+        if settings['alreadyexist'] == 1 and os.path.exists(randomyear_path):
+            self.randomyear = read_excel_values(randomyear_path)
+        else:
+            self.randomyear = matrix_year(self.Data, self.numberofyears_syntheticdata, save=False,
+                                          rng=spawn_stream(self.root_seed, 'randomyear'))
+
+        # === Boundaries (Step 2 of a1_): saved boundaries of the same inputs are loaded ===
+        self.boundaryfolderpass = boundary_folder_path(settings.get('boundary_folder', ''))
+        boundary_fingerprint = boundary_inputs_fingerprint(
+            self.Data, self.isLocal, self.randomyear, self.mean_scenario_range,
+            self.SD_scenario_range, self.numberofyears_syntheticdata
+        )
+        already_generated = settings.get('BoundaryCoordinate_AlreadyGenerated', 0)
+        if saved_boundaries_match(self.boundaryfolderpass, boundary_fingerprint):
+            already_generated = 1
+        if already_generated == 0:
+            save_boundary_fingerprint(self.boundaryfolderpass, None)  # Boundary files are rewritten below
+        self.x_boundary, self.y_boundary, self.desired_scenarios_monthly_1 = boundary_coordinate_generator(
+            self.Data, self.isLocal, self.numberofyears_syntheticdata, self.numberofyears_recorded,
+            self.numberoflocations, self.randomyear, self.mean_scenario_range, self.SD_scenario_range,
+            self.boundaryfolderpass, already_generated
+        )
+        if already_generated == 0:
+            save_boundary_fingerprint(self.boundaryfolderpass, boundary_fingerprint)
+
+        # === Feasibility index, local stations and lookup table, shared by every request ===
+        self.polygons = build_all_polygons(self.mean_scenario_range, self.x_boundary, self.y_boundary,
+                                           self.desired_scenarios_monthly_1)
+        self.local_stations = prepare_local_stations(self.Data, self.isLocal, self.numberofyears_syntheticdata,
+                                                     self.numberofyears_recorded)
+        self.response_table = None
+        if settings['lookup_table'] == 1:
+            self.response_table = response_lookup_table(
+                self.Data, self.isLocal, self.numberofyears_syntheticdata, self.numberoflocations, self.randomyear,
+                self.range_lb, self.range_ub, self.boundaryfolderpass, 1
+            )
+        self.forcing_cache = None
+        if settings['forcing_cache_folder'] != '':
+            self.forcing_cache = ForcingCache(
+                os.path.join(_path(settings['forcing_cache_folder']), 'Forcing_Cache.sqlite'),
+                settings['forcing_cache_entries']
+            )
+
+        # === Scenario numbers of the grid targets, as a new a1_ run numbers its feasible scenarios ===
+        p1, p2 = np.meshgrid(settings['desired_change_mean'], settings['desired_change_sd'])
+        grid = np.column_stack((p1.flatten(), p2.flatten())).astype(np.float64)
+        grid_feasible = feasible_scenarios(np.repeat(grid, 12, axis=1), self.polygons, self.isLocal,
+                                           self.meanseasonality_change, self.SDseasonality_change)
+        self.grid_numbers = {key: number for number, key in enumerate(target_keys(grid[grid_feasible]), start=1)}
+        print(f"🔥 Generator Service State of {settings['recorded_data']} Is Ready in {time.time() - start:.1f} s.")
+
+    def status(self):
+        """
+        Basin and settings of the service (GET /status).
+        """
+        return {
+            'recorded_data': self.settings['recorded_data'], 'numberoflocations': int(self.numberoflocations),
+            'isLocal': self.isLocal.flatten().astype(int).tolist(),
+            'numberofyears_syntheticdata': int(self.numberofyears_syntheticdata - 1),
+            'startyear_synthetic': int(self.settings['startyear_synthetic']), 'random_seed': str(self.root_seed),
+            'solver_mode': self.settings['solver_mode'], 'distance_threshold': self.settings['distance_threshold'],
+            'boundary_folder': self.boundaryfolderpass,
+        }
+
+    def target_number(self, key):
+        """
+        Scenario number (random streams) of a target key (mean %, SD %, replicate) (a19_ target_keys()).
+        """
+        if key in self.grid_numbers:
+            return self.grid_numbers[key]
+        return TARGET_NUMBER_OFFSET + int(content_hash('service_target', *key)[:12], 16)
+
+    def generate(self, targets, daily=0, random_seed=None):
+        """
+        Optimizes and disaggregates the scenarios of some target deviations with the warm state.
+
+        Parameters:
+            targets : [Scenario x 2] target mean / SD deviations (%)
+            daily : 1 = also return the daily series
+            random_seed : (Optional) root seed of this request; None = the seed of the service
+
+        Returns:
+            scenarios : list of dict of each target (see the module description)
+        """
+        settings = self.settings
+        desired_scenarios1 = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+        desired_scenarios_monthly = np.repeat(desired_scenarios1, 12, axis=1)
+        feasible = feasible_scenarios(desired_scenarios_monthly, self.polygons, self.isLocal,
+                                      self.meanseasonality_change, self.SDseasonality_change)
+        rows = np.nonzero(feasible)[0]
+        scenarios = [{'target_deviation': target.tolist(), 'feasible': bool(flag)}
+                     for target, flag in zip(desired_scenarios1, feasible)]
+        if rows.size == 0:
+            return scenarios
+
+        desired_scenarios1 = desired_scenarios1[rows]
+        desired_scenarios_monthly = desired_scenarios_monthly[rows]
+        adjusted_scenarios = adjust_scenario_to_feasible(
+            desired_scenarios_monthly, self.meanseasonality_change, self.SDseasonality_change,
+            self.mean_scenario_range, self.x_boundary, self.y_boundary,
+            self.numberoflocations, self.isLocal, self.desired_scenarios_monthly_1, polygon_dict=self.polygons
+        )
+        numbers = [self.target_number(key) for key in target_keys(desired_scenarios1)]
+        budget = RunBudget(settings['scenario_time_budget'], settings['run_time_budget'],
+                           settings['scenario_evaluation_budget'], settings['run_evaluation_budget'], rows.size)
+
+        for sce, row in enumerate(rows):
+            result = generate_scenario(
+                sce, numbers[sce],
+                self.Data, self.randomyear, desired_scenarios_monthly, adjusted_scenarios, desired_scenarios1,
+                self.isLocal.flatten(), self.meanseasonality_change, self.SDseasonality_change,
+                range_lb=self.range_lb, range_ub=self.range_ub, range_flag=1,
+                numberofyears_syntheticdata=self.numberofyears_syntheticdata,
+                numberofyears_recorded=self.numberofyears_recorded, numberoflocations=self.numberoflocations,
+                firstyear=self.Data.firstyear, startyear_synthetic=settings['startyear_synthetic'],
+                distance_threshold=settings['distance_threshold'], enable_parallel=settings['enable_parallel'],
+                daily=0, monthly=0, h5=0,
+                lookup_table=settings['lookup_table'], lookup_refinement=settings['lookup_refinement'],
+                response_table=self.response_table, solver_mode=settings['solver_mode'],
+                random_seed=self.root_seed if random_seed is None else int(random_seed),
+                forcing_cache=self.forcing_cache, budget=budget, local_stations=self.local_stations,
+                daily_storage='lineage'  # Daily series disaggregated only if requested
+            )
+            scenarios[row].update({
+                'forcing': result.forcing.tolist(), 'distance': result.distance.tolist(),
+                'mean_change': result.mean_change.tolist(), 'sd_change': result.sd_change.tolist(),
+                'monthly_synthetic': result.monthly_synthetic.tolist(),
+                'budget_limited': result.budget_limited.tolist(),
+            })
+            if daily == 1:
+                scenarios[row]['daily'] = result.daily.block(0, result.daily.n_years).tolist()
+        return scenarios
+
+
+def serve(service, port=8765, workers=2):
+    """
+    Starts the HTTP service of a GeneratorService on 127.0.0.1 in a background thread.
+
+    Parameters:
+        service : GeneratorService
+        port : port to listen on (0 = any free port; see server.server_address)
+        workers : requests served at the same time (bounded worker pool)
+
+    Returns:
+        server : ThreadingHTTPServer; server.shutdown() stops it
+    """
+    executor = ThreadPoolExecutor(max_workers=workers)
+    admitted = threading.BoundedSemaphore(workers * 5)  # Running plus waiting requests
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def send_json(self, code, body):
+            payload = json.dumps(body).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path != '/status':
+                return self.send_json(404, {'error': f'Unknown path {self.path}'})
+            self.send_json(200, dict(service.status(), workers=workers))
+
+        def do_POST(self):
+            if self.path != '/scenarios':
+                return self.send_json(404, {'error': f'Unknown path {self.path}'})
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                targets = request['targets']
+            except (ValueError, KeyError):
+                return self.send_json(400, {'error': 'Request body must be JSON with "targets": [[mean, sd], ...]'})
+            if not admitted.acquire(blocking=False):
+                return self.send_json(503, {'error': 'Service is busy; retry later'})
+            try:
+                start = time.time()
+                scenarios = executor.submit(service.generate, targets, int(request.get('daily', 0)),
+                                            request.get('random_seed')).result()
+                print(f"✅ Served {len(scenarios)} Scenarios in {time.time() - start:.1f} s.")
+                self.send_json(200, {'seconds': round(time.time() - start, 3), 'scenarios': scenarios})
+            except Exception as exc:
+                self.send_json(500, {'error': f'{type(exc).__name__}: {exc}'})
+            finally:
+                admitted.release()
+
+        def log_message(self, format, *args):
+            pass  # Requests are reported by do_POST
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🌐 Generator Service Listening on http://127.0.0.1:{server.server_address[1]} ({workers} Workers).")
+    return server
+
+
+def request_scenarios(targets, daily=0, random_seed=None, port=8765, host='127.0.0.1', timeout=None):
+    """
+    Requests scenarios from a running service (POST /scenarios).
+
+    Returns:
+        response : dict with seconds and scenarios (see the module description)
+    """
+    body = {'targets': np.asarray(targets, dtype=np.float64).reshape(-1, 2).tolist(), 'daily': daily}
+    if random_seed is not None:
+        body['random_seed'] = int(random_seed)
+    request = urllib.request.Request(f'http://{host}:{port}/scenarios', data=json.dumps(body).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+if __name__ == '__main__':
+    settings = load_input_settings(sys.argv[1] if len(sys.argv) > 1 else os.path.join(REPOSITORY_FOLDER, 'InputData.txt'))
+    server = serve(GeneratorService(settings), settings['service_port'], settings['service_workers'])
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print("🛑 Generator Service Stopped.")
@@ -0,0 +1,144 @@
+# a37_DailyStage.py
+
+import os
+import re
+import sys
+import glob
+import h5py
+import pandas as pd
+from joblib import Parallel, delayed
+
+from a19_RunManifest import atomic_output, record_outputs
+from a22_OutputEncoding import create_encoded_dataset, column_chunks
+from a34_DailyLineage import DailyLineage, is_lineage, LINEAGE_DATASETS, LINEAGE_ATTRS
+
+"""
+Module: Deferred Daily Disaggregation Stage
+
+With daily_storage = 'deferred' (a1_), the run stops at the monthly outputs and each Scenario{number}.h5
+keeps what its daily series needs (a34_): the exact monthly flows and the inputs of the KNN year matching,
+with the disaggregation proportions of the run in OutputData/Daily_Lineage.h5. This stage produces the
+daily series of chosen scenarios afterwards, one scenario per parallel worker:
+
+    python GeneratorCodes/a37_DailyStage.py Scenarios                 # every deferred scenario of the run
+    python GeneratorCodes/a37_DailyStage.py Scenarios 3 7 12 --csv    # scenarios 3, 7 and 12, also as CSV
+
+The KNN draws come from the scenario's own random stream (a21_), so the daily series are those a 'full'
+run would have written. By default, DailyTimeSeries_Synthetic is added to each scenario file (which then
+has the 'full' layout, and the run manifest records its new size); --csv also writes the daily CSV file
+(DailyTimeseriesCSVFiles), and --no-h5 leaves the .h5 files as they are. Scenario files saved with
+daily_storage = 'lineage' are accepted too.
+
+For a few series on demand, nothing needs to be written: ScenarioStore (a26_) rebuilds the daily series of
+any deferred scenario and location when it is read (store.daily[...]).
+
+Key Functions:
+    - produce_daily(): Daily series of chosen scenarios of a run, in parallel
+    - produce_scenario_daily(): Daily series of one deferred scenario
+"""
+
+REPOSITORY_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def produce_scenario_daily(scenariofolderpass, number, lineage, h5=1, daily=0):
+    """
+    Disaggregates one deferred (or lineage) scenario and writes its daily series.
+
+    Parameters:
+        scenariofolderpass : result folder of the run
+        number : scenario file number
+        lineage : DailyLineage (a34_) of the run
+        h5 : 1 = add DailyTimeSeries_Synthetic to Scenario{number}.h5 (replacing its lineage datasets)
+        daily : 1 = write DailyTimeseriesCSVFiles/SynDailyInflow_Scenario_{number}.csv
+
+    Returns:
+        relpaths : outputs written (relative to scenariofolderpass); empty if the file already has its daily series
+    """
+    h5_relpath = os.path.join('OutputData', f'Scenario{number}.h5')
+    path = os.path.join(scenariofolderpass, h5_relpath)
+    with h5py.File(path, 'r') as h5f:
+        if not is_lineage(h5f):
+            print(f"✅ Scenario {number} Already Has Its Daily Series.")
+            return []
+        numberoflocations = h5f['Opt_Forcing_Scenario[Location x 24]'].shape[0]
+        DailyTimeSeries_Synthetic = lineage.rebuild(h5f, range(numberoflocations))
+        output_precision = h5f.attrs.get('output_precision', 'float64')
+
+    relpaths = []
+    if daily == 1:
+        csv_relpath = os.path.join('DailyTimeseriesCSVFiles', f'SynDailyInflow_Scenario_{number}.csv')
+        os.makedirs(os.path.join(scenariofolderpass, 'DailyTimeseriesCSVFiles'), exist_ok=True)
+        with atomic_output(os.path.join(scenariofolderpass, csv_relpath)) as part_path:
+            pd.DataFrame(DailyTimeSeries_Synthetic).to_csv(part_path, index=False, header=False)
+        relpaths.append(csv_relpath)
+
+    if h5 == 1:
+        # === Rewritten (not edited in place) so that the space of the lineage datasets is released ===
+        with atomic_output(path) as part_path, h5py.File(path, 'r') as source, h5py.File(part_path, 'w') as h5f:
+            for name in source:
+                if name not in LINEAGE_DATASETS:
+                    source.copy(source[name], h5f, name)
+            for name, value in source.attrs.items():
+                if name not in LINEAGE_ATTRS:
+                    h5f.attrs[name] = value
+
+            ds5 = create_encoded_dataset(h5f, 'DailyTimeSeries_Synthetic(m3 per s)[Day x Location]', DailyTimeSeries_Synthetic,
+                                         output_precision, calendar_columns=2, chunks=column_chunks(DailyTimeSeries_Synthetic.shape))
+            ds5.attrs['dimension'] = 'Day x Location'
+            ds5.attrs['description'] = 'Final synthetic daily streamflow per location'
+        relpaths.append(h5_relpath)
+    return relpaths
+
+
+def produce_daily(scenariofolder, numbers=None, h5=1, daily=0, n_jobs=-1):
+    """
+    Produces the daily series of chosen scenarios of a deferred run (see the module description).
+
+    Parameters:
+        scenariofolder : result folder of the run (relative to the repository folder, or an absolute path)
+        numbers : scenario file numbers; None = every scenario file without its daily series
+        h5, daily : outputs to write (produce_scenario_daily())
+        n_jobs : parallel workers (joblib; -1 = all cores)
+
+    Returns:
+        numbers : scenario numbers whose daily series were written
+    """
+    scenariofolderpass = os.path.abspath(os.path.join(REPOSITORY_FOLDER, scenariofolder))
+    output_folder = os.path.join(scenariofolderpass, 'OutputData')
+    lineage = DailyLineage(output_folder)
+    if numbers is None:
+        numbers = []
+        for path in glob.glob(os.path.join(output_folder, 'Scenario*.h5')):
+            match = re.fullmatch(r'Scenario(\d+)\.h5', os.path.basename(path))
+            if match:
+                with h5py.File(path, 'r') as h5f:
+                    if is_lineage(h5f):
+                        numbers.append(int(match.group(1)))
+    numbers = sorted(int(number) for number in numbers)
+    missing = [number for number in numbers
+               if not os.path.exists(os.path.join(output_folder, f'Scenario{number}.h5'))]
+    if missing:
+        raise FileNotFoundError(f"❌ Scenario Files Not Found in {output_folder}: {missing}")
+
+    print(f"📅 Producing the Daily Series of {len(numbers)} Scenarios.")
+    written = Parallel(n_jobs=n_jobs)(
+        delayed(produce_scenario_daily)(scenariofolderpass, number, lineage, h5, daily) for number in numbers
+    )
+
+    # === The manifest is updated here, not by the workers, so that its writes do not race ===
+    done = []
+    for number, relpaths in zip(numbers, written):
+        if relpaths:
+            record_outputs(scenariofolderpass, number, relpaths)
+            done.append(number)
+    print(f"📁 Daily Series of {len(done)} Scenarios Are Saved in {scenariofolder}.")
+    return done
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python a37_DailyStage.py <resultfolder> [scenario numbers ...] [--csv] [--no-h5]")
+        sys.exit(1)
+    options = [arg for arg in sys.argv[2:] if arg.startswith('--')]
+    chosen = [int(arg) for arg in sys.argv[2:] if not arg.startswith('--')]
+    produce_daily(sys.argv[1], chosen or None, h5=0 if '--no-h5' in options else 1, daily=1 if '--csv' in options else 0)
@@ -0,0 +1,109 @@
+# a38_BasinSetup.py
+
+import os
+import numpy as np
+
+from a19_RunManifest import content_hash, load_boundary_fingerprint
+from a23_RecordedData import RecordedData, read_excel_values
+
+"""
+Module: Basin Setup
+
+Input preparation shared by the entry points of the generator: the script a1_ (Steps 1 to 2), the in-process
+API a27_ and the generator service a36_. Each step is done the same way everywhere, so a run of a1_ and a
+request to a27_ / a36_ with the same inputs see the same arrays, bounds and boundary files.
+
+Key Functions:
+    - clean_recorded_array(): Recorded data array with flows <= 0 set to 0.001
+    - load_recorded_data(): RecordedData and isLocal flags from the recorded data Excel file
+    - load_seasonality(): Seasonality change factors [Location x Month] from an Excel file
+    - optimization_bounds(): Forcing bounds range_lb / range_ub of the optimization
+    - boundary_folder_path(): Boundary folder of a run (default GeneratorCodes/Boundary)
+    - boundary_inputs_fingerprint(): Content hash of the inputs the boundaries depend on
+    - boundary_files_exist(), saved_boundaries_match(): Whether saved boundaries can be reused
+"""
+
+MEAN_SCENARIO_RANGE = [-99, 2000]  # Forcing bounds (%) of the optimization and the boundary scenarios
+SD_SCENARIO_RANGE = [-2000, 2000]
+
+GENERATOR_FOLDER = os.path.dirname(os.path.abspath(__file__))
+BOUNDARY_FILES = ('Boundary_Coordinates.h5', 'Boundary_Scenarios.h5')
+
+
+def clean_recorded_array(Data):
+    """
+    Copy of a recorded data array [Day x (3 + Location)] (Sheet1 without its header row) with the flows <= 0
+    set to 0.001.
+    """
+    Data = np.array(Data, dtype=object)
+    numeric_part = Data[:, 2:].astype(float)
+    numeric_part[numeric_part <= 0] = 0.001
+    Data[:, 2:] = numeric_part
+    return Data
+
+
+def load_recorded_data(recorded_data_path):
+    """
+    Reads the recorded daily flows (Sheet1) and the isLocal flags (Sheet2) of a recorded data Excel file.
+
+    Returns:
+        Data : RecordedData (a23_)
+        isLocal : [1 x Location] flags (1 = local, 0 = non-local)
+    """
+    Data = clean_recorded_array(read_excel_values(recorded_data_path, sheet_name='Sheet1')[1:, :])
+    isLocal = read_excel_values(recorded_data_path, sheet_name='Sheet2')[1:, :]
+    return RecordedData.from_array(Data, isLocal), isLocal
+
+
+def load_seasonality(seasonality_path):
+    """
+    Seasonality change factors (%) [Location x Month] of an Excel file (without its header row and column).
+    """
+    return read_excel_values(seasonality_path)[1:, 1:].astype(np.float64)
+
+
+def optimization_bounds(mean_scenario_range=MEAN_SCENARIO_RANGE, SD_scenario_range=SD_SCENARIO_RANGE):
+    """
+    Returns:
+        range_lb, range_ub : [1 x 24] lower / upper forcing bounds (12 mean + 12 SD changes, %)
+    """
+    range_lb = np.zeros((1, 24))
+    range_ub = np.zeros((1, 24))
+    range_lb[0, 0:12] = mean_scenario_range[0]
+    range_lb[0, 12:24] = SD_scenario_range[0]
+    range_ub[0, 0:12] = mean_scenario_range[1]
+    range_ub[0, 12:24] = SD_scenario_range[1]
+    return range_lb, range_ub
+
+
+def boundary_folder_path(boundary_folder):
+    """
+    Absolute boundary folder: boundary_folder relative to the repository folder, or GeneratorCodes/Boundary if ''.
+    """
+    if boundary_folder == '':
+        return os.path.join(GENERATOR_FOLDER, 'Boundary')
+    return os.path.abspath(os.path.join(GENERATOR_FOLDER, '..', boundary_folder))
+
+
+def boundary_inputs_fingerprint(Data, isLocal, randomyear, mean_scenario_range, SD_scenario_range, numberofyears_syntheticdata):
+    """
+    Content hash of the inputs the boundary scenarios depend on (saved in Boundary_Fingerprint.txt, a19_).
+    """
+    return content_hash(
+        Data.calendar_flows, isLocal, randomyear, mean_scenario_range, SD_scenario_range, numberofyears_syntheticdata
+    )
+
+
+def boundary_files_exist(boundaryfolderpass):
+    """
+    True if the boundary files are saved in the folder.
+    """
+    return boundaryfolderpass is not None and all(
+        os.path.exists(os.path.join(boundaryfolderpass, f)) for f in BOUNDARY_FILES)
+
+
+def saved_boundaries_match(boundaryfolderpass, fingerprint):
+    """
+    True if the folder holds complete boundaries of the inputs with this fingerprint (they can be loaded).
+    """
+    return load_boundary_fingerprint(boundaryfolderpass) == fingerprint and boundary_files_exist(boundaryfolderpass)
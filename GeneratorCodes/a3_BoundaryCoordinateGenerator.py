@@ -25,19 +25,26 @@ Inputs:
     randomyear: Matrix of randomized year sampling per month [numberofyears_syntheticdata x 12].
     mean_scenario_range: 2-element list [min, max] for mean change in percent.
     SD_scenario_range: 2-element list [min, max] for SD change in percent.
-    boundaryfolderpass: Directory path where output should be save ("GeneratorCodes/Boundary") 
+    boundaryfolderpass: Directory path where output should be save ("GeneratorCodes/Boundary"), or None to keep the boundaries in memory only
     BoundaryCoordinate_AlreadyGenerated: If 1, load saved .h5 boundary data; if 0, regenerate.
+    locations: (Optional) range of location indices (a chunk of stations) to generate or load; None = all locations.
+               Chunks are written into (and read from) the same location-chunked .h5 datasets.
 
 Outputs:
     x_boundary: [numberofyears_syntheticdata x 12 x numberoflocations] array of resultant mean changes (%) of the extreme scenarios.
     y_boundary: [numberofyears_syntheticdata x 12 x numberoflocations] array of resultant SD changes (%) of the extreme scenarios.
+    (with `locations`, the last axis only holds those locations)
 """
 
 def boundary_coordinate_generator(data, isLocal, numberofyears_syntheticdata, numberofyears_recorded,
                                   numberoflocations, randomyear, mean_scenario_range, SD_scenario_range,
-                                  boundaryfolderpass, BoundaryCoordinate_AlreadyGenerated):
+                                  boundaryfolderpass, BoundaryCoordinate_AlreadyGenerated, locations=None):
 
-    os.makedirs(boundaryfolderpass, exist_ok=True)
+    chunked = locations is not None
+    locations = range(numberoflocations) if locations is None else locations
+    first_chunk = not chunked or locations[0] == 0
+    if boundaryfolderpass is not None:
+        os.makedirs(boundaryfolderpass, exist_ok=True)
 
     if BoundaryCoordinate_AlreadyGenerated == 0:
         # === Step 1: Create extreme exposure grid ===
@@ -52,54 +59,77 @@ def boundary_coordinate_generator(data, isLocal, numberofyears_syntheticdata, nu
             desired_scenarios_monthly_1[i, 0:12] = desired_scenarios1_1[i, 0]
             desired_scenarios_monthly_1[i, 12:24] = desired_scenarios1_1[i, 1]
         
-        with h5py.File(os.path.join(boundaryfolderpass, 'Boundary_Scenarios.h5'), 'w') as h5f:
-            ds1=h5f.create_dataset('Boundary_Scenarios[Scenario x 24]', data=desired_scenarios_monthly_1)
-            ds1.attrs['dimension'] = 'Scenario x 24'
-            ds1.attrs['description'] = 'Boundary scenarios: forcing Mean (Column 0 to 11) and SD change (Column 12 to 23)'
+        if boundaryfolderpass is not None and first_chunk:
+            with h5py.File(os.path.join(boundaryfolderpass, 'Boundary_Scenarios.h5'), 'w') as h5f:
+                ds1=h5f.create_dataset('Boundary_Scenarios[Scenario x 24]', data=desired_scenarios_monthly_1)
+                ds1.attrs['dimension'] = 'Scenario x 24'
+                ds1.attrs['description'] = 'Boundary scenarios: forcing Mean (Column 0 to 11) and SD change (Column 12 to 23)'
 
         # === Initialize outputs ===
-        x_boundary = np.zeros((num_scenarios, 12, numberoflocations))
-        y_boundary = np.zeros((num_scenarios, 12, numberoflocations))
+        x_boundary = np.zeros((num_scenarios, 12, len(locations)))
+        y_boundary = np.zeros((num_scenarios, 12, len(locations)))
+
+        # === Local stations are resampled without forcing: the same changes for every boundary scenario ===
+        local_changes = {}
+        for k in locations:
+            if isLocal[0, k] == 1:
+                x3, x4, _, _, _ = resample_locals(data, k, numberofyears_syntheticdata)
+                m_mr, sd_mr = recorded_mean_sd(x4)
+                local_changes[k] = synthetic_mean_sd_change(x3, m_mr, sd_mr)
 
-        for z in tqdm(range(num_scenarios), desc="📊 Generating Boundary Scenarios"):
+        description = "📊 Generating Boundary Scenarios" + (f" (Locations {locations[0]+1}-{locations[-1]+1})" if chunked else "")
+        for z in tqdm(range(num_scenarios), desc=description):
             meanchange = desired_scenarios_monthly_1[z, :12]
             SDchange = desired_scenarios_monthly_1[z, 12:24]
 
-            mean_change_syn = np.zeros((numberoflocations, 12))
-            SD_change_syn = np.zeros((numberoflocations, 12))
+            mean_change_syn = np.zeros((len(locations), 12))
+            SD_change_syn = np.zeros((len(locations), 12))
 
-            for k in range(numberoflocations):
+            for i, k in enumerate(locations):
                 if isLocal[0, k] == 0:
                     x3, x4 = synthetic_flow_generator_monthly(
                         data, k, numberofyears_syntheticdata, randomyear, meanchange, SDchange)
+                    m_mr, sd_mr = recorded_mean_sd(x4)
+                    m_cs, sd_cs = synthetic_mean_sd_change(x3, m_mr, sd_mr)
                 else:
-                    x3, x4, _, _, _ = resample_locals(data, k, numberofyears_syntheticdata)
-
-                m_mr, sd_mr = recorded_mean_sd(x4)
-                m_cs, sd_cs = synthetic_mean_sd_change(x3, m_mr, sd_mr)
+                    m_cs, sd_cs = local_changes[k]
 
-                mean_change_syn[k, :] = m_cs
-                SD_change_syn[k, :] = sd_cs
+                mean_change_syn[i, :] = m_cs
+                SD_change_syn[i, :] = sd_cs
 
             x_boundary[z, :, :] = mean_change_syn.T
             y_boundary[z, :, :] = SD_change_syn.T
 
         # === Save results ===
-        with h5py.File(os.path.join(boundaryfolderpass, 'Boundary_Coordinates.h5'), 'w') as h5f:
-           ds2=h5f.create_dataset('Mean[Scenario x Month x Location]', data=x_boundary)
-           ds2.attrs['dimension'] = 'Scenario x Month x Location'
-           ds2.attrs['description'] = 'Boundary scenarios: resulted Mean change for different locations and months'
-           ds3=h5f.create_dataset('SD[Scenario x Month x Location]', data=y_boundary)
-           ds3.attrs['dimension'] = 'Scenario x Month x Location'
-           ds3.attrs['description'] = 'Boundary scenarios: resulted SD change for different locations and months'
-
-        print(r"📁 Boundary Coordinates Are Saved on GeneratorCodes\Boundary\Boundary_Coordinates.h5.")
+        if boundaryfolderpass is not None and not chunked:
+            with h5py.File(os.path.join(boundaryfolderpass, 'Boundary_Coordinates.h5'), 'w') as h5f:
+               ds2=h5f.create_dataset('Mean[Scenario x Month x Location]', data=x_boundary)
+               ds2.attrs['dimension'] = 'Scenario x Month x Location'
+               ds2.attrs['description'] = 'Boundary scenarios: resulted Mean change for different locations and months'
+               ds3=h5f.create_dataset('SD[Scenario x Month x Location]', data=y_boundary)
+               ds3.attrs['dimension'] = 'Scenario x Month x Location'
+               ds3.attrs['description'] = 'Boundary scenarios: resulted SD change for different locations and months'
+        elif boundaryfolderpass is not None:
+            # Each chunk fills its locations of datasets holding every location (one storage chunk per location)
+            with h5py.File(os.path.join(boundaryfolderpass, 'Boundary_Coordinates.h5'), 'w' if first_chunk else 'a') as h5f:
+                for name, values in (('Mean', x_boundary), ('SD', y_boundary)):
+                    dataset_name = f'{name}[Scenario x Month x Location]'
+                    if dataset_name not in h5f:
+                        ds = h5f.create_dataset(dataset_name, shape=(num_scenarios, 12, numberoflocations),
+                                                dtype=np.float64, chunks=(num_scenarios, 12, 1))
+                        ds.attrs['dimension'] = 'Scenario x Month x Location'
+                        ds.attrs['description'] = f'Boundary scenarios: resulted {name} change for different locations and months'
+                    h5f[dataset_name][:, :, locations[0]:locations[-1] + 1] = values
+
+        if boundaryfolderpass is not None and locations[-1] == numberoflocations - 1:
+            print(r"📁 Boundary Coordinates Are Saved on GeneratorCodes\Boundary\Boundary_Coordinates.h5.")
 
     else:
-        print(r"🔄 Loading Previously Generated Boundaries from GeneratorCodes\Boundary\Boundary_Coordinates.h5.")
+        if first_chunk:
+            print(r"🔄 Loading Previously Generated Boundaries from GeneratorCodes\Boundary\Boundary_Coordinates.h5.")
         with h5py.File(os.path.join(boundaryfolderpass, 'Boundary_Coordinates.h5'), 'r') as h5f:
-            x_boundary = h5f['Mean[Scenario x Month x Location]'][:]
-            y_boundary = h5f['SD[Scenario x Month x Location]'][:]
+            x_boundary = h5f['Mean[Scenario x Month x Location]'][:, :, locations[0]:locations[-1] + 1]
+            y_boundary = h5f['SD[Scenario x Month x Location]'][:, :, locations[0]:locations[-1] + 1]
         
         with h5py.File(os.path.join(boundaryfolderpass, 'Boundary_Scenarios.h5'), 'r') as h5f:
             desired_scenarios_monthly_1 = h5f['Boundary_Scenarios[Scenario x 24]'][:]
@@ -9,27 +9,7 @@
 import numpy as np
 from numba import njit
 
-@njit
-def compute_monthly_aggregates(data1, firstyear, lastyear):
-    """
-    Aggregate daily streamflow into monthly totals.
-
-    Parameters:
-        data1: full historical dataset (daily inflow columns by location).
-        firstyear: first year in the dataset
-        lastyear: last year in the dataset
-
-    Returns:
-        inputdata: ndarray of shape with monthly totals
-    """
-    numberofyears_recorded = lastyear - firstyear + 1
-    inputdata = np.zeros((numberofyears_recorded, 12))
-    for i in range(data1.shape[0]):
-        y = int(data1[i, 0])
-        m = int(data1[i, 1])
-        if firstyear <= y <= lastyear and 1 <= m <= 12:
-            inputdata[y - firstyear, m - 1] += data1[i, 2]
-    return inputdata
+from a23_RecordedData import as_recorded_data
 
 @njit
 def fill_synthetic_uncorrelated(standardized_inputdata, randomyear, firstyear):
@@ -120,29 +100,28 @@ def de_standardize(synth_corr_combined, mean_monthly, SD_monthly, mean_ln, sd_ln
                 mean_monthly[j] * mean_ln[j])
     return synthetic_real
 
-def synthetic_flow_generator_monthly(inflowdata, locationnumber, numberofyears_syntheticdata,
-                                     randomyear, meanchange, SDchange):
+def synthetic_flow_generator_standardized(inflowdata, locationnumber, numberofyears_syntheticdata, randomyear):
     """
-    Main function to generate synthetic monthly streamflow based on the forcing mean and sd changes.
+    Forcing-independent part of the generator (Steps 0 to 6): everything before the back-transform.
+
+    The returned standardized correlated matrix depends only on the recorded data and the random year
+    matrix, so it can be reused to evaluate many forcing (mean, SD) pairs for the same location.
 
     Parameters:
-        inflowdata: full recorded data
+        inflowdata: full recorded data (RecordedData, a23_, or the raw array)
         locationnumber: location number
         numberofyears_syntheticdata: synthetic years to generate (including extra year)
         randomyear: random matrix year
-        meanchange, SDchange: forcing percent changes in mean and SD in real space
 
     Returns:
-        synthetic_real: generated synthetic streamflow
+        syntheticdata_correlated_combined: standardized correlated synthetic matrix [numberofyears_syntheticdata - 1 x 12]
+        mean_monthly, SD_monthly: recorded mean and sd in log-space
         inputdata: aggregated monthly data from historical series
     """
-    # === Step 0: Extract year, month, and location flow ===
-    data1 = inflowdata[:, [1, 2, locationnumber + 3]].astype(np.float64)
-    firstyear = int(data1[0, 0])
-    lastyear = int(data1[-1, 0])
-
-    # === Step 1: Aggregate historical daily to monthly flow ===
-    inputdata = compute_monthly_aggregates(data1, firstyear, lastyear)
+    # === Steps 0-1: Historical monthly flow of the location (aggregated once in the dataset) ===
+    data = as_recorded_data(inflowdata)
+    firstyear = data.firstyear
+    inputdata = data.monthly_totals[:, :, locationnumber]
 
     # === Step 2: Apply log transformation and standardize ===
     ln_inputdata = np.log(inputdata)
@@ -172,6 +151,28 @@ def synthetic_flow_generator_monthly(inflowdata, locationnumber, numberofyears_s
         syntheticdata_correlated_2[:, 6:12]
     ])
 
+    return syntheticdata_correlated_combined, mean_monthly, SD_monthly, inputdata
+
+def synthetic_flow_generator_monthly(inflowdata, locationnumber, numberofyears_syntheticdata,
+                                     randomyear, meanchange, SDchange):
+    """
+    Main function to generate synthetic monthly streamflow based on the forcing mean and sd changes.
+
+    Parameters:
+        inflowdata: full recorded data
+        locationnumber: location number
+        numberofyears_syntheticdata: synthetic years to generate (including extra year)
+        randomyear: random matrix year
+        meanchange, SDchange: forcing percent changes in mean and SD in real space
+
+    Returns:
+        synthetic_real: generated synthetic streamflow
+        inputdata: aggregated monthly data from historical series
+    """
+    # === Steps 0 to 6: Standardized, correlated synthetic flows (forcing-independent) ===
+    syntheticdata_correlated_combined, mean_monthly, SD_monthly, inputdata = synthetic_flow_generator_standardized(
+        inflowdata, locationnumber, numberofyears_syntheticdata, randomyear)
+
     # === Step 7: Back-transform to real-space synthetic flows ===
     mean_ln, sd_ln = compute_ln_params(meanchange, SDchange, mean_monthly, SD_monthly)
     synthetic_real = de_standardize(syntheticdata_correlated_combined, mean_monthly, SD_monthly, mean_ln, sd_ln)
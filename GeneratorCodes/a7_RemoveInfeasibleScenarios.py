@@ -17,7 +17,7 @@ def remove_infeasible_scenarios(scenariofolderpass, desired_scenarios_monthly_1,
 
     Inputs:
         boundaryfolderpass: Folder containing boundary data
-        scenariofolderpass: Folder to save filtered scenarios
+        scenariofolderpass: Folder to save filtered scenarios (None = do not save)
         mean_scenario_range: [min, max] range for mean change
         x_boundary, y_boundary: 3D arrays of feasible region bounds
         desired_scenarios_monthly: monthly mean/sd target deviations
@@ -29,19 +29,39 @@ def remove_infeasible_scenarios(scenariofolderpass, desired_scenarios_monthly_1,
     Output:
         desired_scenarios_monthly, desired_scenarios1: Reurn and saves updated scenario arrays (with infeasible ones removed) to .h5.
     """
-    change = np.zeros((2,), dtype=np.float64)
-    rows_to_delete = []
+    # Precompute polygon geometry for all (location, month) pairs and flag scenarios feasible anywhere
+    polygon_cache = build_all_polygons(mean_scenario_range, x_boundary, y_boundary,desired_scenarios_monthly_1)
+    feasible = feasible_scenarios(desired_scenarios_monthly, polygon_cache, isLocal,
+                                  meanseasonality_change, SDseasonality_change)
 
-    nonlocal_indices = [i for i, flag in enumerate(isLocal[0]) if flag == 0]
+    return drop_infeasible_scenarios(feasible, scenariofolderpass, desired_scenarios_monthly, desired_scenarios1,
+                                     meanseasonality_change, SDseasonality_change, resultfolder)
 
-    # Step 1: Precompute polygon geometry for all (location, month) pairs
-    polygon_cache = build_all_polygons(mean_scenario_range, x_boundary, y_boundary,desired_scenarios_monthly_1)
 
-    # Step 2: Loop through scenarios
-    for sce in tqdm(range(len(desired_scenarios1)), desc="🔍 Checking Full Feasibility"):
-        fully_infeasible = True
+def feasible_scenarios(desired_scenarios_monthly, polygon_cache, isLocal,
+                       meanseasonality_change, SDseasonality_change, locations=None):
+    """
+    Flags the scenarios that are feasible for at least one non-local location and month.
+
+    Inputs:
+        desired_scenarios_monthly: monthly mean/sd target deviations
+        polygon_cache: feasible-area polygons keyed by (location, month) (a8_ build_all_polygons)
+        isLocal: 1D array indicating local/non-local station flags
+        meanseasonality_change, SDseasonality_change: monthly mean / sd target seasonality
+        locations: (Optional) range of location indices to check (a chunk of stations, whose polygons are in
+                   polygon_cache); default all locations
+
+    Output:
+        feasible: boolean array [Scenario], True if the scenario is not fully infeasible at these locations
+    """
+    change = np.zeros((2,), dtype=np.float64)
+    nonlocal_indices = [(i, k) for i, k in enumerate(k for k, flag in enumerate(isLocal[0]) if flag == 0)
+                        if locations is None or k in locations]
+    feasible = np.zeros(len(desired_scenarios_monthly), dtype=bool)
 
-        for i, k in enumerate(nonlocal_indices):
+    description = "🔍 Checking Full Feasibility" + (f" (Locations {locations[0]+1}-{locations[-1]+1})" if locations is not None else "")
+    for sce in tqdm(range(len(desired_scenarios_monthly)), desc=description):
+        for i, k in nonlocal_indices:
             for j in range(12):
                 # Apply seasonal deviation adjustments
                 change[0] = (desired_scenarios_monthly[sce, j] +
@@ -54,13 +74,23 @@ def remove_infeasible_scenarios(scenariofolderpass, desired_scenarios_monthly_1,
                 # Check feasibility using cached polygon
                 outside = check_feasibility_from_polygons(change, k, j, polygon_cache)
                 if not outside:
-                    fully_infeasible = False
+                    feasible[sce] = True
                     break
-            if not fully_infeasible:
+            if feasible[sce]:
                 break
 
-        if fully_infeasible:
-            rows_to_delete.append(sce)
+    return feasible
+
+
+def drop_infeasible_scenarios(feasible, scenariofolderpass, desired_scenarios_monthly, desired_scenarios1,
+                              meanseasonality_change, SDseasonality_change, resultfolder):
+    """
+    Removes the scenarios not flagged as feasible and saves the remaining ones (scenariofolderpass = None: no saving).
+
+    Output:
+        desired_scenarios_monthly, desired_scenarios1: scenario arrays with the infeasible ones removed
+    """
+    rows_to_delete = np.where(~feasible)[0]
 
     # Remove infeasible scenarios
     desired_scenarios_monthly = np.delete(desired_scenarios_monthly, rows_to_delete, axis=0)
@@ -68,9 +98,26 @@ def remove_infeasible_scenarios(scenariofolderpass, desired_scenarios_monthly_1,
 
     if desired_scenarios1.size == 0:
         print("❌ All Scenarios Were Infeasible. No Scenarios Remain.")
+        if scenariofolderpass is None:
+            raise ValueError("❌ All Scenarios Were Infeasible. No Scenarios Remain.")
         sys.exit()
 
+    print(f"✅ From {len(desired_scenarios1)} Scenarios, {len(rows_to_delete)} Fully Infeasible Scenarios Were Removed.")
+
     # Save results
+    if scenariofolderpass is not None:
+        save_desired_scenarios(scenariofolderpass, desired_scenarios1, desired_scenarios_monthly,
+                               meanseasonality_change, SDseasonality_change)
+        print(rf"📁 Desired Scenarios Are Saved on {resultfolder} OutputData\Desired_Scenarios_InfeasibleRemoved.h5.")
+
+    return desired_scenarios_monthly, desired_scenarios1
+
+
+def save_desired_scenarios(scenariofolderpass, desired_scenarios1, desired_scenarios_monthly,
+                           meanseasonality_change, SDseasonality_change):
+    """
+    Saves the feasible target deviations (row i = Scenario{i+1}) to OutputData/Desired_Scenarios_InfeasibleRemoved.h5.
+    """
     output_folder = os.path.join(scenariofolderpass, 'OutputData')
     os.makedirs(output_folder, exist_ok=True)
 
@@ -87,9 +134,4 @@ def remove_infeasible_scenarios(scenariofolderpass, desired_scenarios_monthly_1,
        ds3.attrs['description'] = 'Mean seasonality change in % for each location and month'
        ds4=h5f.create_dataset('Desired_Sesonality_SD[Location x Month]', data=SDseasonality_change.astype(np.float64))
        ds4.attrs['dimension'] = 'Location x Month'
-       ds4.attrs['description'] = 'SD seasonality change in % for each location and month'
-
-    print(f"✅ From {len(desired_scenarios1)} Scenarios, {len(rows_to_delete)} Fully Infeasible Scenarios Were Removed.")
-    print(rf"📁 Desired Scenarios Are Saved on {resultfolder} OutputData\Desired_Scenarios_InfeasibleRemoved.h5.")
-
-    return desired_scenarios_monthly, desired_scenarios1
\ No newline at end of file
+       ds4.attrs['description'] = 'SD seasonality change in % for each location and month'
\ No newline at end of file
@@ -15,7 +15,7 @@ Key Functions:
 """
 
 
-def build_all_polygons(mean_scenario_range, x_boundary, y_boundary, desired_scenarios_monthly_1):
+def build_all_polygons(mean_scenario_range, x_boundary, y_boundary, desired_scenarios_monthly_1, locations=None):
     """
     Constructs 2D feasibility polygons for each (location, month)
 
@@ -24,6 +24,7 @@ def build_all_polygons(mean_scenario_range, x_boundary, y_boundary, desired_scen
         x_boundary : mean change boundaries [n_scenarios x 12 x n_locations]
         y_boundary : SD change boundaries [n_scenarios x 12 x n_locations]
         desired_scenarios_monthly_1 : scenarios to be checked for feasibility
+        locations : (Optional) location index of each boundary column (a chunk of stations); default 0..n_locations-1
 
     Returns:
         polygon_dict : A dictionary with keys as (location_index, month_index) and values as matplotlib Path objects.
@@ -52,7 +53,7 @@ def build_all_polygons(mean_scenario_range, x_boundary, y_boundary, desired_scen
 
             # Construct polygon and store in dictionary keyed by (location, month)
             polygon = Path(np.column_stack((x_poly, y_poly)))
-            polygon_dict[(loc, month)] = polygon
+            polygon_dict[(loc if locations is None else locations[loc], month)] = polygon
 
     return polygon_dict
 
@@ -6,7 +6,8 @@ from a8_BuildFeasibleAreaPolygon_and_CheckFeasibility import build_all_polygons,
 def adjust_scenario_to_feasible(desired_scenarios_monthly, meanseasonality_change,
                                 SDseasonality_change, mean_scenario_range,
                                 x_boundary, y_boundary,
-                                numberoflocations, isLocal, desired_scenarios_monthly_1):
+                                numberoflocations, isLocal, desired_scenarios_monthly_1, locations=None,
+                                adjusted_scenarios=None, polygon_dict=None):
     """
     Adjust all scenario vectors in partially infeasible scenarios, to ensure feasibility.
 
@@ -19,6 +20,11 @@ def adjust_scenario_to_feasible(desired_scenarios_monthly, meanseasonality_chang
         y_boundary : SD change boundaries [n_scenarios x 12 x n_locations]
         numberoflocations: Total number of locations
         isLocal: 2D binary array [n_locations x 1] indicating if location is local (1) or non-local (0)
+        locations: (Optional) range of location indices the boundaries belong to (a chunk of stations); only these
+                   locations are adjusted. Default: all locations
+        adjusted_scenarios: (Optional) output array [n_scenarios x 24 x numberoflocations] to fill (shared by the
+                            chunks of locations). Default: a new array
+        polygon_dict: (Optional) polygons of these boundaries (a8_ build_all_polygons), if already built
 
     Returns:
         adjusted_scenarios: adjusted final scenarios which are all feasible [n_scenarios x 24 x numberoflocations], 
@@ -28,15 +34,20 @@ def adjust_scenario_to_feasible(desired_scenarios_monthly, meanseasonality_chang
 
     # === Identify non-local location indices ===
     non_local_indices = np.where(isLocal.flatten() == 0)[0]
+    if locations is not None:
+        non_local_indices = [k for k in non_local_indices if k in locations]
 
     # === Initialize output array for all locations (local left as 0) ===
-    adjusted_scenarios = np.zeros((n_scenarios, 24, numberoflocations))  # [scenarios x (12 mean + 12 sd) x locations]
+    if adjusted_scenarios is None:
+        adjusted_scenarios = np.zeros((n_scenarios, 24, numberoflocations))  # [scenarios x (12 mean + 12 sd) x locations]
 
     # === Build polygon dictionary (once for all) ===
-    polygon_dict = build_all_polygons(mean_scenario_range, x_boundary, y_boundary,desired_scenarios_monthly_1)
+    if polygon_dict is None:
+        polygon_dict = build_all_polygons(mean_scenario_range, x_boundary, y_boundary,desired_scenarios_monthly_1, locations)
 
     # === Progress bar for non-local adjustments ===
-    progress_bar = tqdm(total=n_scenarios, desc="🔍 Adjusting Partially Infeasible Scenarios")
+    description = "🔍 Adjusting Partially Infeasible Scenarios" + (f" (Locations {locations[0]+1}-{locations[-1]+1})" if locations is not None else "")
+    progress_bar = tqdm(total=n_scenarios, desc=description)
 
     for sce_idx in range(n_scenarios):
         for k in non_local_indices:  # non-local locations only
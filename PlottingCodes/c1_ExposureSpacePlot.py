@@ -1,12 +1,16 @@
 # c1_ExposureSpacePlot.py
 # Visualizes exposure space (mean vs SD changes) for selected locations and months
-# using synthetic optimization results stored in .h5 files.
+# using the achieved deviations stored in the run summary (Scenarios/OutputData/Run_Summary.h5).
 
 import os
+import sys
 import h5py
 import numpy as np
 import matplotlib.pyplot as plt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "GeneratorCodes"))
+from a24_RunSummary import load_run_summary
+
 # ====== USER INPUTS ======
 locations = [2, 12]                     # Two location number for plotting.      
 scenariofolder = "Scenarios"       # The folder of results     
@@ -33,23 +37,12 @@ with h5py.File(infeasible_path, "r") as f:
 rect_x_min, rect_x_max = desired_scenarios1[:, 0].min(), desired_scenarios1[:, 0].max()
 rect_y_min, rect_y_max = desired_scenarios1[:, 1].min(), desired_scenarios1[:, 1].max()
 
-n_scenarios = desired_scenarios1.shape[0]
 n_locs = len(locations)
 
-# === Allocate storage ===
-x_opt_all = np.zeros((n_scenarios, n_months, n_locs))
-y_opt_all = np.zeros((n_scenarios, n_months, n_locs))
-
-# === Load optimized mean and SD deviation per scenario ===
-for sce in range(n_scenarios):
-    file_path = os.path.join(scenariofolderpass, "OutputData", f"Scenario{sce+1}.h5")
-    if os.path.exists(file_path):
-        with h5py.File(file_path, "r") as f:
-            mean_dev = f["Opt_Mean_Deviation[Location x Month]"][:]
-            sd_dev = f["Opt_SD_Deviation[Location x Month]"][:]
-            for j, loc in enumerate(locations):
-                x_opt_all[sce, :, j] = mean_dev[loc, :]
-                y_opt_all[sce, :, j] = sd_dev[loc, :]
+# === Load optimized mean and SD deviation of all scenarios [Scenario x Month x Location] ===
+summary = load_run_summary(scenariofolderpass)
+x_opt_all = summary["Opt_Mean_Deviation[Scenario x Location x Month]"][:, locations, :].transpose(0, 2, 1)
+y_opt_all = summary["Opt_SD_Deviation[Scenario x Location x Month]"][:, locations, :].transpose(0, 2, 1)
 
 # === Plot Setup ===
 fig, axes = plt.subplots(n_locs * 2, 6, figsize=(18, 6 * n_locs))
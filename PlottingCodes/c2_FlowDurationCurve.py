@@ -1,14 +1,18 @@
 # c2_FlowDurationCurve_4Locations.py
 # Monthly Flow Duration Curve: Synthetic vs Historical (for 4 specific locations)
 # Each subplot compares synthetic scenario FDC envelopes to historical records
-# Uses synthetic data stored in .h5 files under Scenarios/OutputData/
+# Uses the streaming FDC envelope and quantile sketch of the run summary (Scenarios/OutputData/Run_Summary.h5),
+# so memory does not grow with the number of scenarios
 
 import os
-import h5py
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "GeneratorCodes"))
+from a24_RunSummary import load_run_summary, load_run_reducers
+
 # ====== USER INPUTS ======
 locations = [2, 4, 6, 12]            # Four location number for plotting  
 scenariofolder = "Scenarios"         # The folder of results  
@@ -21,41 +25,17 @@ n_locs = len(locations)
 # === Setup Paths ===
 script_dir = os.path.dirname(os.path.abspath(__file__))
 scenariofolderpass = os.path.abspath(os.path.join(script_dir, "..", scenariofolder))
-output_path = os.path.join(scenariofolderpass, "OutputData")
-inputdata_path = os.path.join(scenariofolderpass, "InputData", "Inputs.h5")
-infeasible_path = os.path.join(output_path, "Desired_Scenarios_InfeasibleRemoved.h5")
-
-# === Load number of years from metadata ===
-with h5py.File(inputdata_path, "r") as f:
-    numberofyears_syntheticdata = int(f["Metadata"].attrs["numberofyears_syntheticdata+1"]) - 1
-
-# === Load scenario metadata ===
-with h5py.File(infeasible_path, "r") as f:
-    desired_scenarios1 = f["Desired_Deviations[Scenario x 2]"][:]
-n_scenarios = desired_scenarios1.shape[0]
-
-N = numberofyears_syntheticdata * 12
-prob_exceedance = np.arange(1, N + 1) / (N + 1)
-
-# === Allocate data arrays ===
-inputdata_recorded = np.zeros((N, n_locs))
-synthetic_data = np.zeros((N, n_scenarios, n_locs))
 
-# === Load synthetic and recorded monthly flow data from .h5 ===
-for sce in range(n_scenarios):
-    file_path = os.path.join(output_path, f"Scenario{sce+1}.h5")
-    if os.path.exists(file_path):
-        with h5py.File(file_path, "r") as f:
-            Monthly_Synthetic = f["Monthly_Synthetic(million m3/month)[Year x Month x Location]"][:]
-            Monthly_Recorded = f["Monthly_Recorded(million m3/month)[Year x Month x Location]"][:]
-            for j, k in enumerate(locations):
-                synthetic_data[:, sce, j] = Monthly_Synthetic[:, :, k].T.flatten()
-                if sce == 0:
-                    inputdata_recorded[:, j] = Monthly_Recorded[:, :, k].T.flatten()
+# === Load precomputed FDCs (descending flow at increasing exceedance probability) ===
+summary = load_run_summary(scenariofolderpass, ["Exceedance_Probability[Quantile]",
+                                                "FDC_Recorded(million m3 per month)[Quantile x Location]"])
+prob_exceedance = summary["Exceedance_Probability[Quantile]"]
+fdc_recorded = summary["FDC_Recorded(million m3 per month)[Quantile x Location]"][:, locations]
 
-# === Compute FDCs ===
-fdc_recorded = np.sort(inputdata_recorded, axis=0)[::-1, :]
-fdc_synthetic = np.sort(synthetic_data, axis=0)[::-1, :, :]
+# Envelope (min-max) and 5-95% band of the synthetic FDCs across scenarios [Quantile x Location]
+reducers = load_run_reducers(scenariofolderpass)
+fdc_min, fdc_max = (a[:, locations] for a in reducers["FDC_Envelope"].result())
+fdc_p5, fdc_p50, fdc_p95 = (a[:, locations] for a in reducers["FDC_Sketch"].quantile([0.05, 0.5, 0.95]))
 
 # === Plotting ===
 fig, axes = plt.subplots(2, 2, figsize=(14, 8), gridspec_kw={'hspace': 0.3, 'wspace': 0.2})
@@ -65,11 +45,15 @@ for j in range(n_locs):
     ax = axes[j]
 
     # Plot synthetic scenarios (with positive-only values)
-    for sce in range(n_scenarios):
-        y_vals = fdc_synthetic[:, sce, j]
-        y_vals = y_vals[y_vals > 0]
-        x_vals = prob_exceedance[:len(y_vals)] * 100
-        ax.plot(x_vals, y_vals, color=(0.0, 0.3, 1.0), linewidth=1)
+    x_vals = prob_exceedance * 100
+    positive = fdc_max[:, j] > 0
+    ax.fill_between(x_vals[positive], np.where(fdc_min[positive, j] > 0, fdc_min[positive, j], np.nan),
+                    fdc_max[positive, j], color=(0.0, 0.3, 1.0), alpha=0.2, linewidth=0)
+    positive = fdc_p95[:, j] > 0
+    ax.fill_between(x_vals[positive], np.where(fdc_p5[positive, j] > 0, fdc_p5[positive, j], np.nan),
+                    fdc_p95[positive, j], color=(0.0, 0.3, 1.0), alpha=0.4, linewidth=0)
+    positive = fdc_p50[:, j] > 0
+    ax.plot(x_vals[positive], fdc_p50[positive, j], color=(0.0, 0.3, 1.0), linewidth=1)
 
     # Plot historical
     y_hist = fdc_recorded[:, j]
@@ -84,10 +68,12 @@ for j in range(n_locs):
 
 # Shared legend
 custom_lines = [
-   Line2D([0], [0], color=(0.0, 0.3, 1.0), lw=1, label='Synthetic Scenarios'),
+   Line2D([0], [0], color=(0.0, 0.3, 1.0), lw=6, alpha=0.2, label='Synthetic Scenarios (Min-Max)'),
+   Line2D([0], [0], color=(0.0, 0.3, 1.0), lw=6, alpha=0.4, label='Synthetic Scenarios (5-95%)'),
+   Line2D([0], [0], color=(0.0, 0.3, 1.0), lw=1, label='Synthetic Scenarios (Median)'),
    Line2D([0], [0], color='black', lw=2, label='Historical')
 ]
-fig.legend(custom_lines, ['Synthetic Scenarios', 'Historical'],
+fig.legend(custom_lines, ['Synthetic Scenarios (Min-Max)', 'Synthetic Scenarios (5-95%)', 'Synthetic Scenarios (Median)', 'Historical'],
            loc='lower right', fontsize=14, frameon=False)
 
 fig.text(0.5, 0.04, 'Exceedance Probability (%)', ha='center', fontsize=14, fontweight='bold')
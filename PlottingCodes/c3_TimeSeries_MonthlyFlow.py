@@ -1,14 +1,17 @@
 # c3_TimeSeries_MonthlyFlow_4Locations.py
 # Plots time series of monthly flow: Synthetic vs Historical (for 4 specific locations)
 # Each subplot overlays the recorded time series with a min-max envelope from all synthetic scenarios
-# Uses synthetic data stored in .h5 files under Scenarios/OutputData/
+# Uses the envelope stored in the run summary (Scenarios/OutputData/Run_Summary.h5)
 
 import os
-import h5py
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.lines import Line2D
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "GeneratorCodes"))
+from a24_RunSummary import load_run_summary
+
 # ====== USER INPUTS ======
 locations = [2, 4, 6, 12]            # Four location number for plotting  
 scenariofolder = "Scenarios"         # The folder of results 
@@ -20,33 +23,18 @@ n_locs = len(locations)
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 scenariofolderpass = os.path.abspath(os.path.join(script_dir, "..", scenariofolder))
-output_path = os.path.join(scenariofolderpass, "OutputData")
-inputdata_path = os.path.join(scenariofolderpass, "InputData", "Inputs.h5")
-infeasible_path = os.path.join(output_path, "Desired_Scenarios_InfeasibleRemoved.h5")
-
-# Load scenario metadata
-with h5py.File(infeasible_path, "r") as f:
-    desired_scenarios1 = f["Desired_Deviations[Scenario x 2]"][:]
-n_scenarios = desired_scenarios1.shape[0]
-with h5py.File(inputdata_path, "r") as f:
-    numberofyears_syntheticdata = int(f["Metadata"].attrs["numberofyears_syntheticdata+1"]) - 1
-N = numberofyears_syntheticdata * 12
-
-# Allocate data arrays
-inputdata_recorded = np.zeros((N, n_locs))
-synthetic_data = np.zeros((N, n_scenarios, n_locs))
 
-# Load synthetic and recorded monthly flow data from .h5
-for sce in range(n_scenarios):
-    file_path = os.path.join(output_path, f"Scenario{sce+1}.h5")
-    if os.path.exists(file_path):
-        with h5py.File(file_path, "r") as f:
-            Monthly_Synthetic = f["Monthly_Synthetic(million m3/month)[Year x Month x Location]"][:]
-            Monthly_Recorded = f["Monthly_Recorded(million m3/month)[Year x Month x Location]"][:]
-            for j, k in enumerate(locations):
-                synthetic_data[:, sce, j] = Monthly_Synthetic[:, :, k].T.flatten()
-                if sce == 0:
-                    inputdata_recorded[:, j] = Monthly_Recorded[:, :, k].T.flatten()
+# Load the recorded series and the min-max envelope over all synthetic scenarios [Month-major time x Location]
+summary = load_run_summary(scenariofolderpass, ["Monthly_Recorded(million m3 per month)[Year x Month x Location]",
+                                                "Series_Min(million m3 per month)[Year x Month x Location]",
+                                                "Series_Max(million m3 per month)[Year x Month x Location]"])
+Monthly_Recorded = summary["Monthly_Recorded(million m3 per month)[Year x Month x Location]"]
+Series_Min = summary["Series_Min(million m3 per month)[Year x Month x Location]"]
+Series_Max = summary["Series_Max(million m3 per month)[Year x Month x Location]"]
+inputdata_recorded = np.stack([Monthly_Recorded[:, :, k].T.flatten() for k in locations], axis=1)
+synthetic_min_all = np.stack([Series_Min[:, :, k].T.flatten() for k in locations], axis=1)
+synthetic_max_all = np.stack([Series_Max[:, :, k].T.flatten() for k in locations], axis=1)
+N = synthetic_min_all.shape[0]
 
 # Plotting
 nrows, ncols = 2, 2
@@ -55,8 +43,8 @@ axes = axes.flatten()
 for j in range(n_locs):
     ax = axes[j]
     line_rec, = ax.plot(inputdata_recorded[:, j], 'k', linewidth=0.3)
-    synthetic_min = np.min(synthetic_data[:, :, j], axis=1)
-    synthetic_max = np.max(synthetic_data[:, :, j], axis=1)
+    synthetic_min = synthetic_min_all[:, j]
+    synthetic_max = synthetic_max_all[:, j]
     x = np.arange(N)
     fill_syn = ax.fill_between(x, synthetic_min, synthetic_max, color='blue', alpha=0.3)
     ax.set_xlim([0, N])
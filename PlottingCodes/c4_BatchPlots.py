@@ -0,0 +1,222 @@
+# c4_BatchPlots.py
+# Renders the exposure space (c1), flow duration curve (c2) and monthly time series (c3) figures of every
+# location (or a chosen set) straight to image files, without opening windows.
+# The run summary (Scenarios/OutputData/Run_Summary.h5) is loaded once; the figures are drawn in parallel
+# worker processes with the non-interactive Agg backend, which share the loaded arrays (joblib memory mapping).
+# Figures are saved as <scenariofolder>/Figures/{ExposureSpace, FDC, TimeSeries}_Loc{n}.{figure_format}
+
+import os
+import sys
+import time
+import h5py
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")  # Headless: no display needed, also in the worker processes
+import matplotlib.pyplot as plt
+from matplotlib.lines import Line2D
+from joblib import Parallel, delayed
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "GeneratorCodes"))
+from a24_RunSummary import load_run_summary, load_run_reducers
+
+# ====== USER INPUTS ======
+location_numbers = []                             # 1-based location numbers to plot (Loc n, as in c1 to c3); [] = every location
+plots = ["exposure", "fdc", "timeseries"]          # Figures of each location: "exposure" (c1), "fdc" (c2), "timeseries" (c3)
+scenariofolder = "Scenarios"                       # The folder of results
+figurefolder = "Figures"                           # Subfolder of scenariofolder for the image files
+figure_format = "png"                              # Image format: "png", "pdf", "svg", ...
+dpi = 150                                          # Resolution of raster images
+n_jobs = -1                                        # Worker processes (-1 = all CPU cores, 1 = no parallelism)
+# ========= End ============
+
+month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+FIGURE_NAMES = {"exposure": "ExposureSpace", "fdc": "FDC", "timeseries": "TimeSeries"}
+
+
+def load_plot_data(scenariofolderpass, plots):
+    """
+    Loads the arrays of the requested figures once, for every location.
+
+    Returns:
+        data : dict of arrays shared by the workers
+    """
+    summary = load_run_summary(scenariofolderpass, ["Monthly_Recorded(million m3 per month)[Year x Month x Location]"])
+    data = {"Monthly_Recorded": summary["Monthly_Recorded(million m3 per month)[Year x Month x Location]"]}
+    if "exposure" in plots:
+        infeasible_path = os.path.join(scenariofolderpass, "OutputData", "Desired_Scenarios_InfeasibleRemoved.h5")
+        with h5py.File(infeasible_path, "r") as f:
+            data["meanseasonality_change"] = f["Desired_Sesonality_Mean[Location x Month]"][:]
+            data["SDseasonality_change"] = f["Desired_Sesonality_SD[Location x Month]"][:]
+            data["desired_scenarios1"] = f["Desired_Deviations[Scenario x 2]"][:]
+        summary = load_run_summary(scenariofolderpass, ["Opt_Mean_Deviation[Scenario x Location x Month]",
+                                                        "Opt_SD_Deviation[Scenario x Location x Month]"])
+        data["x_opt_all"] = summary["Opt_Mean_Deviation[Scenario x Location x Month]"]
+        data["y_opt_all"] = summary["Opt_SD_Deviation[Scenario x Location x Month]"]
+    if "fdc" in plots:
+        summary = load_run_summary(scenariofolderpass, ["Exceedance_Probability[Quantile]",
+                                                        "FDC_Recorded(million m3 per month)[Quantile x Location]"])
+        data["prob_exceedance"] = summary["Exceedance_Probability[Quantile]"]
+        data["fdc_recorded"] = summary["FDC_Recorded(million m3 per month)[Quantile x Location]"]
+        reducers = load_run_reducers(scenariofolderpass)
+        data["fdc_min"], data["fdc_max"] = reducers["FDC_Envelope"].result()
+        data["fdc_p5"], data["fdc_p50"], data["fdc_p95"] = reducers["FDC_Sketch"].quantile([0.05, 0.5, 0.95])
+    if "timeseries" in plots:
+        summary = load_run_summary(scenariofolderpass, ["Series_Min(million m3 per month)[Year x Month x Location]",
+                                                        "Series_Max(million m3 per month)[Year x Month x Location]"])
+        data["Series_Min"] = summary["Series_Min(million m3 per month)[Year x Month x Location]"]
+        data["Series_Max"] = summary["Series_Max(million m3 per month)[Year x Month x Location]"]
+    return data
+
+
+def plot_exposure_space(data, loc):
+    """
+    Exposure space of one location: achieved mean vs SD change of each scenario, month by month (as c1).
+    """
+    desired_scenarios1 = data["desired_scenarios1"]
+    rect_x_min, rect_x_max = desired_scenarios1[:, 0].min(), desired_scenarios1[:, 0].max()
+    rect_y_min, rect_y_max = desired_scenarios1[:, 1].min(), desired_scenarios1[:, 1].max()
+
+    fig, axes = plt.subplots(2, 6, figsize=(18, 6))
+    axes = axes.flatten()
+    for month in range(12):
+        ax = axes[month]
+        ax.scatter(data["x_opt_all"][:, loc, month], data["y_opt_all"][:, loc, month],
+                   s=10, color='blue', label="Synthetic Scenarios")
+
+        # Seasonality origin shift
+        x_origin = data["meanseasonality_change"][loc, month]
+        y_origin = data["SDseasonality_change"][loc, month]
+        ax.plot(x_origin, y_origin, 'ko', label="Target Seasonality")
+        ax.plot(0, 0, 'ro', label="(0,0) Origin")
+
+        # Target deviation rectangle, adjusted with origin shift
+        rect_x = np.array([rect_x_min, rect_x_max, rect_x_max, rect_x_min])
+        rect_y = np.array([rect_y_min, rect_y_min, rect_y_max, rect_y_max])
+        rect_x = rect_x + x_origin + 0.01 * rect_x * x_origin
+        rect_y = rect_y + y_origin + 0.01 * rect_y * y_origin
+        ax.fill(rect_x, rect_y, color='#5dade2', alpha=0.4, edgecolor='b', label="Target Deviation")
+
+        ax.set_title(f"Loc {loc+1} - {month_names[month]}", fontsize=8)
+        ax.grid(True)
+        ax.tick_params(labelsize=6)
+
+    handles, labels = ax.get_legend_handles_labels()
+    fig.legend(handles, labels, loc='upper center', bbox_to_anchor=(0.5, 1), ncol=4, fontsize=14, prop={'weight': 'bold'})
+    fig.text(0.5, 0.005, 'Resultant Monthly Mean Change (%)', ha='center', fontsize=14, fontweight='bold')
+    fig.text(0.01, 0.5, 'Resultant Monthly SD Change (%)', va='center', rotation='vertical', fontsize=14, fontweight='bold')
+    fig.tight_layout(rect=[0.015, 0.03, 1, 0.9])
+    return fig
+
+
+def plot_fdc(data, loc):
+    """
+    Monthly flow duration curve of one location: synthetic envelopes vs historical (as c2).
+    """
+    fig, ax = plt.subplots(figsize=(9, 6))
+    x_vals = data["prob_exceedance"] * 100
+    fdc_min, fdc_max = data["fdc_min"][:, loc], data["fdc_max"][:, loc]
+    fdc_p5, fdc_p50, fdc_p95 = data["fdc_p5"][:, loc], data["fdc_p50"][:, loc], data["fdc_p95"][:, loc]
+
+    positive = fdc_max > 0
+    ax.fill_between(x_vals[positive], np.where(fdc_min[positive] > 0, fdc_min[positive], np.nan),
+                    fdc_max[positive], color=(0.0, 0.3, 1.0), alpha=0.2, linewidth=0)
+    positive = fdc_p95 > 0
+    ax.fill_between(x_vals[positive], np.where(fdc_p5[positive] > 0, fdc_p5[positive], np.nan),
+                    fdc_p95[positive], color=(0.0, 0.3, 1.0), alpha=0.4, linewidth=0)
+    positive = fdc_p50 > 0
+    ax.plot(x_vals[positive], fdc_p50[positive], color=(0.0, 0.3, 1.0), linewidth=1)
+
+    y_hist = data["fdc_recorded"][:, loc]
+    y_hist = y_hist[y_hist > 0]
+    ax.plot(data["prob_exceedance"][:len(y_hist)] * 100, y_hist, color='black', linewidth=2)
+
+    ax.set_yscale('log')
+    ax.set_title(f"Loc {loc+1}", fontsize=14)
+    ax.grid(True)
+    ax.tick_params(labelsize=10)
+    custom_lines = [
+       Line2D([0], [0], color=(0.0, 0.3, 1.0), lw=6, alpha=0.2),
+       Line2D([0], [0], color=(0.0, 0.3, 1.0), lw=6, alpha=0.4),
+       Line2D([0], [0], color=(0.0, 0.3, 1.0), lw=1),
+       Line2D([0], [0], color='black', lw=2)
+    ]
+    ax.legend(custom_lines, ['Synthetic Scenarios (Min-Max)', 'Synthetic Scenarios (5-95%)',
+                             'Synthetic Scenarios (Median)', 'Historical'], loc='upper right', fontsize=10, frameon=False)
+    ax.set_xlabel('Exceedance Probability (%)', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Total Monthly Flow (million m3/month, log scale)', fontsize=12, fontweight='bold')
+    fig.tight_layout()
+    return fig
+
+
+def plot_timeseries(data, loc):
+    """
+    Monthly time series of one location: recorded series and synthetic min-max envelope (as c3).
+    """
+    fig, ax = plt.subplots(figsize=(12, 5))
+    recorded = data["Monthly_Recorded"][:, :, loc].T.flatten()
+    synthetic_min = data["Series_Min"][:, :, loc].T.flatten()
+    synthetic_max = data["Series_Max"][:, :, loc].T.flatten()
+    N = synthetic_min.shape[0]
+
+    ax.plot(recorded, 'k', linewidth=0.3)
+    ax.fill_between(np.arange(N), synthetic_min, synthetic_max, color='blue', alpha=0.3)
+    ax.set_xlim([0, N])
+    ax.set_xticks(np.arange(0, N + 1, 50))
+    ax.tick_params(labelsize=10)
+    ax.set_title(f"Loc {loc+1}", fontsize=14)
+    custom_lines = [
+       Line2D([0], [0], color='blue', lw=6, alpha=0.3),
+       Line2D([0], [0], color='black', lw=2)
+    ]
+    ax.legend(custom_lines, ['Synthetic Scenarios', 'Recorded'], loc='upper right', fontsize=10, frameon=False)
+    ax.set_xlabel('Month', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Total Monthly Flow (million m3/month)', fontsize=12, fontweight='bold')
+    fig.tight_layout()
+    return fig
+
+
+PLOTTERS = {"exposure": plot_exposure_space, "fdc": plot_fdc, "timeseries": plot_timeseries}
+
+
+def render_figure(kind, loc, data, figurefolderpass, figure_format, dpi):
+    """
+    Draws one figure in a worker process and saves it.
+
+    Returns:
+        path : image file
+    """
+    matplotlib.use("Agg")
+    fig = PLOTTERS[kind](data, loc)
+    path = os.path.join(figurefolderpass, f"{FIGURE_NAMES[kind]}_Loc{loc+1}.{figure_format}")
+    fig.savefig(path, dpi=dpi)
+    plt.close(fig)
+    return path
+
+
+if __name__ == "__main__":
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    scenariofolderpass = os.path.abspath(os.path.join(script_dir, "..", scenariofolder))
+    figurefolderpass = os.path.join(scenariofolderpass, figurefolder)
+    os.makedirs(figurefolderpass, exist_ok=True)
+
+    unknown = [kind for kind in plots if kind not in PLOTTERS]
+    if unknown:
+        raise ValueError(f"❌ Unknown Plots {unknown}. Use any of {tuple(PLOTTERS)}.")
+
+    # === Load the data of every figure once ===
+    start = time.time()
+    data = load_plot_data(scenariofolderpass, plots)
+    numberoflocations = data["Monthly_Recorded"].shape[2]
+    invalid = [n for n in location_numbers if not 1 <= n <= numberoflocations]
+    if invalid:
+        raise ValueError(f"❌ Location Numbers {invalid} Are Outside 1 to {numberoflocations}.")
+    selected = list(range(numberoflocations)) if not location_numbers else [n - 1 for n in location_numbers]
+    tasks = [(kind, loc) for loc in selected for kind in plots]
+
+    # === Render the figures in parallel worker processes ===
+    paths = Parallel(n_jobs=n_jobs)(
+        delayed(render_figure)(kind, loc, data, figurefolderpass, figure_format, dpi) for kind, loc in tasks
+    )
+    print(f"🖼️ {len(paths)} Figures of {len(selected)} Locations Are Rendered in {time.time() - start:.1f} s.")
+    print(rf"📁 Figures Are Saved on {scenariofolderpass} \{figurefolder} Folder.")